@@ -1,24 +1,91 @@
+import logging
+
 from flask import Flask
 from .config import Config
 
+logger = logging.getLogger(__name__)
+
+CORS_HEADERS = (
+	("Access-Control-Allow-Origin", "*"),
+	("Access-Control-Allow-Headers", "Content-Type,Authorization"),
+	("Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS"),
+)
+
 
 def create_app() -> Flask:
 	app = Flask(__name__, static_folder="../static", template_folder="../templates")
 	app.config.from_object(Config)
 
+	# JSON logs written off the request thread, tagged with X-Request-ID
+	from .logs import structured_logging
+	structured_logging.init_app(app)
+
+	# Prometheus /metrics and per-route timing (registered first so its hooks time the others)
+	from .metrics import collect_cache_stats, log_dropped, registry
+	registry.init_app(app)
+
+	# Opt-in sampling profiler and TEMPO memory snapshots (/admin/profile, ADMIN_TOKEN)
+	from .profiling import profiler
+	profiler.init_app(app)
+
 	# Enable CORS manually
 	@app.after_request
 	def after_request(response):
-		response.headers.add('Access-Control-Allow-Origin', '*')
-		response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-		response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+		for name, value in CORS_HEADERS:
+			response.headers.add(name, value)
 		return response
 
+	# gzip/brotli for buffered responses (after_request runs before the CORS hook)
+	from .responses import compressor
+	compressor.init_app(app)
+
+	# Fingerprinted static assets (scripts/build_assets.py)
+	from .assets import assets
+	assets.init_app(app)
+
 	# Register routes
 	from .routes import api_bp, pages_bp
 	app.register_blueprint(api_bp, url_prefix="/api")
 	app.register_blueprint(pages_bp)
 
+	# Upstream cache TTLs and the hot-location refresher
+	from .services.cache import SQLiteBackend, upstream_cache
+	from .services.live import live_hub
+	from .services.refresher import refresher
+	from .services.upload_store import UploadRequest, uploads
+	from .services.workspaces import workspaces
+	shared = None
+	if app.config["SHARED_CACHE"] == "sqlite":
+		try:
+			shared = SQLiteBackend(
+				app.config["SHARED_CACHE_PATH"],
+				max_entries=app.config["SHARED_CACHE_MAX_ENTRIES"],
+				grace=app.config["CACHE_STALE_SECONDS"],
+			)
+		except Exception as e:
+			logger.warning("Shared cache unavailable, using per-worker cache only: %s", e)
+	upstream_cache.configure(
+		ttls={
+			"ow_current": app.config["OW_CACHE_TTL_SECONDS"],
+			"ow_weather": app.config["OW_CACHE_TTL_SECONDS"],
+			"ow_forecast": app.config["OW_FORECAST_CACHE_TTL_SECONDS"],
+			"ow_weather_forecast": app.config["OW_FORECAST_CACHE_TTL_SECONDS"],
+			"nasa_comprehensive": app.config["NASA_CACHE_TTL_SECONDS"],
+		},
+		stale_ttl=app.config["CACHE_STALE_SECONDS"],
+		shared=shared,
+		local_max_entries=app.config["LOCAL_CACHE_MAX_ENTRIES"],
+	)
+	refresher.init_app(app)
+	live_hub.init_app(app)
+	workspaces.init_app(app)
+	registry.add_collector(workspaces.collect)
+	uploads.init_app(app, pinned=workspaces.loaded_sources)
+	app.request_class = UploadRequest  # TEMPO uploads are parsed straight into the store
+	upstream_cache.flight.wait_timeout = app.config["REQUEST_TIMEOUT_SECONDS"] + 5
+	registry.add_collector(lambda: collect_cache_stats(upstream_cache, flight=upstream_cache.flight))
+	registry.add_collector(lambda: log_dropped.set_total(structured_logging.dropped))
+
 	return app
 
 
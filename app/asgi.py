@@ -0,0 +1,412 @@
+"""
+ASGI serving mode for the I/O-bound API routes.
+
+The Flask app stays the source of truth. An ``AsyncApp`` sits in front of it:
+
+* ``/api/weather``, ``/api/nasa/{aerosol,fires,precipitation}`` and
+  ``/api/gemini/*`` are served by coroutines that await the upstream call.
+* ``/api/aggregate``, ``/api/nasa/comprehensive``, ``/api/nasa/7day-forecast``
+  and ``/api/nasa/24hour-hourly`` first await their upstream sources
+  concurrently through ``async_upstream`` (same cache as the sync fetchers),
+  then run the unchanged Flask view in a thread pool with those values
+  pinned, so the thread only does CPU work.
+* ``/api/live`` streams Server-Sent Events from the live hub on the event
+  loop, so an open stream costs a coroutine instead of a thread.
+* Everything else (ML training, TEMPO processing, pages) runs on the thread
+  pool as plain WSGI.
+
+A slow upstream therefore holds a coroutine rather than a worker, and one
+process can keep thousands of upstream waits open. Needs the packages in
+``requirements-async.txt``; run with ``uvicorn asgi:app``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import logging
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+from urllib.parse import parse_qs
+
+from flask import Flask
+
+from . import CORS_HEADERS, create_app
+from .routes import (
+	_chat_conversation,
+	_chat_fallback_reply,
+	_chat_key_configured,
+	_CHAT_GENERATION_CONFIG,
+	_gemini_model,
+	_suggest_heuristic,
+	_suggest_prompt,
+	nasa_client,
+)
+from .logs import new_request_id, request_id
+from .metrics import collect_cache_stats, http_in_flight, observe_request, registry, track_upstream
+from .responses import compressor
+from .services.aio import async_upstream
+from .services.cache import prefetched_upstream, upstream_cache
+from .services.live import AsyncSubscriber, live_hub
+from .services.external import OPENWEATHER_URLS, openweather_city_url, openweather_url, quantize_location
+
+logger = logging.getLogger(__name__)
+
+# -------------- Async upstream sources --------------
+
+def _openweather_fetcher(kind: str):
+	async def fetch(lat: float, lon: float) -> dict | None:
+		key = async_upstream.config.get("OPENWEATHER_KEY")
+		if not key:
+			return None
+		url = openweather_url(kind, lat, lon, key, base=async_upstream.config.get("OPENWEATHER_BASE_URL"))
+		return await async_upstream.get_json(url, upstream="openweather")
+	return fetch
+
+
+for _kind in OPENWEATHER_URLS:
+	async_upstream.register(_kind, _openweather_fetcher(_kind))
+async_upstream.register(
+	"nasa_comprehensive",
+	lambda lat, lon: nasa_client.get_comprehensive_analysis_async(async_upstream.client, lat, lon),
+)
+
+# Sync views and the upstream sources they read. Fallback fetches a view makes
+# only when these are empty (e.g. current weather) still happen in its thread.
+_PREFETCH: Dict[str, Tuple[str, ...]] = {
+	"/api/aggregate": ("ow_forecast", "ow_current", "ow_weather"),
+	"/api/dashboard": ("ow_forecast", "ow_current", "ow_weather", "ow_weather_forecast", "nasa_comprehensive"),
+	"/api/nasa/comprehensive": ("nasa_comprehensive",),
+	"/api/nasa/7day-forecast": ("nasa_comprehensive", "ow_weather_forecast", "ow_forecast"),
+	"/api/nasa/24hour-hourly": ("nasa_comprehensive", "ow_forecast"),
+}
+
+_SPOOL_BYTES = 1 << 20  # request bodies above this are buffered on disk
+_DONE = object()
+
+
+class _Request:
+	def __init__(self, scope: Dict[str, Any], body: bytes) -> None:
+		self.scope = scope
+		self.body = body
+		query = parse_qs(scope.get("query_string", b"").decode("latin1"), keep_blank_values=True)
+		self.args: Dict[str, str] = {k: v[0] for k, v in query.items()}
+		self.headers: Dict[str, str] = {k.decode("latin1").lower(): v.decode("latin1") for k, v in scope.get("headers", [])}
+
+	def get_json(self) -> Any:
+		"""Like Flask's ``get_json(silent=True)``."""
+		if "json" not in self.headers.get("content-type", ""):
+			return None
+		try:
+			return json.loads(self.body or b"null")
+		except ValueError:
+			return None
+
+
+Handler = Callable[[_Request], Awaitable[Tuple[Any, int]]]
+
+
+# -------------- Native async handlers --------------
+
+async def weather_by_city(req: _Request) -> Tuple[Any, int]:
+	city = req.args.get("city", "")
+	if not city:
+		return {"error": "city required"}, 400
+	key = async_upstream.config.get("OPENWEATHER_KEY")
+	url = openweather_city_url(city, key, base=async_upstream.config.get("OPENWEATHER_BASE_URL"))
+	data = await async_upstream.get_json(url, upstream="openweather") if key else None
+	return {"city": city, "weather": data or {}}, 200
+
+
+def _nasa_analysis(kind: str, default_days: str, label: str) -> Handler:
+	async def handler(req: _Request) -> Tuple[Any, int]:
+		try:
+			lat = float(req.args.get("lat", "28.6139"))
+			lon = float(req.args.get("lon", "77.2090"))
+			days = int(req.args.get("days", default_days))
+			return await nasa_client.get_analysis_async(async_upstream.client, kind, lat, lon, days), 200
+		except Exception as e:
+			return {"error": f"NASA {label} data failed: {str(e)}"}, 500
+	return handler
+
+
+async def _generate(model, *args: Any, **kwargs: Any):
+	# The async client needs gRPC; over REST (GEMINI_API_ENDPOINT) run the sync call in a thread
+	if async_upstream.config.get("GEMINI_API_ENDPOINT"):
+		return await asyncio.to_thread(model.generate_content, *args, **kwargs)
+	return await model.generate_content_async(*args, **kwargs)
+
+
+async def gemini_suggest(req: _Request) -> Tuple[Any, int]:
+	data: Dict[str, Any] = req.get_json() or {}
+	daily = data.get("dailyAqi", [])
+	realtime = data.get("realtimeAqi")
+	location = data.get("location", {})
+	used = data.get("used", "")
+	pollutants = data.get("pollutants", {})
+
+	api_key = async_upstream.config.get("GEMINI_API_KEY")
+	if not api_key:
+		return {"suggestion": _suggest_heuristic(daily, realtime, used, pollutants)}, 200
+
+	model = _gemini_model(api_key, async_upstream.config.get("GEMINI_API_ENDPOINT"))
+	try:
+		with track_upstream("gemini"):
+			resp = await _generate(model, _suggest_prompt(location, realtime, daily, pollutants))
+		text = getattr(resp, "text", None) or _suggest_heuristic(daily, realtime, used, pollutants)
+	except Exception:
+		text = _suggest_heuristic(daily, realtime, used, pollutants)
+	return {"suggestion": text}, 200
+
+
+async def gemini_chat(req: _Request) -> Tuple[Any, int]:
+	body: Dict[str, Any] = req.get_json() or {}
+	message: str = body.get("message", "")
+	history: List[Dict[str, str]] = body.get("history", [])
+	context: Dict[str, Any] = body.get("context", {})
+
+	if not message:
+		return {"error": "message required"}, 400
+
+	api_key = async_upstream.config.get("GEMINI_API_KEY")
+	if not _chat_key_configured(api_key):
+		return {"reply": _chat_fallback_reply(message, context)}, 200
+
+	try:
+		model = _gemini_model(api_key, async_upstream.config.get("GEMINI_API_ENDPOINT"))
+		with track_upstream("gemini"):
+			response = await _generate(
+				model,
+				_chat_conversation(message, history, context),
+				generation_config=_CHAT_GENERATION_CONFIG,
+			)
+		reply_text = getattr(response, "text", None)
+		if not reply_text:
+			raise Exception("Empty response from Gemini")
+		return {"reply": reply_text.strip()}, 200
+	except Exception as e:
+		logger.warning("Gemini API error: %s", e)
+		return {"reply": _chat_fallback_reply(message, context)}, 200
+
+
+HANDLERS: Dict[Tuple[str, str], Handler] = {
+	("GET", "/api/weather"): weather_by_city,
+	("GET", "/api/nasa/aerosol"): _nasa_analysis("aerosol", "7", "aerosol"),
+	("GET", "/api/nasa/fires"): _nasa_analysis("fire", "7", "fire"),
+	("GET", "/api/nasa/precipitation"): _nasa_analysis("precipitation", "3", "precipitation"),
+	("POST", "/api/gemini/suggest"): gemini_suggest,
+	("POST", "/api/gemini/chat"): gemini_chat,
+}
+
+
+# -------------- ASGI app --------------
+
+async def _read_body(receive) -> bytes:
+	chunks: List[bytes] = []
+	more = True
+	while more:
+		message = await receive()
+		chunks.append(message.get("body", b""))
+		more = message.get("more_body", False)
+	return b"".join(chunks)
+
+
+async def _receive_into(receive, stream) -> int:
+	"""Copy the request body into ``stream`` as it arrives; returns its length."""
+	length = 0
+	more = True
+	while more:
+		message = await receive()
+		chunk = message.get("body", b"")
+		stream.write(chunk)
+		length += len(chunk)
+		more = message.get("more_body", False)
+	stream.seek(0)
+	return length
+
+
+def _wsgi_environ(scope: Dict[str, Any], stream, length: int) -> Dict[str, Any]:
+	server = scope.get("server") or ("localhost", 80)
+	client = scope.get("client") or ("", 0)
+	environ: Dict[str, Any] = {
+		"REQUEST_METHOD": scope["method"],
+		"SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin1"),
+		"PATH_INFO": scope["path"].encode("utf-8").decode("latin1"),
+		"QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+		"SERVER_NAME": server[0],
+		"SERVER_PORT": str(server[1]),
+		"SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+		"REMOTE_ADDR": client[0],
+		"CONTENT_LENGTH": str(length),
+		"wsgi.version": (1, 0),
+		"wsgi.url_scheme": scope.get("scheme", "http"),
+		"wsgi.input": stream,
+		"wsgi.errors": sys.stderr,
+		"wsgi.multithread": True,
+		"wsgi.multiprocess": True,
+		"wsgi.run_once": False,
+	}
+	for raw_name, raw_value in scope.get("headers", []):
+		name = raw_name.decode("latin1").upper().replace("-", "_")
+		value = raw_value.decode("latin1")
+		if name == "CONTENT_TYPE":
+			environ["CONTENT_TYPE"] = value
+		elif name != "CONTENT_LENGTH":
+			key = f"HTTP_{name}"
+			environ[key] = f"{environ[key]},{value}" if key in environ else value
+	return environ
+
+
+class AsyncApp:
+	def __init__(self, flask_app: Flask, threads: int = 16) -> None:
+		self.flask_app = flask_app
+		self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+		self.handlers = dict(HANDLERS)
+		self.prefetch = dict(_PREFETCH)
+
+	async def __call__(self, scope, receive, send) -> None:
+		if scope["type"] == "lifespan":
+			await self._lifespan(receive, send)
+			return
+		if scope["type"] != "http":
+			return
+
+		method, path = scope["method"], scope["path"]
+		if (method, path) == ("GET", "/api/live"):
+			await self._live(scope, receive, send)
+			return
+		handler = self.handlers.get((method, path))
+		if handler is not None:
+			registry.ensure_started()
+			start = time.perf_counter()
+			req = _Request(scope, await _read_body(receive))
+			token = request_id.set(new_request_id(req.headers.get("x-request-id")))
+			http_in_flight.inc()
+			try:
+				payload, status = await handler(req)
+				await self._send_json(send, payload, status, req.headers.get("accept-encoding"))
+				observe_request(method, path, status, time.perf_counter() - start)
+			finally:
+				http_in_flight.dec()
+				request_id.reset(token)
+			return
+
+		kinds = self.prefetch.get(path) if method == "GET" else None
+		values = await self._prefetch(scope, kinds) if kinds else None
+		# The context (and so the pinned values) is copied into the view's thread
+		token = prefetched_upstream.set(values)
+		try:
+			await self._call_wsgi(scope, receive, send)
+		finally:
+			prefetched_upstream.reset(token)
+
+	async def _prefetch(self, scope: Dict[str, Any], kinds: Iterable[str]) -> Dict[Tuple[str, float, float], Any] | None:
+		args = _Request(scope, b"").args
+		try:
+			lat = float(args.get("lat", "28.6139"))
+			lon = float(args.get("lon", "77.2090"))
+		except ValueError:
+			return None  # the view itself answers 400
+		loc = quantize_location(lat, lon)
+		return await async_upstream.get_many((kind, *loc) for kind in kinds)
+
+	async def _call_wsgi(self, scope, receive, send) -> None:
+		stream = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+		environ = _wsgi_environ(scope, stream, await _receive_into(receive, stream))
+		loop = asyncio.get_running_loop()
+		ctx = contextvars.copy_context()
+		started: Dict[str, Any] = {}
+
+		def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+			started["status"] = int(status.split(" ", 1)[0])
+			started["headers"] = headers
+			return lambda data: None
+
+		iterable = await loop.run_in_executor(self.executor, ctx.run, self.flask_app, environ, start_response)
+		try:
+			iterator = iter(iterable)
+			first = await loop.run_in_executor(self.executor, ctx.run, next, iterator, _DONE)
+			await send({
+				"type": "http.response.start",
+				"status": started.get("status", 500),
+				"headers": [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in started.get("headers", [])],
+			})
+			chunk = first
+			while chunk is not _DONE:
+				if chunk:
+					await send({"type": "http.response.body", "body": chunk, "more_body": True})
+				chunk = await loop.run_in_executor(self.executor, ctx.run, next, iterator, _DONE)
+			await send({"type": "http.response.body", "body": b"", "more_body": False})
+		finally:
+			close = getattr(iterable, "close", None)
+			if close is not None:
+				await loop.run_in_executor(self.executor, ctx.run, close)
+			stream.close()
+
+	async def _live(self, scope, receive, send) -> None:
+		args = _Request(scope, b"").args
+		try:
+			lat = float(args.get("lat", "28.6139"))
+			lon = float(args.get("lon", "77.2090"))
+		except ValueError:
+			await self._send_json(send, {"error": "Invalid lat/lon"}, 400)
+			return
+		sub = live_hub.subscribe(lat, lon, factory=AsyncSubscriber)
+		if sub is None:
+			await self._send_json(send, {"error": "Too many live subscribers"}, 503)
+			return
+
+		async def watch_disconnect() -> None:
+			while (await receive())["type"] != "http.disconnect":
+				pass
+			live_hub.unsubscribe(sub)
+
+		watcher = asyncio.ensure_future(watch_disconnect())
+		headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+		headers += [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in CORS_HEADERS]
+		try:
+			await send({"type": "http.response.start", "status": 200, "headers": headers})
+			async for chunk in live_hub.astream(sub, dumps=self.flask_app.json.dumps):
+				await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+			await send({"type": "http.response.body", "body": b"", "more_body": False})
+		except OSError:
+			pass  # client went away mid-write
+		finally:
+			watcher.cancel()
+			live_hub.unsubscribe(sub)
+
+	async def _send_json(self, send, payload: Any, status: int, accept_encoding: str | None = None) -> None:
+		body = (self.flask_app.json.dumps(payload) + "\n").encode("utf-8")
+		headers = [(b"content-type", b"application/json"), (b"vary", b"Accept-Encoding")]
+		if status == 200 and self.flask_app.config.get("COMPRESS_RESPONSES", True):
+			body, encoding = compressor.compress(body, accept_encoding)
+			if encoding is not None:
+				headers.append((b"content-encoding", encoding.encode()))
+		headers.append((b"content-length", str(len(body)).encode()))
+		if request_id.get() != "-":
+			headers.append((b"x-request-id", request_id.get().encode("latin1")))
+		headers += [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in CORS_HEADERS]
+		await send({"type": "http.response.start", "status": status, "headers": headers})
+		await send({"type": "http.response.body", "body": body})
+
+	async def _lifespan(self, receive, send) -> None:
+		while True:
+			message = await receive()
+			if message["type"] == "lifespan.startup":
+				await send({"type": "lifespan.startup.complete"})
+			elif message["type"] == "lifespan.shutdown":
+				await async_upstream.aclose()
+				self.executor.shutdown(wait=False)
+				await send({"type": "lifespan.shutdown.complete"})
+				return
+
+
+def create_asgi_app() -> AsyncApp:
+	flask_app = create_app()
+	async_upstream.init_app(flask_app)
+	registry.add_collector(lambda: collect_cache_stats(upstream_cache, async_upstream, upstream_cache.flight))
+	return AsyncApp(flask_app, threads=flask_app.config["ASYNC_THREADS"])
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import mimetypes
+import os
+from typing import Dict
+
+from flask import abort, request, send_file, url_for
+
+from .responses import choose_encoding
+
+# -------------- Fingerprinted static assets --------------
+#
+# scripts/build_assets.py writes minified, content-hashed copies of the page
+# assets (plus .gz/.br variants) to static/dist/ and a manifest mapping
+# "app.js" -> "app.<hash>.js". Templates call ``asset_url("app.js")``; with a
+# manifest it points at /assets/<hashed name>, served with a one-year
+# immutable Cache-Control so browsers neither download nor revalidate it
+# again. Without a build the plain /static/ file is used.
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class Assets:
+	def __init__(self) -> None:
+		self.dist_dir = ""
+		self.manifest: Dict[str, str] = {}
+		self._manifest_mtime: float | None = None
+		self.auto_reload = False
+
+	def init_app(self, app) -> None:
+		self.dist_dir = os.path.join(app.static_folder, "dist")
+		self.auto_reload = app.debug
+		self.load_manifest()
+		app.add_url_rule("/assets/<path:filename>", "assets", self.serve)
+		app.context_processor(lambda: {"asset_url": self.url})
+
+	def load_manifest(self) -> None:
+		path = os.path.join(self.dist_dir, "manifest.json")
+		try:
+			mtime = os.path.getmtime(path)
+			if mtime == self._manifest_mtime:
+				return
+			with open(path, "r", encoding="utf-8") as fh:
+				self.manifest = json.load(fh)
+			self._manifest_mtime = mtime
+		except (OSError, ValueError):
+			self.manifest = {}
+			self._manifest_mtime = None
+
+	def url(self, name: str) -> str:
+		"""URL of the built asset for ``name``, or its unbuilt /static/ path."""
+		if self.auto_reload:
+			self.load_manifest()
+		hashed = self.manifest.get(name)
+		if hashed is None:
+			return url_for("static", filename=name)
+		return url_for("assets", filename=hashed)
+
+	def serve(self, filename: str):
+		if filename not in self.manifest.values():
+			abort(404)
+		path = os.path.join(self.dist_dir, filename)
+		mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+		available = [enc for enc, suffix in _SUFFIXES.items() if os.path.exists(path + suffix)]
+		encoding = choose_encoding(request.headers.get("Accept-Encoding"), available) if available else None
+		if encoding is not None:
+			resp = send_file(path + _SUFFIXES[encoding], mimetype=mimetype, etag=False, conditional=False, max_age=None)
+			resp.headers["Content-Encoding"] = encoding
+		elif os.path.exists(path):
+			resp = send_file(path, mimetype=mimetype, etag=False, conditional=False, max_age=None)
+		else:
+			abort(404)
+		resp.vary.add("Accept-Encoding")
+		resp.headers["Cache-Control"] = IMMUTABLE
+		return resp
+
+
+# Global asset registry installed by create_app()
+assets = Assets()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load .env if present
@@ -10,7 +11,82 @@ class Config:
 	WAQI_TOKEN: str | None = os.getenv("WAQI_TOKEN")
 	GEMINI_API_KEY: str | None = os.getenv("GEMINI_API_KEY")
 	TEMPO_TOKEN: str | None = os.getenv("TEMPO_TOKEN")
+	# Upstream endpoints; point all three at scripts/upstream_standin.py to run offline
+	OPENWEATHER_BASE_URL: str = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+	NASA_CMR_URL: str = os.getenv("NASA_CMR_URL", "https://cmr.earthdata.nasa.gov")
+	GEMINI_API_ENDPOINT: str = os.getenv("GEMINI_API_ENDPOINT", "")  # empty: Google's endpoint
 	# Optional: rate limits, timeouts
 	REQUEST_TIMEOUT_SECONDS: int = int(os.getenv("REQUEST_TIMEOUT_SECONDS", "15"))
+	# Upstream cache TTLs (seconds) and how long expired entries may still be served
+	OW_CACHE_TTL_SECONDS: int = int(os.getenv("OW_CACHE_TTL_SECONDS", "600"))
+	OW_FORECAST_CACHE_TTL_SECONDS: int = int(os.getenv("OW_FORECAST_CACHE_TTL_SECONDS", "1800"))
+	NASA_CACHE_TTL_SECONDS: int = int(os.getenv("NASA_CACHE_TTL_SECONDS", "3600"))
+	CACHE_STALE_SECONDS: int = int(os.getenv("CACHE_STALE_SECONDS", "600"))
+	# Two-level cache: small per-worker LRU + host-wide shared tier ("sqlite" or "none")
+	LOCAL_CACHE_MAX_ENTRIES: int = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "256"))
+	SHARED_CACHE: str = os.getenv("SHARED_CACHE", "sqlite")
+	SHARED_CACHE_PATH: str = os.getenv(
+		"SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "tempo-vision-cache.sqlite3")
+	)
+	SHARED_CACHE_MAX_ENTRIES: int = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "20000"))
+	# Background refresh of the most requested locations (disable on serverless)
+	BACKGROUND_REFRESH: bool = os.getenv("BACKGROUND_REFRESH", "1") not in ("0", "false", "False")
+	REFRESH_TOP_N: int = int(os.getenv("REFRESH_TOP_N", "20"))
+	REFRESH_AHEAD_SECONDS: int = int(os.getenv("REFRESH_AHEAD_SECONDS", "120"))
+	REFRESH_INTERVAL_SECONDS: int = int(os.getenv("REFRESH_INTERVAL_SECONDS", "30"))
+	# Only locations with a decayed request count of REFRESH_MIN_SCORE (1.5: two requests in a half-life), the last within REFRESH_IDLE_SECONDS, stay warm
+	REFRESH_MIN_SCORE: float = float(os.getenv("REFRESH_MIN_SCORE", "1.5"))
+	REFRESH_IDLE_SECONDS: int = int(os.getenv("REFRESH_IDLE_SECONDS", "3600"))
+	# Logging: "json" (one object per line) or "text"; records beyond the queue are dropped
+	LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+	LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+	LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+	# Prometheus /metrics; workers merge snapshots flushed to METRICS_DIR
+	METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False")
+	METRICS_DIR: str = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-metrics"))
+	METRICS_FLUSH_SECONDS: int = int(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+	# Sampling profiler: fraction of requests sampled (routes can also be armed from
+	# /admin/profile/arm); admin endpoints are disabled while ADMIN_TOKEN is empty
+	ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+	PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+	PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+	PROFILE_MAX_STACKS: int = int(os.getenv("PROFILE_MAX_STACKS", "5000"))
+	PROFILE_DIR: str = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-profiles"))
+	PROFILE_TEMPO_MEMORY: bool = os.getenv("PROFILE_TEMPO_MEMORY", "0") not in ("0", "false", "False")
+	# Response compression (gzip, or brotli when installed) above this size
+	COMPRESS_RESPONSES: bool = os.getenv("COMPRESS_RESPONSES", "1") not in ("0", "false", "False")
+	COMPRESS_MIN_BYTES: int = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+	COMPRESS_LEVEL: int = int(os.getenv("COMPRESS_LEVEL", "6"))
+	BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "5"))
+	# TEMPO export (/api/tempo/export/*): rows encoded and sent per chunk
+	EXPORT_CHUNK_ROWS: int = int(os.getenv("EXPORT_CHUNK_ROWS", "8192"))
+	# TEMPO map tiles (/api/tempo/tiles/*): rendered tiles cached on disk, least recently used evicted
+	TILE_CACHE_DIR: str = os.getenv("TILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-tiles"))
+	TILE_CACHE_MAX_MB: int = int(os.getenv("TILE_CACHE_MAX_MB", "256"))
+	# TEMPO regridding: pixel -> grid cell weights per scan position, "centre" or "area" (from pixel corners)
+	REGRID_METHOD: str = os.getenv("REGRID_METHOD", "centre")
+	REGRID_CACHE_DIR: str = os.getenv("REGRID_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-regrid"))
+	REGRID_MEMORY_ENTRIES: int = int(os.getenv("REGRID_MEMORY_ENTRIES", "8"))
+	REGRID_CACHE_MAX_MB: int = int(os.getenv("REGRID_CACHE_MAX_MB", "512"))
+	# TEMPO file summaries, cached as JSON by file content hash
+	SUMMARY_CACHE_DIR: str = os.getenv("SUMMARY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-summaries"))
+	# TEMPO workspaces (?workspace=): per-workspace memory quota, per-worker budget, idle unload
+	WORKSPACE_DIR: str = os.getenv("WORKSPACE_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-workspaces"))
+	WORKSPACE_QUOTA_MB: int = int(os.getenv("WORKSPACE_QUOTA_MB", "512"))
+	WORKSPACE_MEMORY_MB: int = int(os.getenv("WORKSPACE_MEMORY_MB", "2048"))
+	WORKSPACE_IDLE_SECONDS: int = int(os.getenv("WORKSPACE_IDLE_SECONDS", "1800"))
+	WORKSPACE_MAX: int = int(os.getenv("WORKSPACE_MAX", "16"))
+	# TEMPO uploads: stored by content hash with their cached extractions, least recently used evicted
+	UPLOAD_STORE_DIR: str = os.getenv("UPLOAD_STORE_DIR", os.path.join(tempfile.gettempdir(), "tempo-vision-uploads"))
+	UPLOAD_STORE_MAX_MB: int = int(os.getenv("UPLOAD_STORE_MAX_MB", "2048"))
+	# Live updates (/api/live): one refresh per subscribed location per interval
+	LIVE_INTERVAL_SECONDS: int = int(os.getenv("LIVE_INTERVAL_SECONDS", "300"))
+	LIVE_KEEPALIVE_SECONDS: int = int(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+	LIVE_MAX_SUBSCRIBERS: int = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "64"))
+	# Under gunicorn (gthread) each stream holds a thread: at most GUNICORN_THREADS - LIVE_RESERVED_THREADS streams per worker
+	GUNICORN_THREADS: int = int(os.getenv("GUNICORN_THREADS", "8"))
+	LIVE_RESERVED_THREADS: int = int(os.getenv("LIVE_RESERVED_THREADS", "4"))
 
-
+	# ASGI mode (asgi.py): pooled upstream connections and threads for sync views
+	ASYNC_MAX_CONNECTIONS: int = int(os.getenv("ASYNC_MAX_CONNECTIONS", "1000"))
+	ASYNC_THREADS: int = int(os.getenv("ASYNC_THREADS", "16"))
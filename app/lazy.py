@@ -0,0 +1,57 @@
+"""
+Deferred imports for heavy modules.
+
+``routes.py`` is imported on every cold start (including serverless
+invocations that only serve ``/api/weather``), so pandas, scikit-learn and
+xarray-backed singletons are bound through ``LazyObject`` and only imported
+the first time a route actually touches them.
+"""
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import threading
+from typing import Any
+
+
+class LazyObject:
+	"""Stand-in for ``module.attr`` that imports the module on first attribute access."""
+
+	__slots__ = ("_module", "_attr", "_target", "_lock")
+
+	def __init__(self, module: str, attr: str) -> None:
+		object.__setattr__(self, "_module", module)
+		object.__setattr__(self, "_attr", attr)
+		object.__setattr__(self, "_target", None)
+		object.__setattr__(self, "_lock", threading.Lock())
+
+	def _resolve(self) -> Any:
+		target = object.__getattribute__(self, "_target")
+		if target is None:
+			with object.__getattribute__(self, "_lock"):
+				target = object.__getattribute__(self, "_target")
+				if target is None:
+					module = importlib.import_module(object.__getattribute__(self, "_module"))
+					target = getattr(module, object.__getattribute__(self, "_attr"))
+					object.__setattr__(self, "_target", target)
+		return target
+
+	def __getattr__(self, name: str) -> Any:
+		return getattr(self._resolve(), name)
+
+	def __setattr__(self, name: str, value: Any) -> None:
+		setattr(self._resolve(), name, value)
+
+	def __bool__(self) -> bool:
+		return bool(self._resolve())
+
+	def __repr__(self) -> str:
+		target = object.__getattribute__(self, "_target")
+		where = f"{object.__getattribute__(self, '_module')}.{object.__getattribute__(self, '_attr')}"
+		return repr(target) if target is not None else f"<lazy {where}>"
+
+
+def modules_available(*names: str) -> bool:
+	"""True if all modules can be imported, without importing them."""
+	return all(importlib.util.find_spec(name) is not None for name in names)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+# -------------- Structured, non-blocking logging --------------
+#
+# Modules log through ``logging.getLogger(__name__)``. The "app" logger's only
+# handler puts records on a bounded in-memory queue, and a listener thread
+# formats them (JSON by default) and writes them to stdout. The request thread
+# only merges the message arguments and enqueues. If the queue is full, the
+# record is dropped and counted; a request never waits on stdout. Every
+# record carries the request id of the request that produced it (the
+# incoming X-Request-ID, else a new one), and the response echoes it back.
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+_VALID_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+# Attributes every LogRecord has; anything else was passed via ``extra=``
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def new_request_id(incoming: str | None = None) -> str:
+	"""The client's id when it is a sane token, otherwise a fresh one."""
+	if incoming and _VALID_ID.match(incoming):
+		return incoming
+	return uuid.uuid4().hex[:16]
+
+
+class JsonFormatter(logging.Formatter):
+	def format(self, record: logging.LogRecord) -> str:
+		entry: Dict[str, Any] = {
+			"ts": round(record.created, 3),
+			"level": record.levelname,
+			"logger": record.name,
+			"msg": record.getMessage(),
+			"request_id": getattr(record, "request_id", "-"),
+			"pid": record.process,
+		}
+		for key, value in record.__dict__.items():
+			if key not in _RESERVED and not key.startswith("_"):
+				entry[key] = value
+		if record.exc_info:
+			entry["exc"] = self.formatException(record.exc_info)
+		return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+	def __init__(self) -> None:
+		super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+
+class AsyncHandler(QueueHandler):
+	"""QueueHandler with a bounded queue, drop-on-full and a per-process listener."""
+
+	def __init__(self, target: logging.Handler, max_queue: int = 10000) -> None:
+		super().__init__(queue.Queue(max_queue))
+		self.target = target
+		self.max_queue = max_queue
+		self.dropped = 0
+		self.listener: QueueListener | None = None
+		self._pid: int | None = None
+		self._start_lock = threading.Lock()
+
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		# Runs on the caller's thread: capture the request id and freeze the
+		# message arguments, but leave formatting to the listener
+		record.request_id = request_id.get()
+		record.msg = record.getMessage()
+		record.args = None
+		return record
+
+	def enqueue(self, record: logging.LogRecord) -> None:
+		self._ensure_started()
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
+
+	def _ensure_started(self) -> None:
+		# The listener thread does not survive fork; start one in each worker
+		if self._pid == os.getpid():
+			return
+		with self._start_lock:
+			if self._pid == os.getpid():
+				return
+			self.queue = queue.Queue(self.max_queue)
+			self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+			self.listener.start()
+			self._pid = os.getpid()
+
+	def stop(self) -> None:
+		"""Drain the queue (at exit)."""
+		if self.listener is not None and self._pid == os.getpid():
+			self.listener.stop()
+			self._pid = None
+
+
+class StructuredLogging:
+	def __init__(self) -> None:
+		self.handler: AsyncHandler | None = None
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.configure(cfg.get("LOG_LEVEL", "INFO"), cfg.get("LOG_FORMAT", "json"), int(cfg.get("LOG_QUEUE_SIZE", 10000)))
+		app.before_request(self._before_request)
+		app.after_request(self._after_request)
+		app.teardown_request(self._teardown_request)
+
+	def configure(self, level: str = "INFO", fmt: str = "json", max_queue: int = 10000) -> None:
+		logger = logging.getLogger("app")
+		logger.setLevel(level.upper())
+		logger.propagate = False
+		if self.handler is not None:
+			return  # create_app() called again (tests, scripts): keep the one listener
+		target = logging.StreamHandler(sys.stdout)
+		target.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+		self.handler = AsyncHandler(target, max_queue)
+		logger.addHandler(self.handler)
+		atexit.register(self.handler.stop)
+
+	def _before_request(self) -> None:
+		from flask import g, request
+
+		g.request_id = new_request_id(request.headers.get("X-Request-ID"))
+		g.request_id_token = request_id.set(g.request_id)
+
+	def _after_request(self, response):
+		from flask import g
+
+		if "request_id" in g:
+			response.headers["X-Request-ID"] = g.request_id
+		return response
+
+	def _teardown_request(self, exc) -> None:
+		from flask import g
+
+		token = g.pop("request_id_token", None)
+		if token is not None:
+			try:
+				request_id.reset(token)
+			except ValueError:
+				request_id.set("-")  # streamed responses finish in another context
+
+	@property
+	def dropped(self) -> int:
+		return self.handler.dropped if self.handler is not None else 0
+
+
+# Global logging setup installed by create_app()
+structured_logging = StructuredLogging()
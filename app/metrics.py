@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# -------------- Prometheus metrics --------------
+#
+# Dependency-free counters, gauges and fixed-bucket histograms. Recording is
+# a dict lookup, a bisect and a few additions under a per-metric lock, a few
+# microseconds per request. Each gunicorn worker flushes a JSON snapshot of
+# its series to METRICS_DIR from a background thread; /metrics renders the
+# serving worker's live values merged with the other workers' snapshots, so
+# a scrape sees the whole host whichever worker answers it.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.labelnames = labelnames
+		self._series: Dict[Labels, Any] = {}
+		self._lock = threading.Lock()
+
+	def snapshot(self) -> Dict[str, Any]:
+		with self._lock:
+			series = {json.dumps(labels): self._copy(value) for labels, value in self._series.items()}
+		return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames), "series": series}
+
+	@staticmethod
+	def _copy(value: Any) -> Any:
+		return value
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def inc(self, *labels: str, amount: float = 1) -> None:
+		with self._lock:
+			self._series[labels] = self._series.get(labels, 0) + amount
+
+	def set_total(self, value: float, *labels: str) -> None:
+		"""For running totals kept elsewhere (copied in by a collector)."""
+		with self._lock:
+			self._series[labels] = value
+
+
+class Gauge(_Metric):
+	"""Gauge summed across workers (e.g. in-flight requests)."""
+
+	kind = "gauge"
+
+	def inc(self, *labels: str, amount: float = 1) -> None:
+		with self._lock:
+			self._series[labels] = self._series.get(labels, 0) + amount
+
+	def dec(self, *labels: str, amount: float = 1) -> None:
+		self.inc(*labels, amount=-amount)
+
+	def set(self, value: float, *labels: str) -> None:
+		with self._lock:
+			self._series[labels] = value
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+				 buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+		super().__init__(name, help, labelnames)
+		self.buckets = tuple(sorted(buckets))
+
+	def observe(self, value: float, *labels: str) -> None:
+		idx = bisect.bisect_left(self.buckets, value)
+		with self._lock:
+			series = self._series.get(labels)
+			if series is None:
+				# Per-bucket (non-cumulative) counts with +Inf last, then sum
+				series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+			series[idx] += 1
+			series[-1] += value
+
+	@contextmanager
+	def time(self, *labels: str) -> Iterator[None]:
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - start, *labels)
+
+	def snapshot(self) -> Dict[str, Any]:
+		snap = super().snapshot()
+		snap["buckets"] = list(self.buckets)
+		return snap
+
+	@staticmethod
+	def _copy(value: Any) -> Any:
+		return list(value)
+
+
+def _merge(into: Dict[str, Any], snap: Dict[str, Any]) -> None:
+	for name, metric in snap.items():
+		target = into.setdefault(name, {**metric, "series": {}})
+		for key, value in metric["series"].items():
+			current = target["series"].get(key)
+			if current is None:
+				target["series"][key] = list(value) if isinstance(value, list) else value
+			elif isinstance(value, list):
+				target["series"][key] = [a + b for a, b in zip(current, value)]
+			else:
+				target["series"][key] = current + value
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: List[str], values: List[str], extra: str = "") -> str:
+	parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+	return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snap: Dict[str, Any]) -> str:
+	"""Prometheus text exposition format (0.0.4)."""
+	lines: List[str] = []
+	for name in sorted(snap):
+		metric = snap[name]
+		lines.append(f"# HELP {name} {metric['help']}")
+		lines.append(f"# TYPE {name} {metric['kind']}")
+		names = metric["labelnames"]
+		for key in sorted(metric["series"]):
+			values = json.loads(key)
+			value = metric["series"][key]
+			if metric["kind"] != "histogram":
+				lines.append(f"{name}{_labels(names, values)} {_fmt(value)}")
+				continue
+			cumulative = 0
+			for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-1]):
+				cumulative += count
+				le = 'le="%s"' % (bound if bound == "+Inf" else _fmt(bound))
+				lines.append(f"{name}_bucket{_labels(names, values, le)} {cumulative}")
+			lines.append(f"{name}_sum{_labels(names, values)} {_fmt(value[-1])}")
+			lines.append(f"{name}_count{_labels(names, values)} {cumulative}")
+	return "\n".join(lines) + "\n"
+
+
+class Registry:
+	def __init__(self, directory: str | None = None, flush_interval: float = 5.0) -> None:
+		self.directory = directory or os.path.join(tempfile.gettempdir(), "tempo-vision-metrics")
+		self.flush_interval = flush_interval
+		self.enabled = True
+		self.metrics: Dict[str, _Metric] = {}
+		self.collectors: List[Callable[[], None]] = []
+		self.derived: List[Callable[[Dict[str, Any]], Dict[str, Any]]] = []
+		self._pid: int | None = None
+		self._origin_pid = os.getpid()
+		self._lock = threading.Lock()
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.enabled = bool(cfg.get("METRICS_ENABLED", True))
+		self.directory = cfg.get("METRICS_DIR") or self.directory
+		self.flush_interval = float(cfg.get("METRICS_FLUSH_SECONDS", self.flush_interval))
+		if not self.enabled:
+			return
+		app.before_request(self._before_request)
+		app.after_request(self._after_request)
+		app.teardown_request(self._teardown_request)
+		app.add_url_rule("/metrics", "metrics", self.view)
+
+	# ---- Flask hooks ----
+
+	def _before_request(self) -> None:
+		from flask import g
+
+		self.ensure_started()
+		g.metrics_start = time.perf_counter()
+		g.metrics_in_flight = True
+		http_in_flight.inc()
+
+	def _after_request(self, response):
+		from flask import g, request
+
+		start = g.get("metrics_start")
+		if start is not None:
+			route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+			observe_request(request.method, route, response.status_code, time.perf_counter() - start)
+		return response
+
+	def _teardown_request(self, exc) -> None:
+		from flask import g
+
+		if g.pop("metrics_in_flight", False):
+			http_in_flight.dec()
+
+	def view(self):
+		from flask import Response
+
+		return Response(self.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+	def register(self, metric: _Metric) -> _Metric:
+		self.metrics[metric.name] = metric
+		return metric
+
+	def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+		return self.register(Counter(name, help, labelnames))
+
+	def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+		return self.register(Gauge(name, help, labelnames))
+
+	def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+				  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+		return self.register(Histogram(name, help, labelnames, buckets))
+
+	def add_collector(self, collect: Callable[[], None]) -> None:
+		"""Called before every snapshot to copy stats kept elsewhere into metrics."""
+		self.collectors.append(collect)
+
+	def add_derived(self, derive: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+		"""Metrics computed from the merged host-wide snapshot (e.g. ratios)."""
+		self.derived.append(derive)
+
+	def snapshot(self) -> Dict[str, Any]:
+		for collect in self.collectors:
+			try:
+				collect()
+			except Exception as e:
+				logger.warning("Metrics collector failed: %s", e)
+		return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+	# ---- multi-process ----
+
+	def _path(self, pid: int) -> str:
+		return os.path.join(self.directory, f"{pid}.json")
+
+	def ensure_started(self) -> None:
+		# Threads do not survive fork; (re)start the flusher lazily in each worker
+		if self._pid == os.getpid() or not self.enabled:
+			return
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			if os.getpid() != self._origin_pid:
+				# Forked worker: values recorded in the master (preload) are the master's
+				for metric in self.metrics.values():
+					with metric._lock:
+						metric._series.clear()
+			self._pid = os.getpid()
+			threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+	def _flush_loop(self) -> None:
+		while True:
+			time.sleep(self.flush_interval)
+			self.flush()
+
+	def flush(self) -> None:
+		path = self._path(os.getpid())
+		tmp = f"{path}.tmp"
+		try:
+			os.makedirs(self.directory, exist_ok=True)
+			with open(tmp, "w", encoding="utf-8") as fh:
+				json.dump(self.snapshot(), fh)
+			os.replace(tmp, path)
+		except (OSError, TypeError, ValueError) as e:
+			logger.warning("Metrics flush failed: %s", e)
+
+	def _other_workers(self) -> Iterator[Dict[str, Any]]:
+		try:
+			names = os.listdir(self.directory)
+		except OSError:
+			return
+		for name in names:
+			if not name.endswith(".json"):
+				continue
+			try:
+				pid = int(name[:-5])
+			except ValueError:
+				continue
+			if pid == os.getpid():
+				continue
+			try:
+				os.kill(pid, 0)
+			except ProcessLookupError:
+				try:
+					os.remove(os.path.join(self.directory, name))  # worker exited
+				except OSError:
+					pass
+				continue
+			except PermissionError:
+				pass
+			try:
+				with open(os.path.join(self.directory, name), "r", encoding="utf-8") as fh:
+					yield json.load(fh)
+			except (OSError, ValueError):
+				continue
+
+	def exposition(self) -> str:
+		merged: Dict[str, Any] = {}
+		_merge(merged, self.snapshot())
+		for snap in self._other_workers():
+			_merge(merged, snap)
+		for derive in self.derived:
+			merged.update(derive(merged))
+		return render(merged)
+
+
+# Global registry and the metrics recorded across the app
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "Time to response (first byte for streams)", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being handled")
+upstream_latency = registry.histogram("upstream_request_duration_seconds", "Upstream API call latency", ("upstream",))
+upstream_errors = registry.counter("upstream_errors_total", "Upstream calls that failed or returned non-200", ("upstream",))
+model_duration = registry.histogram("model_operation_duration_seconds", "ML model predict/train time", ("operation", "model"), SLOW_BUCKETS)
+tempo_duration = registry.histogram("tempo_operation_duration_seconds", "TEMPO file read/extract/aggregate/summary time", ("operation",), SLOW_BUCKETS)
+log_dropped = registry.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+cache_lookups = registry.counter("upstream_cache_lookups_total", "Upstream cache lookups by result", ("cache", "result"))
+tile_requests = registry.counter("tempo_tile_requests_total", "TEMPO map tiles by format and cache result", ("format", "result"))
+summary_requests = registry.counter("tempo_summary_requests_total", "TEMPO file summaries by mode and cache result", ("mode", "result"))
+regrid_weights = registry.counter("tempo_regrid_weights_total", "TEMPO regridding weight lookups by source", ("source",))
+workspaces_loaded = registry.gauge("tempo_workspaces", "TEMPO workspaces held in memory")
+workspace_bytes = registry.gauge("tempo_workspace_bytes", "Approximate memory of the TEMPO workspaces held")
+workspace_evictions = registry.counter("tempo_workspace_evictions_total", "TEMPO workspaces unloaded by reason", ("reason",))
+upload_ingests = registry.counter("tempo_uploads_total", "TEMPO uploads by upload store result", ("result",))
+extraction_cache = registry.counter("tempo_extraction_cache_total", "TEMPO extractions by upload store cache result", ("result",))
+upload_evictions = registry.counter("tempo_upload_store_evictions_total", "TEMPO upload store entries evicted for space")
+
+
+def _cache_hit_ratio(merged: Dict[str, Any]) -> Dict[str, Any]:
+	totals: Dict[str, List[float]] = {}
+	for key, value in merged.get(cache_lookups.name, {}).get("series", {}).items():
+		cache, result = json.loads(key)
+		hits_lookups = totals.setdefault(cache, [0, 0])
+		hits_lookups[1] += value
+		if result != "miss":
+			hits_lookups[0] += value
+	series = {json.dumps([cache]): (hits / lookups if lookups else 0.0) for cache, (hits, lookups) in totals.items()}
+	return {"upstream_cache_hit_ratio": {"kind": "gauge", "help": "Hits (fresh or stale) / lookups since start",
+										 "labelnames": ["cache"], "series": series}}
+
+
+registry.add_derived(_cache_hit_ratio)
+
+
+singleflight_calls = registry.counter("upstream_singleflight_total", "Upstream fetches by single-flight role", ("role",))
+
+
+def collect_cache_stats(cache, async_cache=None, flight=None) -> None:
+	"""Copy the running totals of the upstream caches into the lookup counters."""
+	for name, stats in (("sync", cache.stats), ("async", async_cache.stats if async_cache else None)):
+		if stats is None:
+			continue
+		cache_lookups.set_total(stats["hits"], name, "hit")
+		cache_lookups.set_total(stats["stale_hits"], name, "stale")
+		cache_lookups.set_total(stats["misses"], name, "miss")
+	if flight is not None:
+		for role, value in flight.stats.items():
+			singleflight_calls.set_total(value, role)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+	http_latency.observe(seconds, method, route)
+	http_requests.inc(method, route, str(status))
+
+
+def observe_upstream(upstream: str, seconds: float, ok: bool) -> None:
+	upstream_latency.observe(seconds, upstream)
+	if not ok:
+		upstream_errors.inc(upstream)
+
+
+@contextmanager
+def track_upstream(upstream: str) -> Iterator[None]:
+	"""Time an upstream call; an exception counts as an error."""
+	start = time.perf_counter()
+	ok = False
+	try:
+		yield
+		ok = True
+	finally:
+		observe_upstream(upstream, time.perf_counter() - start, ok)
@@ -13,9 +13,14 @@ from sklearn.svm import SVR
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 import json
+import logging
 from datetime import datetime, timedelta
 import os
 
+from app.metrics import model_duration
+
+logger = logging.getLogger(__name__)
+
 
 class WeatherAQIPredictionModel:
     def __init__(self):
@@ -30,6 +35,7 @@ class WeatherAQIPredictionModel:
         self.trained_models = {}
         self.model_performance = {}
         self.feature_names = []
+        self.loaded_mtime = None  # mtime of the model file this instance matches
         
     def prepare_features(self, data):
         """
@@ -92,7 +98,7 @@ class WeatherAQIPredictionModel:
         np.random.seed(42)
         
         # Generate base data
-        dates = pd.date_range(start='2023-01-01', periods=num_samples, freq='H')
+        dates = pd.date_range(start='2023-01-01', periods=num_samples, freq='h')
         
         data = []
         for i, date in enumerate(dates):
@@ -151,6 +157,10 @@ class WeatherAQIPredictionModel:
         """
         Train multiple ML models on the data
         """
+        with model_duration.time('train', 'all'):
+            return self._train_models(data, target_column)
+
+    def _train_models(self, data, target_column='aqi'):
         # Prepare data
         df = self.prepare_features(data)
         
@@ -171,7 +181,7 @@ class WeatherAQIPredictionModel:
         
         # Train each model
         for model_name, model in self.models.items():
-            print(f"Training {model_name}...")
+            logger.debug("Training %s...", model_name)
             
             if model_name == 'svm':
                 # SVM works better with scaled data
@@ -203,7 +213,7 @@ class WeatherAQIPredictionModel:
                 'cv_std': cv_scores.std()
             }
             
-            print(f"{model_name} - R²: {r2:.3f}, RMSE: {rmse:.3f}, MAE: {mae:.3f}")
+            logger.info("%s trained", model_name, extra={"model": model_name, "r2": round(r2, 3), "rmse": round(rmse, 3), "mae": round(mae, 3)})
         
         return self.model_performance
     
@@ -211,6 +221,10 @@ class WeatherAQIPredictionModel:
         """
         Make predictions using trained model
         """
+        with model_duration.time('predict', model_name):
+            return self._predict(input_data, model_name)
+
+    def _predict(self, input_data, model_name='random_forest'):
         if model_name not in self.trained_models:
             raise ValueError(f"Model {model_name} not trained yet")
         
@@ -262,7 +276,7 @@ class WeatherAQIPredictionModel:
                     'hour': future_time.hour
                 })
             except Exception as e:
-                print(f"Error predicting for {future_time}: {e}")
+                logger.warning("Error predicting for %s: %s", future_time, e)
         
         return predictions
     
@@ -281,7 +295,8 @@ class WeatherAQIPredictionModel:
         }
         
         joblib.dump(model_data, filepath)
-        print(f"Model saved to {filepath}")
+        self.loaded_mtime = os.path.getmtime(filepath)
+        logger.info("Model saved to %s", filepath)
     
     def load_model(self, filepath='models/weather_aqi_model.joblib'):
         """
@@ -294,10 +309,24 @@ class WeatherAQIPredictionModel:
             self.label_encoders = model_data['label_encoders']
             self.model_performance = model_data['model_performance']
             self.feature_names = model_data['feature_names']
-            print(f"Model loaded from {filepath}")
+            self.loaded_mtime = os.path.getmtime(filepath)
+            logger.info("Model loaded from %s", filepath)
             return True
         return False
     
+    def reload_if_updated(self, filepath='models/weather_aqi_model.joblib'):
+        """
+        Load the saved model if this instance has none yet or another worker
+        saved a newer one, so workers serve the same model after retraining
+        """
+        try:
+            mtime = os.path.getmtime(filepath)
+        except OSError:
+            return False
+        if self.trained_models and self.loaded_mtime is not None and mtime <= self.loaded_mtime:
+            return False
+        return self.load_model(filepath)
+    
     def get_feature_importance(self, model_name='random_forest'):
         """
         Get feature importance for tree-based models
@@ -3,23 +3,25 @@ NASA Earthdata Integration for Air Quality Prediction
 Provides access to multiple NASA satellite datasets for enhanced predictions
 """
 
+import asyncio
 import requests
 import json
-import numpy as np
-import pandas as pd
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 import os
 
+from app.metrics import observe_upstream
+
 
 class NASAEarthdataClient:
     """
     NASA Earthdata API client for accessing satellite data
     """
     
-    def __init__(self, token: str):
+    def __init__(self, token: str, base_url: str = "https://cmr.earthdata.nasa.gov"):
         self.token = token
-        self.base_url = "https://cmr.earthdata.nasa.gov"
+        self.base_url = base_url.rstrip("/")
         self.earthdata_login_url = "https://urs.earthdata.nasa.gov"
         
         # Headers for authenticated requests
@@ -40,6 +42,49 @@ class NASAEarthdataClient:
             'gpm_precipitation': 'C1598621093-GES_DISC'  # GPM Precipitation
         }
     
+    # Location analyses: kind -> (collection key, bbox half-width in degrees,
+    # page size, label used in error messages)
+    ANALYSES = {
+        'aerosol': ('modis_aerosol', 0.5, 20, 'MODIS aerosol data retrieval'),
+        'fire': ('modis_fire', 2.0, 15, 'Fire data retrieval'),  # Larger area for fires
+        'precipitation': ('gpm_precipitation', 1.0, 10, 'Precipitation data retrieval'),
+    }
+
+    # Look-back window (days) of each analysis in the comprehensive report
+    COMPREHENSIVE_DAYS = {'aerosol': 7, 'fire': 7, 'precipitation': 3}
+
+    def search_params(self, collection_id: str, bbox: Tuple[float, float, float, float],
+                      start_date: str, end_date: str, limit: int = 10) -> Tuple[str, Dict[str, Any]]:
+        """
+        URL and query parameters of a CMR granule search
+        """
+        west, south, east, north = bbox
+        params = {
+            'collection_concept_id': collection_id,
+            'bounding_box': f'{west},{south},{east},{north}',
+            'temporal': f'{start_date}T00:00:00Z,{end_date}T23:59:59Z',
+            'page_size': limit,
+            'sort_key': '-start_date'
+        }
+        return f"{self.base_url}/search/granules.json", params
+
+    def parse_search_response(self, response) -> Dict[str, Any]:
+        """
+        Search result from an HTTP response (``requests`` or ``httpx``)
+        """
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                'success': True,
+                'results': data.get('feed', {}).get('entry', []),
+                'total_hits': data.get('feed', {}).get('opensearch:totalResults', 0)
+            }
+        return {
+            'success': False,
+            'error': f'API request failed: {response.status_code}',
+            'message': response.text
+        }
+
     def search_granules(self, collection_id: str, bbox: Tuple[float, float, float, float], 
                        start_date: str, end_date: str, limit: int = 10) -> Dict[str, Any]:
         """
@@ -52,220 +97,227 @@ class NASAEarthdataClient:
             end_date: End date (YYYY-MM-DD)
             limit: Maximum number of results
         """
+        start = time.perf_counter()
         try:
-            west, south, east, north = bbox
-            
-            params = {
-                'collection_concept_id': collection_id,
-                'bounding_box': f'{west},{south},{east},{north}',
-                'temporal': f'{start_date}T00:00:00Z,{end_date}T23:59:59Z',
-                'page_size': limit,
-                'sort_key': '-start_date'
-            }
-            
-            url = f"{self.base_url}/search/granules.json"
+            url, params = self.search_params(collection_id, bbox, start_date, end_date, limit)
             response = requests.get(url, params=params, headers=self.headers)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    'success': True,
-                    'results': data.get('feed', {}).get('entry', []),
-                    'total_hits': data.get('feed', {}).get('opensearch:totalResults', 0)
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'API request failed: {response.status_code}',
-                    'message': response.text
-                }
+            result = self.parse_search_response(response)
                 
         except Exception as e:
-            return {
+            result = {
                 'success': False,
                 'error': f'Search failed: {str(e)}'
             }
+        observe_upstream('cmr', time.perf_counter() - start, result['success'])
+        return result
+
+    async def search_granules_async(self, client, collection_id: str, bbox: Tuple[float, float, float, float],
+                                    start_date: str, end_date: str, limit: int = 10) -> Dict[str, Any]:
+        """
+        ``search_granules`` over an asyncio HTTP client (``httpx.AsyncClient``)
+        """
+        start = time.perf_counter()
+        try:
+            url, params = self.search_params(collection_id, bbox, start_date, end_date, limit)
+            response = await client.get(url, params=params, headers=self.headers)
+            result = self.parse_search_response(response)
+
+        except Exception as e:
+            result = {
+                'success': False,
+                'error': f'Search failed: {str(e)}'
+            }
+        observe_upstream('cmr', time.perf_counter() - start, result['success'])
+        return result
+
+    def analysis_query(self, kind: str, lat: float, lon: float, days_back: int) -> Dict[str, Any]:
+        """
+        ``search_granules`` arguments for one location analysis
+        """
+        collection, pad, limit, _ = self.ANALYSES[kind]
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days_back)
+        return {
+            'collection_id': self.collections[collection],
+            'bbox': (lon - pad, lat - pad, lon + pad, lat + pad),
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'limit': limit
+        }
+
+    def analysis_result(self, kind: str, lat: float, lon: float, query: Dict[str, Any],
+                        results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Turn granule search results into the analysis response for ``kind``
+        """
+        builders = {
+            'aerosol': self._aerosol_result,
+            'fire': self._fire_result,
+            'precipitation': self._precipitation_result,
+        }
+        try:
+            return builders[kind](lat, lon, query, results)
+        except Exception as e:
+            return self._analysis_error(kind, lat, lon, e)
+
+    def _analysis_error(self, kind: str, lat: float, lon: float, error: Exception) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'location': {'lat': lat, 'lon': lon},
+            'error': f'{self.ANALYSES[kind][3]} failed: {str(error)}'
+        }
+
+    def get_analysis(self, kind: str, lat: float, lon: float, days_back: int) -> Dict[str, Any]:
+        try:
+            query = self.analysis_query(kind, lat, lon, days_back)
+            results = self.search_granules(**query)
+        except Exception as e:
+            return self._analysis_error(kind, lat, lon, e)
+        return self.analysis_result(kind, lat, lon, query, results)
+
+    async def get_analysis_async(self, client, kind: str, lat: float, lon: float, days_back: int) -> Dict[str, Any]:
+        try:
+            query = self.analysis_query(kind, lat, lon, days_back)
+            results = await self.search_granules_async(client, **query)
+        except Exception as e:
+            return self._analysis_error(kind, lat, lon, e)
+        return self.analysis_result(kind, lat, lon, query, results)
     
     def get_modis_aerosol_data(self, lat: float, lon: float, days_back: int = 7) -> Dict[str, Any]:
         """
         Get MODIS aerosol data for air quality analysis
         """
-        try:
-            # Define bounding box around location (±0.5 degrees)
-            bbox = (lon - 0.5, lat - 0.5, lon + 0.5, lat + 0.5)
-            
-            # Date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days_back)
-            
-            # Search for MODIS aerosol data
-            results = self.search_granules(
-                collection_id=self.collections['modis_aerosol'],
-                bbox=bbox,
-                start_date=start_date.strftime('%Y-%m-%d'),
-                end_date=end_date.strftime('%Y-%m-%d'),
-                limit=20
-            )
-            
-            if results['success'] and results['results']:
-                # Process results
-                aerosol_data = []
-                for granule in results['results']:
-                    data_point = {
-                        'title': granule.get('title', ''),
-                        'start_date': granule.get('time_start', ''),
-                        'end_date': granule.get('time_end', ''),
-                        'bbox': granule.get('boxes', []),
-                        'download_url': granule.get('links', [{}])[0].get('href', '') if granule.get('links') else ''
-                    }
-                    aerosol_data.append(data_point)
-                
-                return {
-                    'success': True,
-                    'data_type': 'MODIS_Aerosol',
-                    'location': {'lat': lat, 'lon': lon},
-                    'date_range': f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-                    'granules_found': len(aerosol_data),
-                    'granules': aerosol_data[:10],  # Limit to 10 for response size
-                    'estimated_aod': self._estimate_aod_from_metadata(aerosol_data),
-                    'air_quality_impact': self._assess_aerosol_impact(aerosol_data)
-                }
-            else:
-                return {
-                    'success': False,
-                    'location': {'lat': lat, 'lon': lon},
-                    'error': 'No MODIS aerosol data found for location and date range'
+        return self.get_analysis('aerosol', lat, lon, days_back)
+
+    def _aerosol_result(self, lat: float, lon: float, query: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        if results['success'] and results['results']:
+            # Process results
+            aerosol_data = []
+            for granule in results['results']:
+                data_point = {
+                    'title': granule.get('title', ''),
+                    'start_date': granule.get('time_start', ''),
+                    'end_date': granule.get('time_end', ''),
+                    'bbox': granule.get('boxes', []),
+                    'download_url': granule.get('links', [{}])[0].get('href', '') if granule.get('links') else ''
                 }
-                
-        except Exception as e:
+                aerosol_data.append(data_point)
+            
+            return {
+                'success': True,
+                'data_type': 'MODIS_Aerosol',
+                'location': {'lat': lat, 'lon': lon},
+                'date_range': f"{query['start_date']} to {query['end_date']}",
+                'granules_found': len(aerosol_data),
+                'granules': aerosol_data[:10],  # Limit to 10 for response size
+                'estimated_aod': self._estimate_aod_from_metadata(aerosol_data),
+                'air_quality_impact': self._assess_aerosol_impact(aerosol_data)
+            }
+        else:
             return {
                 'success': False,
                 'location': {'lat': lat, 'lon': lon},
-                'error': f'MODIS aerosol data retrieval failed: {str(e)}'
+                'error': 'No MODIS aerosol data found for location and date range'
             }
     
     def get_fire_data(self, lat: float, lon: float, days_back: int = 7) -> Dict[str, Any]:
         """
         Get MODIS fire data to assess air quality impact from fires
         """
-        try:
-            bbox = (lon - 2.0, lat - 2.0, lon + 2.0, lat + 2.0)  # Larger area for fires
-            
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days_back)
+        return self.get_analysis('fire', lat, lon, days_back)
+
+    def _fire_result(self, lat: float, lon: float, query: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        if results['success'] and results['results']:
+            fire_data = []
+            for granule in results['results']:
+                fire_data.append({
+                    'title': granule.get('title', ''),
+                    'date': granule.get('time_start', ''),
+                    'bbox': granule.get('boxes', [])
+                })
             
-            results = self.search_granules(
-                collection_id=self.collections['modis_fire'],
-                bbox=bbox,
-                start_date=start_date.strftime('%Y-%m-%d'),
-                end_date=end_date.strftime('%Y-%m-%d'),
-                limit=15
-            )
+            fire_risk = self._assess_fire_impact(fire_data, lat, lon)
             
-            if results['success'] and results['results']:
-                fire_data = []
-                for granule in results['results']:
-                    fire_data.append({
-                        'title': granule.get('title', ''),
-                        'date': granule.get('time_start', ''),
-                        'bbox': granule.get('boxes', [])
-                    })
-                
-                fire_risk = self._assess_fire_impact(fire_data, lat, lon)
-                
-                return {
-                    'success': True,
-                    'data_type': 'MODIS_Fire',
-                    'location': {'lat': lat, 'lon': lon},
-                    'fires_detected': len(fire_data),
-                    'fire_risk_level': fire_risk['level'],
-                    'fire_impact_score': fire_risk['score'],
-                    'air_quality_warning': fire_risk['warning'],
-                    'granules': fire_data[:10]
-                }
-            else:
-                return {
-                    'success': True,
-                    'data_type': 'MODIS_Fire',
-                    'location': {'lat': lat, 'lon': lon},
-                    'fires_detected': 0,
-                    'fire_risk_level': 'Low',
-                    'fire_impact_score': 0,
-                    'air_quality_warning': 'No significant fire impact detected'
-                }
-                
-        except Exception as e:
             return {
-                'success': False,
+                'success': True,
+                'data_type': 'MODIS_Fire',
+                'location': {'lat': lat, 'lon': lon},
+                'fires_detected': len(fire_data),
+                'fire_risk_level': fire_risk['level'],
+                'fire_impact_score': fire_risk['score'],
+                'air_quality_warning': fire_risk['warning'],
+                'granules': fire_data[:10]
+            }
+        else:
+            return {
+                'success': True,
+                'data_type': 'MODIS_Fire',
                 'location': {'lat': lat, 'lon': lon},
-                'error': f'Fire data retrieval failed: {str(e)}'
+                'fires_detected': 0,
+                'fire_risk_level': 'Low',
+                'fire_impact_score': 0,
+                'air_quality_warning': 'No significant fire impact detected'
             }
     
     def get_precipitation_data(self, lat: float, lon: float, days_back: int = 3) -> Dict[str, Any]:
         """
         Get GPM precipitation data for weather impact analysis
         """
-        try:
-            bbox = (lon - 1.0, lat - 1.0, lon + 1.0, lat + 1.0)
-            
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days_back)
+        return self.get_analysis('precipitation', lat, lon, days_back)
+
+    def _precipitation_result(self, lat: float, lon: float, query: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        if results['success'] and results['results']:
+            precip_data = []
+            for granule in results['results']:
+                precip_data.append({
+                    'title': granule.get('title', ''),
+                    'date': granule.get('time_start', ''),
+                    'type': 'GPM_Precipitation'
+                })
             
-            results = self.search_granules(
-                collection_id=self.collections['gpm_precipitation'],
-                bbox=bbox,
-                start_date=start_date.strftime('%Y-%m-%d'),
-                end_date=end_date.strftime('%Y-%m-%d'),
-                limit=10
-            )
+            weather_impact = self._assess_precipitation_impact(precip_data)
             
-            if results['success'] and results['results']:
-                precip_data = []
-                for granule in results['results']:
-                    precip_data.append({
-                        'title': granule.get('title', ''),
-                        'date': granule.get('time_start', ''),
-                        'type': 'GPM_Precipitation'
-                    })
-                
-                weather_impact = self._assess_precipitation_impact(precip_data)
-                
-                return {
-                    'success': True,
-                    'data_type': 'GPM_Precipitation',
-                    'location': {'lat': lat, 'lon': lon},
-                    'precipitation_events': len(precip_data),
-                    'weather_impact': weather_impact,
-                    'air_quality_effect': 'Precipitation generally improves air quality by washing out pollutants',
-                    'granules': precip_data
-                }
-            else:
-                return {
-                    'success': True,
-                    'data_type': 'GPM_Precipitation',
-                    'location': {'lat': lat, 'lon': lon},
-                    'precipitation_events': 0,
-                    'weather_impact': 'Dry conditions - pollutants may accumulate',
-                    'air_quality_effect': 'Limited precipitation, potential for pollutant buildup'
-                }
-                
-        except Exception as e:
             return {
-                'success': False,
+                'success': True,
+                'data_type': 'GPM_Precipitation',
                 'location': {'lat': lat, 'lon': lon},
-                'error': f'Precipitation data retrieval failed: {str(e)}'
+                'precipitation_events': len(precip_data),
+                'weather_impact': weather_impact,
+                'air_quality_effect': 'Precipitation generally improves air quality by washing out pollutants',
+                'granules': precip_data
+            }
+        else:
+            return {
+                'success': True,
+                'data_type': 'GPM_Precipitation',
+                'location': {'lat': lat, 'lon': lon},
+                'precipitation_events': 0,
+                'weather_impact': 'Dry conditions - pollutants may accumulate',
+                'air_quality_effect': 'Limited precipitation, potential for pollutant buildup'
             }
     
     def get_comprehensive_analysis(self, lat: float, lon: float) -> Dict[str, Any]:
         """
         Get comprehensive NASA Earth data analysis for air quality prediction
         """
+        analyses = [self.get_analysis(kind, lat, lon, days) for kind, days in self.COMPREHENSIVE_DAYS.items()]
+        return self.combine_analysis(lat, lon, *analyses)
+
+    async def get_comprehensive_analysis_async(self, client, lat: float, lon: float) -> Dict[str, Any]:
+        """
+        Comprehensive analysis with the three granule searches running concurrently
+        """
+        analyses = await asyncio.gather(*(
+            self.get_analysis_async(client, kind, lat, lon, days) for kind, days in self.COMPREHENSIVE_DAYS.items()
+        ))
+        return self.combine_analysis(lat, lon, *analyses)
+
+    def combine_analysis(self, lat: float, lon: float, aerosol_data: Dict[str, Any], fire_data: Dict[str, Any],
+                         precip_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Combine the aerosol, fire and precipitation analyses into one report
+        """
         try:
-            # Get all data types
-            aerosol_data = self.get_modis_aerosol_data(lat, lon, days_back=7)
-            fire_data = self.get_fire_data(lat, lon, days_back=7)
-            precip_data = self.get_precipitation_data(lat, lon, days_back=3)
-            
             # Combine into comprehensive analysis
             analysis = {
                 'success': True,
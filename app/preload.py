@@ -0,0 +1,61 @@
+"""
+Warm-up for preload-and-fork serving.
+
+With gunicorn's ``preload_app`` the master imports the app once; calling
+``warm_up()`` there also loads the model registry and, optionally, a TEMPO
+granule's extracted columns before workers fork, so every worker shares
+those pages copy-on-write instead of loading private copies.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(tempo_file: str | None = None) -> Dict[str, Any]:
+	"""Load shared read-mostly state in the current (master) process."""
+	report: Dict[str, Any] = {"pid": os.getpid(), "model_loaded": False, "tempo_rows": 0}
+
+	# routes.py defers these imports for cold starts; the master imports them
+	# up front so workers share the loaded modules instead of importing their own
+	import pandas  # noqa: F401
+	from .services import aqi, forecast  # noqa: F401
+	from .lazy import modules_available
+	if modules_available("xarray", "netCDF4"):
+		from . import tempo_processor  # noqa: F401
+
+	from .ml_model import prediction_model
+	try:
+		report["model_loaded"] = bool(prediction_model.reload_if_updated()) or bool(prediction_model.trained_models)
+	except Exception as e:
+		logger.warning("Preload: model load failed: %s", e)
+
+	tempo_file = tempo_file or os.getenv("TEMPO_PRELOAD_FILE")
+	if tempo_file:
+		try:
+			# Into the default workspace, whose manifest then names this file for every worker
+			from .services.workspaces import DEFAULT_WORKSPACE, workspaces
+			workspace = workspaces.get(DEFAULT_WORKSPACE)
+			workspace.load(tempo_file)
+			observations = workspace.extract()
+			report["tempo_rows"] = len(observations)
+			report["tempo_bytes"] = observations.nbytes
+		except Exception as e:
+			logger.warning("Preload: TEMPO file %s not loaded: %s", tempo_file, e)
+
+	return report
+
+
+def freeze_heap() -> None:
+	"""Move everything allocated so far out of the collector's reach.
+
+	A full collection touches every tracked object's header, which would
+	copy each shared page into the worker; ``gc.freeze()`` avoids that.
+	"""
+	gc.collect()
+	gc.freeze()
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from flask import Response, g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# -------------- Sampling profiler and TEMPO memory snapshots --------------
+#
+# A request is profiled when it falls in PROFILE_SAMPLE_RATE or its route has
+# been armed from the admin endpoint. While at least one profiled request is
+# running, a daemon thread wakes every PROFILE_INTERVAL_MS, reads the stacks
+# of those request threads with ``sys._current_frames()`` and counts them in
+# collapsed ("folded") form, the input format of flamegraph.pl, speedscope
+# and inferno. Unprofiled requests pay one random() call.
+#
+# TEMPO read/extract can instead run under tracemalloc when armed; each run
+# records peak traced memory and the source lines holding what it allocated.
+#
+# Arming is a small control file and samples are flushed per worker to
+# PROFILE_DIR, so an arm or a download reaches every gunicorn worker.
+
+MAX_DEPTH = 128
+TRUNCATED = "[truncated]"
+
+
+@functools.lru_cache(maxsize=4096)
+def _where(filename: str) -> str:
+	parts = filename.replace("\\", "/").split("/")
+	return "/".join(parts[-2:])
+
+
+def collapse(frame, limit: int = MAX_DEPTH) -> str:
+	"""Root-first ``;``-joined frame names of a stack."""
+	names: List[str] = []
+	while frame is not None and len(names) < limit:
+		code = frame.f_code
+		names.append(f"{code.co_name} ({_where(code.co_filename)}:{code.co_firstlineno})".replace(";", ","))
+		frame = frame.f_back
+	return ";".join(reversed(names))
+
+
+def admin_required(view):
+	"""ADMIN_TOKEN as ``Authorization: Bearer`` or ``X-Admin-Token``; 404 when no token is configured."""
+	@functools.wraps(view)
+	def wrapper(*args: Any, **kwargs: Any):
+		from flask import current_app
+
+		token = current_app.config.get("ADMIN_TOKEN") or ""
+		if not token:
+			return jsonify({"error": "Not found"}), 404
+		given = request.headers.get("X-Admin-Token", "")
+		auth = request.headers.get("Authorization", "")
+		if auth.startswith("Bearer "):
+			given = auth[7:]
+		if not hmac.compare_digest(given.encode("utf-8"), token.encode("utf-8")):
+			return jsonify({"error": "Unauthorized"}), 401
+		return view(*args, **kwargs)
+	return wrapper
+
+
+class Profiler:
+	def __init__(self, directory: str | None = None, sample_rate: float = 0.0, interval: float = 0.005,
+				 max_stacks: int = 5000, memory_top: int = 25) -> None:
+		self.directory = directory or os.path.join(tempfile.gettempdir(), "tempo-vision-profiles")
+		self.sample_rate = sample_rate
+		self.interval = interval
+		self.max_stacks = max_stacks
+		self.memory_top = memory_top
+		self.memory_always = False
+		self.stacks: Dict[str, Dict[str, int]] = {}
+		self.memory_reports: "deque[Dict[str, Any]]" = deque(maxlen=20)
+		self._active: Dict[int, str] = {}
+		self._dirty = False
+		self._control: Dict[str, Any] = {}
+		self._control_mtime: float | None = None
+		self._control_checked = 0.0
+		self._lock = threading.Lock()
+		self._memory_lock = threading.Lock()
+		self._wake = threading.Event()
+		self._pid: int | None = None
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.directory = cfg.get("PROFILE_DIR") or self.directory
+		self.sample_rate = float(cfg.get("PROFILE_SAMPLE_RATE", self.sample_rate))
+		self.interval = float(cfg.get("PROFILE_INTERVAL_MS", self.interval * 1000)) / 1000
+		self.max_stacks = int(cfg.get("PROFILE_MAX_STACKS", self.max_stacks))
+		self.memory_always = bool(cfg.get("PROFILE_TEMPO_MEMORY", False))
+		app.before_request(self._before_request)
+		app.teardown_request(self._teardown_request)
+		app.add_url_rule("/admin/profile", "profile_status", admin_required(self.status_view))
+		app.add_url_rule("/admin/profile/arm", "profile_arm", admin_required(self.arm_view), methods=["POST"])
+		app.add_url_rule("/admin/profile/stacks", "profile_stacks", admin_required(self.stacks_view),
+						 methods=["GET", "DELETE"])
+		app.add_url_rule("/admin/profile/memory", "profile_memory", admin_required(self.memory_view),
+						 methods=["GET", "POST", "DELETE"])
+
+	# ---- control file (arming shared by all workers) ----
+
+	def _path(self, name: str) -> str:
+		return os.path.join(self.directory, name)
+
+	def control(self) -> Dict[str, Any]:
+		"""Armed routes/memory mode, re-read at most once a second."""
+		now = time.monotonic()
+		if now - self._control_checked < 1.0:
+			return self._control
+		self._control_checked = now
+		try:
+			mtime = os.path.getmtime(self._path("control.json"))
+			if mtime != self._control_mtime:
+				with open(self._path("control.json"), "r", encoding="utf-8") as fh:
+					self._control = json.load(fh)
+				self._control_mtime = mtime
+		except (OSError, ValueError):
+			self._control, self._control_mtime = {}, None
+		return self._control
+
+	def _write_json(self, name: str, data: Any) -> None:
+		os.makedirs(self.directory, exist_ok=True)
+		tmp = self._path(f"{name}.{os.getpid()}.tmp")
+		with open(tmp, "w", encoding="utf-8") as fh:
+			json.dump(data, fh)
+		os.replace(tmp, self._path(name))
+
+	def arm(self, route: str | None = None, seconds: float = 60, memory: bool = False) -> Dict[str, Any]:
+		self._control_checked = 0.0
+		control = dict(self.control())
+		now = time.time()
+		routes = {r: until for r, until in control.get("routes", {}).items() if until > now}
+		if route:
+			routes[route] = now + seconds
+		control["routes"] = routes
+		if memory:
+			control["memory_until"] = now + seconds
+		self._write_json("control.json", control)
+		self._control, self._control_checked = control, 0.0
+		return control
+
+	# ---- stack sampling ----
+
+	def _before_request(self) -> None:
+		if request.url_rule is None:
+			return
+		route = request.url_rule.rule
+		armed = self.control().get("routes", {}).get(route, 0) > time.time()
+		if not armed and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+			return
+		self._ensure_started()
+		g.profile_thread = threading.get_ident()
+		with self._lock:
+			self._active[g.profile_thread] = route
+		self._wake.set()
+
+	def _teardown_request(self, exc) -> None:
+		ident = g.pop("profile_thread", None)
+		if ident is not None:
+			with self._lock:
+				self._active.pop(ident, None)
+
+	def _ensure_started(self) -> None:
+		# Threads do not survive fork; (re)start the sampler lazily in each worker
+		if self._pid == os.getpid():
+			return
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			self._active.clear()
+			self.stacks = {}
+			threading.Thread(target=self._loop, name="profiler", daemon=True).start()
+			self._pid = os.getpid()
+
+	def _loop(self) -> None:
+		while True:
+			if not self._active:
+				if self._dirty:
+					self.flush()
+				self._wake.wait()
+				self._wake.clear()
+				continue
+			time.sleep(self.interval)
+			try:
+				self.sample()
+			except Exception as e:
+				logger.warning("Profiler sample failed: %s", e)
+
+	def sample(self) -> None:
+		frames = sys._current_frames()
+		with self._lock:
+			for ident, route in self._active.items():
+				frame = frames.get(ident)
+				if frame is None:
+					continue
+				stack = collapse(frame)
+				counts = self.stacks.setdefault(route, {})
+				if stack not in counts and len(counts) >= self.max_stacks:
+					stack = TRUNCATED
+				counts[stack] = counts.get(stack, 0) + 1
+				self._dirty = True
+
+	def flush(self) -> None:
+		with self._lock:
+			data = {route: dict(counts) for route, counts in self.stacks.items()}
+			self._dirty = False
+		try:
+			self._write_json(f"stacks-{os.getpid()}.json", data)
+		except OSError as e:
+			logger.warning("Profiler flush failed: %s", e)
+
+	def _worker_files(self, prefix: str) -> Iterator[str]:
+		try:
+			names = os.listdir(self.directory)
+		except OSError:
+			return
+		own = f"{prefix}{os.getpid()}.json"
+		for name in names:
+			if name.startswith(prefix) and name.endswith(".json") and name != own:
+				yield self._path(name)
+
+	def merged_stacks(self) -> Dict[str, Dict[str, int]]:
+		"""This worker's live counts plus every other worker's (including exited ones)."""
+		with self._lock:
+			merged = {route: dict(counts) for route, counts in self.stacks.items()}
+		for path in self._worker_files("stacks-"):
+			try:
+				with open(path, "r", encoding="utf-8") as fh:
+					other = json.load(fh)
+			except (OSError, ValueError):
+				continue
+			for route, counts in other.items():
+				target = merged.setdefault(route, {})
+				for stack, count in counts.items():
+					target[stack] = target.get(stack, 0) + count
+		return merged
+
+	def folded(self, route: str | None = None) -> str:
+		"""Collapsed stacks; without ``route`` each stack is rooted at its route."""
+		lines = []
+		for name, counts in sorted(self.merged_stacks().items()):
+			if route is not None and name != route:
+				continue
+			prefix = "" if route is not None else f"{name};"
+			lines.extend(f"{prefix}{stack} {count}" for stack, count in counts.items())
+		return "\n".join(sorted(lines)) + ("\n" if lines else "")
+
+	def reset(self) -> None:
+		with self._lock:
+			self.stacks = {}
+			self._dirty = False
+		for path in list(self._worker_files("stacks-")) + [self._path(f"stacks-{os.getpid()}.json")]:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+
+	# ---- TEMPO memory snapshots ----
+
+	def memory_armed(self) -> bool:
+		return self.memory_always or self.control().get("memory_until", 0) > time.time()
+
+	@contextmanager
+	def trace_memory(self, operation: str) -> Iterator[None]:
+		"""tracemalloc around a TEMPO step when armed; one traced run at a time."""
+		if not self.memory_armed() or tracemalloc.is_tracing() or not self._memory_lock.acquire(blocking=False):
+			yield
+			return
+		start = time.perf_counter()
+		tracemalloc.start(25)
+		try:
+			yield
+		finally:
+			try:
+				snapshot = tracemalloc.take_snapshot()
+				current, peak = tracemalloc.get_traced_memory()
+			finally:
+				tracemalloc.stop()
+				self._memory_lock.release()
+			snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+			self._record_memory(operation, time.perf_counter() - start, current, peak, snapshot)
+
+	def _record_memory(self, operation: str, seconds: float, current: int, peak: int, snapshot) -> None:
+		top = []
+		for stat in snapshot.statistics("lineno")[:self.memory_top]:
+			frame = stat.traceback[0]
+			top.append({"where": f"{_where(frame.filename)}:{frame.lineno}", "bytes": stat.size, "blocks": stat.count})
+		report = {"operation": operation, "pid": os.getpid(), "at": time.time(), "seconds": round(seconds, 3),
+				  "peak_bytes": peak, "retained_bytes": current, "top": top}
+		self.memory_reports.append(report)
+		try:
+			self._write_json(f"memory-{os.getpid()}.json", list(self.memory_reports))
+		except OSError as e:
+			logger.warning("Profiler memory report not saved: %s", e)
+
+	def merged_memory_reports(self) -> List[Dict[str, Any]]:
+		reports = list(self.memory_reports)
+		for path in self._worker_files("memory-"):
+			try:
+				with open(path, "r", encoding="utf-8") as fh:
+					reports.extend(json.load(fh))
+			except (OSError, ValueError):
+				continue
+		return sorted(reports, key=lambda r: r["at"], reverse=True)
+
+	# ---- admin views ----
+
+	def status_view(self):
+		control = self.control()
+		now = time.time()
+		return jsonify({
+			"sample_rate": self.sample_rate,
+			"interval_ms": self.interval * 1000,
+			"armed_routes": {r: round(until - now) for r, until in control.get("routes", {}).items() if until > now},
+			"memory_armed": self.memory_armed(),
+			"samples": {route: sum(counts.values()) for route, counts in self.merged_stacks().items()},
+		})
+
+	def arm_view(self):
+		try:
+			body = request.get_json(silent=True) or {}
+			route = body.get("route")
+			seconds = float(body.get("seconds", 60))
+			if route is not None:
+				from flask import current_app
+
+				if route not in {rule.rule for rule in current_app.url_map.iter_rules()}:
+					return jsonify({"error": f"Unknown route: {route}"}), 400
+			self.arm(route, seconds, memory=bool(body.get("memory")))
+			return self.status_view()
+		except (TypeError, ValueError) as e:
+			return jsonify({"error": f"Invalid request: {e}"}), 400
+		except OSError as e:
+			return jsonify({"error": str(e)}), 500
+
+	def stacks_view(self):
+		if request.method == "DELETE":
+			self.reset()
+			return jsonify({"status": "reset"})
+		body = self.folded(request.args.get("route"))
+		resp = Response(body, content_type="text/plain; charset=utf-8")
+		resp.headers["Content-Disposition"] = "attachment; filename=profile.folded"
+		return resp
+
+	def memory_view(self):
+		if request.method == "POST":
+			body = request.get_json(silent=True) or {}
+			try:
+				self.arm(seconds=float(body.get("seconds", 300)), memory=True)
+			except (TypeError, ValueError) as e:
+				return jsonify({"error": f"Invalid request: {e}"}), 400
+			return jsonify({"memory_armed": True})
+		if request.method == "DELETE":
+			self.memory_reports.clear()
+			for path in list(self._worker_files("memory-")) + [self._path(f"memory-{os.getpid()}.json")]:
+				try:
+					os.remove(path)
+				except OSError:
+					pass
+			return jsonify({"status": "reset"})
+		return jsonify({"reports": self.merged_memory_reports()})
+
+
+# Global profiler installed by create_app()
+profiler = Profiler()
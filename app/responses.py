@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import functools
+import gzip
+import hashlib
+import time
+from typing import Any, Callable, Iterable, Tuple
+
+from flask import make_response, request
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+try:  # Optional: brotli is preferred when installed, gzip otherwise
+	import brotli
+except ImportError:  # pragma: no cover
+	brotli = None
+
+from app.services.cache import upstream_cache
+from app.services.external import quantize_location
+
+# -------------- Response compression and conditional GET --------------
+#
+# Bodies of compressible types are gzip/brotli encoded according to
+# Accept-Encoding. Views wrapped in ``conditional`` carry a weak ETag derived
+# from the version of the data they read (cache entry timestamps, the loaded
+# TEMPO file); when it matches If-None-Match the view is not run at all and a
+# bodiless 304 is returned.
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/css", "text/plain", "text/csv",
+					  "application/javascript", "text/javascript", "image/svg+xml")
+
+
+def choose_encoding(accept_encoding: str | None, supported: Iterable[str] | None = None) -> str | None:
+	"""Best content coding for an Accept-Encoding header value among ``supported``
+	(default: what this process can compress on the fly)."""
+	if supported is None:
+		supported = ("br", "gzip") if brotli is not None else ("gzip",)
+	accept = parse_accept_header(accept_encoding or "", Accept)
+	br = accept.quality("br") if "br" in supported else 0
+	gz = accept.quality("gzip") if "gzip" in supported else 0
+	if br > 0 and br >= gz:
+		return "br"
+	if gz > 0:
+		return "gzip"
+	return None
+
+
+def compress_body(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+	if encoding == "br":
+		return brotli.compress(data, quality=brotli_quality)
+	return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class Compressor:
+	"""``after_request`` hook encoding buffered responses for the client."""
+
+	def __init__(self, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5) -> None:
+		self.min_bytes = min_bytes
+		self.gzip_level = gzip_level
+		self.brotli_quality = brotli_quality
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.min_bytes = int(cfg.get("COMPRESS_MIN_BYTES", self.min_bytes))
+		self.gzip_level = int(cfg.get("COMPRESS_LEVEL", self.gzip_level))
+		self.brotli_quality = int(cfg.get("BROTLI_QUALITY", self.brotli_quality))
+		if cfg.get("COMPRESS_RESPONSES", True):
+			app.after_request(self.after_request)
+
+	def compress(self, data: bytes, accept_encoding: str | None) -> Tuple[bytes, str | None]:
+		"""``(body, encoding)``; the body is returned unchanged when not worth encoding."""
+		if len(data) < self.min_bytes:
+			return data, None
+		encoding = choose_encoding(accept_encoding)
+		if encoding is None:
+			return data, None
+		return compress_body(data, encoding, self.gzip_level, self.brotli_quality), encoding
+
+	def after_request(self, response):
+		# Streamed bodies (NDJSON, SSE) and files are left alone
+		if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+				or response.mimetype not in COMPRESSIBLE_TYPES or "Content-Encoding" in response.headers):
+			return response
+		response.vary.add("Accept-Encoding")
+		body, encoding = self.compress(response.get_data(), request.headers.get("Accept-Encoding"))
+		if encoding is not None:
+			response.set_data(body)
+			response.headers["Content-Encoding"] = encoding
+		return response
+
+
+def _etag(version: str | None) -> str | None:
+	if version is None:
+		return None
+	key = f"{request.path}?{request.query_string.decode('latin1')}|{version}"
+	return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def conditional(version: Callable[[], str | None]):
+	"""Weak ETag + If-None-Match handling for a GET view.
+
+	``version()`` runs in the request context and must be cheap; it returns
+	None when the data version is not known up front, in which case the view
+	runs and the ETag is taken afterwards.
+	"""
+	def decorator(view):
+		@functools.wraps(view)
+		def wrapper(*args: Any, **kwargs: Any):
+			tag = _etag(version())
+			if tag is not None and request.if_none_match.contains_weak(tag):
+				resp = make_response("", 304)
+				resp.set_etag(tag, weak=True)
+				resp.headers["Cache-Control"] = "no-cache"
+				return resp
+			resp = make_response(view(*args, **kwargs))
+			if resp.status_code == 200:
+				tag = tag or _etag(version())
+				if tag is not None:
+					resp.set_etag(tag, weak=True)
+					resp.headers["Cache-Control"] = "no-cache"  # revalidate on every poll
+			return resp
+		return wrapper
+	return decorator
+
+
+def upstream_version(kinds: Iterable[str], hourly: bool = False) -> Callable[[], str | None]:
+	"""Version of the cached upstream sources a location view reads.
+
+	Known only while every source has a fresh cache entry; ``hourly`` also
+	ties it to the current hour for views whose output depends on the clock.
+	"""
+	kinds = tuple(kinds)
+
+	def version() -> str | None:
+		try:
+			lat, lon = quantize_location(float(request.args.get("lat", "28.6139")),
+										 float(request.args.get("lon", "77.2090")))
+		except ValueError:
+			return None
+		now = time.time()
+		parts = [str(int(now // 3600))] if hourly else []
+		for kind in kinds:
+			entry = upstream_cache.store.get((kind, lat, lon), now)
+			if entry is None or not entry.is_fresh(now):
+				return None
+			parts.append(f"{kind}:{entry.stored_at}")
+		return "|".join(parts)
+
+	return version
+
+
+# Global compressor installed by create_app()
+compressor = Compressor()
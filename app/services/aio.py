@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set, Tuple
+
+try:  # Optional: only the ASGI mode needs it (requirements-async.txt)
+	import httpx
+except ImportError:  # pragma: no cover
+	httpx = None
+
+from app.metrics import observe_upstream
+from app.services.cache import UpstreamCache, upstream_cache
+
+logger = logging.getLogger(__name__)
+
+# -------------- Asyncio upstream access (ASGI mode) --------------
+#
+# Async counterpart of ``UpstreamCache.get``: same sources, TTLs, store and
+# ``on_result`` hooks, but the upstream call is awaited on one pooled
+# ``httpx.AsyncClient``, so a slow upstream holds a coroutine, not a thread.
+# Identical concurrent misses within the event loop share one call; across
+# workers the shared cache tier serves what another worker already fetched.
+# Only a fresh in-process entry is read on the loop: the shared tier (SQLite,
+# which can wait out its busy timeout under write contention) is read and
+# written in a thread, so one slow lookup never stalls every open connection.
+
+CacheKey = Tuple[str, float, float]
+AsyncFetch = Callable[[float, float], Awaitable[Any]]
+
+
+class AsyncUpstream:
+	def __init__(self, cache: UpstreamCache, max_connections: int = 1000, timeout: float = 15) -> None:
+		self.cache = cache
+		self.max_connections = max_connections
+		self.timeout = timeout
+		self.config: Dict[str, Any] = {}
+		self.fetchers: Dict[str, AsyncFetch] = {}
+		self._client = None
+		self._flights: Dict[CacheKey, asyncio.Future] = {}
+		self._background: Set[asyncio.Task] = set()
+		self.stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "shared": 0}
+
+	def init_app(self, app) -> None:
+		self.config = app.config
+		self.timeout = float(app.config.get("REQUEST_TIMEOUT_SECONDS", self.timeout))
+		self.max_connections = int(app.config.get("ASYNC_MAX_CONNECTIONS", self.max_connections))
+
+	def register(self, kind: str, fetch: AsyncFetch) -> None:
+		"""Async fetch for a source already registered with the sync cache."""
+		self.fetchers[kind] = fetch
+
+	@property
+	def client(self):
+		if self._client is None:
+			if httpx is None:
+				raise RuntimeError("ASGI mode needs httpx: pip install -r requirements-async.txt")
+			limits = httpx.Limits(max_connections=self.max_connections,
+								  max_keepalive_connections=min(self.max_connections, 100))
+			self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+		return self._client
+
+	async def aclose(self) -> None:
+		if self._client is not None:
+			await self._client.aclose()
+			self._client = None
+
+	async def get_json(self, url: str, params: Dict[str, Any] | None = None,
+					   headers: Dict[str, str] | None = None, upstream: str = "openweather") -> Any:
+		"""JSON body of a 200 response, None on any other status or error."""
+		start = time.perf_counter()
+		ok = False
+		try:
+			resp = await self.client.get(url, params=params, headers=headers)
+			if resp.status_code == 200:
+				data = resp.json()
+				ok = True
+				return data
+		except Exception:
+			return None
+		finally:
+			observe_upstream(upstream, time.perf_counter() - start, ok)
+		return None
+
+	async def get(self, kind: str, lat: float, lon: float) -> Any:
+		cache = self.cache
+		if cache.on_access is not None:
+			cache.on_access(lat, lon)
+		now = time.time()
+		entry = await self._lookup((kind, lat, lon), now)
+		if entry is not None:
+			if entry.is_fresh(now):
+				self.stats["hits"] += 1
+				return entry.value
+			if entry.is_usable(now, cache.stale_ttl):
+				self.stats["stale_hits"] += 1
+				self._refresh_in_background(kind, lat, lon)
+				return entry.value
+		self.stats["misses"] += 1
+		return await self.refresh(kind, lat, lon)
+
+	async def _lookup(self, key: CacheKey, now: float):
+		store = self.cache.store
+		if store.shared is None:
+			return store.get(key, now)
+		entry = store.local.get(key)
+		if entry is not None and entry.is_fresh(now):
+			store.stats["l1_hits"] += 1
+			return entry
+		return await asyncio.to_thread(store.get, key, now)
+
+	async def refresh(self, kind: str, lat: float, lon: float) -> Any:
+		key = (kind, lat, lon)
+		flight = self._flights.get(key)
+		if flight is not None:
+			self.stats["shared"] += 1
+			return await asyncio.shield(flight)
+
+		flight = asyncio.get_running_loop().create_future()
+		self._flights[key] = flight
+		try:
+			value = await self.fetchers[kind](lat, lon)
+		except BaseException as e:
+			flight.set_exception(e)
+			flight.exception()  # retrieved here; followers re-raise it
+			raise
+		else:
+			flight.set_result(value)
+		finally:
+			self._flights.pop(key, None)
+
+		source = self.cache.sources[kind]
+		if source.on_result is not None:
+			source.on_result(lat, lon, value)
+		if source.cacheable(value):
+			store = self.cache.store
+			if store.shared is None:
+				store.set(key, value, source.ttl)
+			else:
+				await asyncio.to_thread(store.set, key, value, source.ttl)
+		return value
+
+	def _refresh_in_background(self, kind: str, lat: float, lon: float) -> None:
+		if (kind, lat, lon) in self._flights:
+			return
+		task = asyncio.ensure_future(self.refresh(kind, lat, lon))
+		self._background.add(task)
+		task.add_done_callback(self._background_done)
+
+	def _background_done(self, task: asyncio.Task) -> None:
+		self._background.discard(task)
+		if not task.cancelled() and task.exception() is not None:
+			logger.warning("Background refresh failed: %s", task.exception())
+
+	async def get_many(self, keys: Iterable[CacheKey]) -> Dict[CacheKey, Any]:
+		"""Fetch several sources concurrently; failed ones map to None."""
+		keys = [key for key in keys if key[0] in self.fetchers]
+		results = await asyncio.gather(*(self.get(*key) for key in keys), return_exceptions=True)
+		return {key: (None if isinstance(value, BaseException) else value) for key, value in zip(keys, results)}
+
+
+# Global async counterpart of ``upstream_cache``; configured by create_asgi_app()
+async_upstream = AsyncUpstream(upstream_cache)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+# -------------- US EPA AQI (0–500) over arrays --------------
+#
+# Every pollutant is described by a breakpoint table (Clow, Chigh, Ilow, Ihigh)
+# in the unit EPA defines it in, plus the truncation EPA applies before the
+# lookup. Inputs are OpenWeather-style µg/m³ concentrations; gases are
+# converted to ppb/ppm at 25 °C and 1 atm before truncation.
+
+POLLUTANTS: Tuple[str, ...] = ("pm2_5", "pm10", "o3", "no2", "so2", "co")
+
+# Molar volume (L/mol) at 25 °C, 1 atm and molecular weights (g/mol)
+_MOLAR_VOLUME = 24.45
+_MOLECULAR_WEIGHT: Dict[str, float] = {"o3": 48.00, "no2": 46.01, "so2": 64.07, "co": 28.01}
+
+_BREAKPOINTS: Dict[str, List[Tuple[float, float, int, int]]] = {
+	# µg/m³, 24-hour
+	"pm2_5": [
+		(0.0, 12.0, 0, 50),
+		(12.1, 35.4, 51, 100),
+		(35.5, 55.4, 101, 150),
+		(55.5, 150.4, 151, 200),
+		(150.5, 250.4, 201, 300),
+		(250.5, 350.4, 301, 400),
+		(350.5, 500.4, 401, 500),
+	],
+	# µg/m³, 24-hour
+	"pm10": [
+		(0, 54, 0, 50),
+		(55, 154, 51, 100),
+		(155, 254, 101, 150),
+		(255, 354, 151, 200),
+		(355, 424, 201, 300),
+		(425, 504, 301, 400),
+		(505, 604, 401, 500),
+	],
+	# ppb; 8-hour up to 200 ppb, 1-hour above. The 8-hour table ends at 200 ppb
+	# (AQI 300) and the 1-hour 201–300 row (205–404 ppb) never exceeds that, so
+	# the larger of the two subindices is 300 throughout 201–404 ppb
+	"o3": [
+		(0, 54, 0, 50),
+		(55, 70, 51, 100),
+		(71, 85, 101, 150),
+		(86, 105, 151, 200),
+		(106, 200, 201, 300),
+		(201, 404, 300, 300),
+		(405, 504, 301, 400),
+		(505, 604, 401, 500),
+	],
+	# ppb, 1-hour
+	"no2": [
+		(0, 53, 0, 50),
+		(54, 100, 51, 100),
+		(101, 360, 101, 150),
+		(361, 649, 151, 200),
+		(650, 1249, 201, 300),
+		(1250, 1649, 301, 400),
+		(1650, 2049, 401, 500),
+	],
+	# ppb, 1-hour
+	"so2": [
+		(0, 35, 0, 50),
+		(36, 75, 51, 100),
+		(76, 185, 101, 150),
+		(186, 304, 151, 200),
+		(305, 604, 201, 300),
+		(605, 804, 301, 400),
+		(805, 1004, 401, 500),
+	],
+	# ppm, 8-hour
+	"co": [
+		(0.0, 4.4, 0, 50),
+		(4.5, 9.4, 51, 100),
+		(9.5, 12.4, 101, 150),
+		(12.5, 15.4, 151, 200),
+		(15.5, 30.4, 201, 300),
+		(30.5, 40.4, 301, 400),
+		(40.5, 50.4, 401, 500),
+	],
+}
+
+# Decimal places kept after conversion (EPA truncates, it does not round)
+_TRUNCATE_DECIMALS: Dict[str, int] = {"pm2_5": 1, "pm10": 0, "o3": 0, "no2": 0, "so2": 0, "co": 1}
+
+
+def _check_contiguous() -> None:
+	"""Each row must start one truncation step after the previous one ends, or the gap reads as NaN."""
+	for name, rows in _BREAKPOINTS.items():
+		step = 10.0 ** -_TRUNCATE_DECIMALS[name]
+		for (_, chigh, _, _), (clow, _, _, _) in zip(rows, rows[1:]):
+			if abs(clow - chigh - step) > step / 10:
+				raise ValueError(f"AQI breakpoints for {name} are not contiguous at {chigh} -> {clow}")
+
+
+_check_contiguous()
+
+# Columnar copies of the tables so lookups are a single searchsorted
+_TABLES: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {
+	name: tuple(np.asarray(col, dtype=np.float64) for col in zip(*rows))  # type: ignore[misc]
+	for name, rows in _BREAKPOINTS.items()
+}
+
+
+def convert_concentration(pollutant: str, ugm3: Any) -> np.ndarray:
+	"""Convert µg/m³ to the EPA unit for ``pollutant`` and truncate it."""
+	values = np.asarray(ugm3, dtype=np.float64)
+	mw = _MOLECULAR_WEIGHT.get(pollutant)
+	if mw is not None:
+		values = values * _MOLAR_VOLUME / mw
+		if pollutant == "co":
+			values = values / 1000.0  # ppb -> ppm
+	scale = 10.0 ** _TRUNCATE_DECIMALS[pollutant]
+	# Small epsilon keeps values such as 12.1 from flooring to 12.0
+	return np.floor(values * scale + 1e-9) / scale
+
+
+def compute_subindex(pollutant: str, ugm3: Any) -> np.ndarray:
+	"""Vectorized subindex for one pollutant. NaN where the value is missing
+	or below the breakpoint table; values above it are beyond the index and
+	count as the top of the scale (500)."""
+	clow, chigh, ilow, ihigh = _TABLES[pollutant]
+	conc = convert_concentration(pollutant, ugm3)
+	idx = np.searchsorted(clow, conc, side="right") - 1
+	safe = np.clip(idx, 0, len(clow) - 1)
+	valid = np.isfinite(conc) & (idx >= 0)
+	beyond = valid & (conc > chigh[-1])
+	sub = (ihigh[safe] - ilow[safe]) / (chigh[safe] - clow[safe]) * (conc - clow[safe]) + ilow[safe]
+	sub = np.where(beyond, ihigh[-1], np.rint(sub))
+	return np.where(valid, sub, np.nan)
+
+
+def compute_aqi_arrays(components: Mapping[str, Any]) -> Dict[str, Any]:
+	"""Compute 0–500 AQI for whole columns of pollutant concentrations.
+
+	``components`` maps pollutant names (see ``POLLUTANTS``) to scalars or
+	equally shaped arrays in µg/m³; unknown keys are ignored.
+	Returns { overall: float array (NaN = unavailable), dominant: object array
+	(pollutant name or None), subindices: { pollutant: float array } }.
+	"""
+	subindices: Dict[str, np.ndarray] = {}
+	for name in POLLUTANTS:
+		if name in components and components[name] is not None:
+			subindices[name] = compute_subindex(name, components[name])
+
+	if not subindices:
+		empty = np.full(np.shape(next(iter(components.values()), ())), np.nan)
+		return {"overall": empty, "dominant": np.full(empty.shape, None, dtype=object), "subindices": {}}
+
+	names = list(subindices.keys())
+	stacked = np.stack(np.broadcast_arrays(*subindices.values()))
+	filled = np.where(np.isnan(stacked), -np.inf, stacked)
+	best = np.argmax(filled, axis=0)
+	overall = np.take_along_axis(filled, best[np.newaxis, ...], axis=0)[0]
+	has_value = np.isfinite(overall)
+	dominant = np.where(has_value, np.asarray(names, dtype=object)[best], None)
+	return {
+		"overall": np.where(has_value, overall, np.nan),
+		"dominant": dominant,
+		"subindices": subindices,
+	}
+
+
+def components_from_list(list_obj: Sequence[dict] | None) -> Dict[str, np.ndarray]:
+	"""Turn an OpenWeather air-pollution ``list`` into pollutant columns
+	(plus ``dt``). Missing values become NaN."""
+	items = list_obj or []
+	columns: Dict[str, np.ndarray] = {"dt": np.full(len(items), np.nan)}
+	for name in POLLUTANTS:
+		columns[name] = np.full(len(items), np.nan)
+	for i, item in enumerate(items):
+		item = item or {}
+		dt = item.get("dt")
+		if isinstance(dt, (int, float)):
+			columns["dt"][i] = dt
+		comps = item.get("components") or {}
+		for name in POLLUTANTS:
+			val = comps.get(name)
+			if isinstance(val, (int, float)):
+				columns[name][i] = val
+	return columns
+
+
+def compute_aqi_for_list(list_obj: Sequence[dict] | None) -> List[Dict[str, Any]]:
+	"""Per-item 0–500 AQI for an OpenWeather ``list`` (forecast or current)."""
+	columns = components_from_list(list_obj)
+	result = compute_aqi_arrays(columns)
+	rows: List[Dict[str, Any]] = []
+	for i in range(len(columns["dt"])):
+		overall = result["overall"][i]
+		rows.append({
+			"dt": int(columns["dt"][i]) if np.isfinite(columns["dt"][i]) else None,
+			"overall": int(overall) if np.isfinite(overall) else None,
+			"dominant": result["dominant"][i],
+		})
+	return rows
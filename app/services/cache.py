@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from app.services.singleflight import SingleFlight, single_flight
+
+# -------------- Upstream response cache --------------
+#
+# Entries are keyed by (source kind, quantized lat, quantized lon). An entry
+# is fresh for its source's TTL and then "stale but usable" for a further
+# grace period: stale hits are served immediately while a refresh runs in
+# the background (stale-while-revalidate).
+#
+# Storage is two-level: a small in-process LRU per worker and an optional
+# host-wide shared tier, so a fetch made by one gunicorn worker serves the
+# others.
+
+# Values the ASGI front end already fetched for the current request. The
+# sync view then runs in a worker thread without any upstream wait.
+prefetched_upstream: ContextVar[Dict[Tuple[str, float, float], Any] | None] = ContextVar(
+	"prefetched_upstream", default=None
+)
+
+
+class CacheEntry:
+	__slots__ = ("value", "stored_at", "ttl")
+
+	def __init__(self, value: Any, stored_at: float, ttl: float) -> None:
+		self.value = value
+		self.stored_at = stored_at
+		self.ttl = ttl
+
+	def expires_in(self, now: float) -> float:
+		return self.stored_at + self.ttl - now
+
+	def is_fresh(self, now: float) -> bool:
+		return self.expires_in(now) > 0
+
+	def is_usable(self, now: float, stale_ttl: float) -> bool:
+		return self.expires_in(now) + stale_ttl > 0
+
+
+class TTLCache:
+	"""Thread-safe LRU of ``CacheEntry`` objects bounded by entry count."""
+
+	def __init__(self, max_entries: int = 2048) -> None:
+		self.max_entries = max_entries
+		self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key: Hashable) -> CacheEntry | None:
+		with self._lock:
+			entry = self._data.get(key)
+			if entry is not None:
+				self._data.move_to_end(key)
+			return entry
+
+	def set(self, key: Hashable, value: Any, ttl: float, now: float | None = None) -> CacheEntry:
+		entry = CacheEntry(value, time.time() if now is None else now, ttl)
+		with self._lock:
+			self._data[key] = entry
+			self._data.move_to_end(key)
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+		return entry
+
+	def delete(self, key: Hashable) -> None:
+		with self._lock:
+			self._data.pop(key, None)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+
+class CacheBackend(ABC):
+	"""Shared (level-two) cache interface. Keys are strings, values JSON-able.
+
+	Implementations must be safe to use from several processes on the host;
+	a networked cache (e.g. Redis/memcached) can be dropped in by
+	implementing these four methods.
+	"""
+
+	@abstractmethod
+	def get(self, key: str) -> CacheEntry | None:
+		"""The entry stored under ``key``, or None."""
+
+	@abstractmethod
+	def set(self, key: str, entry: CacheEntry) -> None:
+		"""Store ``entry`` under ``key``, replacing any previous one."""
+
+	@abstractmethod
+	def delete(self, key: str) -> None:
+		"""Remove ``key`` if present."""
+
+	@abstractmethod
+	def clear(self) -> None:
+		"""Remove every entry."""
+
+
+class SQLiteBackend(CacheBackend):
+	"""Host-local shared tier in an embedded SQLite file (WAL mode).
+
+	All workers on the host read the same file through the OS page cache, so
+	memory does not grow with the worker count. Rows past ``ttl + grace`` are
+	pruned and the table is capped at ``max_entries``.
+	"""
+
+	def __init__(self, path: str, max_entries: int = 20000, grace: float = 600) -> None:
+		self.path = path
+		self.max_entries = max_entries
+		self.grace = grace
+		self._local = threading.local()
+		self._writes = 0
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		self._connect().execute(
+			"CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, ttl REAL NOT NULL)"
+		)
+
+	def _connect(self) -> sqlite3.Connection:
+		# One connection per thread and per process (connections must not cross fork)
+		conn = getattr(self._local, "conn", None)
+		if conn is None or getattr(self._local, "pid", None) != os.getpid():
+			conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+			self._local.pid = os.getpid()
+		return conn
+
+	def get(self, key: str) -> CacheEntry | None:
+		try:
+			row = self._connect().execute("SELECT value, stored_at, ttl FROM cache WHERE key = ?", (key,)).fetchone()
+		except sqlite3.Error:
+			return None
+		if row is None:
+			return None
+		try:
+			return CacheEntry(json.loads(row[0]), row[1], row[2])
+		except ValueError:
+			return None
+
+	def set(self, key: str, entry: CacheEntry) -> None:
+		try:
+			payload = json.dumps(entry.value)
+		except (TypeError, ValueError):
+			return
+		try:
+			conn = self._connect()
+			conn.execute(
+				"INSERT OR REPLACE INTO cache (key, value, stored_at, ttl) VALUES (?, ?, ?, ?)",
+				(key, payload, entry.stored_at, entry.ttl),
+			)
+			self._writes += 1
+			if self._writes % 200 == 0:
+				self._prune(conn)
+		except sqlite3.Error:
+			pass
+
+	def _prune(self, conn: sqlite3.Connection) -> None:
+		conn.execute("DELETE FROM cache WHERE stored_at + ttl + ? < ?", (self.grace, time.time()))
+		conn.execute(
+			"DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+			(self.max_entries,),
+		)
+
+	def delete(self, key: str) -> None:
+		try:
+			self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+		except sqlite3.Error:
+			pass
+
+	def clear(self) -> None:
+		try:
+			self._connect().execute("DELETE FROM cache")
+		except sqlite3.Error:
+			pass
+
+
+class TwoLevelCache:
+	"""In-process LRU (level one) in front of a shared ``CacheBackend`` (level two).
+
+	Reads prefer a fresh local entry; otherwise the shared tier is consulted
+	and a newer shared entry (written by another worker) is adopted locally.
+	Writes go to both levels.
+	"""
+
+	def __init__(self, local: TTLCache, shared: CacheBackend | None = None) -> None:
+		self.local = local
+		self.shared = shared
+		self.on_adopt: Callable[[Hashable, Any], None] | None = None
+		self.stats: Dict[str, int] = {"l1_hits": 0, "l2_hits": 0}
+
+	@staticmethod
+	def _shared_key(key: Hashable) -> str:
+		return "|".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+
+	def get(self, key: Hashable, now: float | None = None) -> CacheEntry | None:
+		now = time.time() if now is None else now
+		entry = self.local.get(key)
+		if entry is not None and entry.is_fresh(now):
+			self.stats["l1_hits"] += 1
+			return entry
+		if self.shared is None:
+			return entry
+		shared = self.shared.get(self._shared_key(key))
+		if shared is not None and (entry is None or shared.stored_at > entry.stored_at):
+			self.stats["l2_hits"] += 1
+			self.local.set(key, shared.value, shared.ttl, now=shared.stored_at)
+			if self.on_adopt is not None:
+				self.on_adopt(key, shared.value)
+			return shared
+		return entry
+
+	def set(self, key: Hashable, value: Any, ttl: float, now: float | None = None) -> CacheEntry:
+		entry = self.local.set(key, value, ttl, now=now)
+		if self.shared is not None:
+			self.shared.set(self._shared_key(key), entry)
+		return entry
+
+	def delete(self, key: Hashable) -> None:
+		self.local.delete(key)
+		if self.shared is not None:
+			self.shared.delete(self._shared_key(key))
+
+	def clear(self) -> None:
+		self.local.clear()
+		if self.shared is not None:
+			self.shared.clear()
+
+	def __len__(self) -> int:
+		return len(self.local)
+
+
+class _Source:
+	__slots__ = ("fetch", "ttl", "cacheable", "on_result")
+
+	def __init__(self, fetch: Callable[[float, float], Any], ttl: float, cacheable: Callable[[Any], bool],
+				 on_result: Callable[[float, float, Any], None] | None) -> None:
+		self.fetch = fetch
+		self.ttl = ttl
+		self.cacheable = cacheable
+		self.on_result = on_result
+
+
+def _not_none(value: Any) -> bool:
+	return value is not None
+
+
+class UpstreamCache:
+	"""Location-keyed cache in front of the upstream fetchers.
+
+	Sources are registered once with a fetch function taking quantized
+	``(lat, lon)``. Upstream calls are coalesced through ``flight`` so
+	concurrent misses for the same key share one fetch. ``on_access`` and
+	``schedule_refresh`` are hooks the background refresher installs;
+	without a refresher, stale entries are refetched inline.
+	"""
+
+	def __init__(self, store: TwoLevelCache | None = None, stale_ttl: float = 600,
+				 flight: SingleFlight | None = None) -> None:
+		self.store = store or TwoLevelCache(TTLCache())
+		self.store.on_adopt = self._adopted
+		self.stale_ttl = stale_ttl
+		self.flight = flight or single_flight
+		self.sources: Dict[str, _Source] = {}
+		self.on_access: Callable[[float, float], None] | None = None
+		self.schedule_refresh: Callable[[str, float, float], bool] | None = None
+		self.stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0}
+
+	def register(self, kind: str, fetch: Callable[[float, float], Any], ttl: float,
+				 cacheable: Callable[[Any], bool] = _not_none,
+				 on_result: Callable[[float, float, Any], None] | None = None) -> None:
+		"""``on_result`` sees every fetched value, including ones shared by another worker."""
+		self.sources[kind] = _Source(fetch, ttl, cacheable, on_result)
+
+	def configure(self, ttls: Dict[str, float] | None = None, stale_ttl: float | None = None,
+				  shared: CacheBackend | None = None, local_max_entries: int | None = None) -> None:
+		for kind, ttl in (ttls or {}).items():
+			if kind in self.sources and ttl is not None:
+				self.sources[kind].ttl = float(ttl)
+		if stale_ttl is not None:
+			self.stale_ttl = float(stale_ttl)
+		if shared is not None:
+			self.store.shared = shared
+		if local_max_entries is not None:
+			self.store.local.max_entries = int(local_max_entries)
+
+	def _adopted(self, key: Hashable, value: Any) -> None:
+		kind, lat, lon = key
+		source = self.sources.get(kind)
+		if source is not None and source.on_result is not None:
+			source.on_result(lat, lon, value)
+
+	def get(self, kind: str, lat: float, lon: float) -> Any:
+		prefetched = prefetched_upstream.get()
+		if prefetched is not None and (kind, lat, lon) in prefetched:
+			return prefetched[(kind, lat, lon)]
+		if self.on_access is not None:
+			self.on_access(lat, lon)
+		now = time.time()
+		entry = self.store.get((kind, lat, lon), now)
+		if entry is not None:
+			if entry.is_fresh(now):
+				self.stats["hits"] += 1
+				return entry.value
+			if entry.is_usable(now, self.stale_ttl) and self.schedule_refresh is not None:
+				self.schedule_refresh(kind, lat, lon)
+				self.stats["stale_hits"] += 1
+				return entry.value
+		self.stats["misses"] += 1
+		return self.refresh(kind, lat, lon)
+
+	def refresh(self, kind: str, lat: float, lon: float) -> Any:
+		"""Fetch from upstream and store the result if the source considers it cacheable."""
+		source = self.sources[kind]
+		value = self.flight.do(f"{kind}:{lat}:{lon}", lambda: source.fetch(lat, lon))
+		if source.on_result is not None:
+			source.on_result(lat, lon, value)
+		if source.cacheable(value):
+			self.store.set((kind, lat, lon), value, source.ttl)
+		return value
+
+	def expires_in(self, kind: str, lat: float, lon: float, now: float | None = None) -> float | None:
+		entry = self.store.get((kind, lat, lon))
+		if entry is None:
+			return None
+		return entry.expires_in(time.time() if now is None else now)
+
+	def kinds(self) -> Tuple[str, ...]:
+		return tuple(self.sources.keys())
+
+
+# Global cache shared by services/external.py and the NASA routes
+upstream_cache = UpstreamCache()
@@ -1,53 +1,113 @@
 from __future__ import annotations
 
-import datetime
-from collections import defaultdict
+import math
+import time
 from typing import Any, Dict, List, Tuple
 
 import requests
 from flask import current_app
 
+from app.metrics import observe_upstream
+from app.services.cache import upstream_cache
+from app.services.nowcast import nowcast_store, record_current_pollution
 
-def _get(url: str, timeout: int | None = None) -> Dict[str, Any] | List[Any] | None:
+
+def _get(url: str, timeout: int | None = None, upstream: str = "openweather") -> Dict[str, Any] | List[Any] | None:
+	start = time.perf_counter()
+	ok = False
 	try:
 		resp = requests.get(url, timeout=timeout)
 		if resp.status_code == 200:
-			return resp.json()
+			data = resp.json()
+			ok = True
+			return data
 	except Exception:
 		return None
+	finally:
+		observe_upstream(upstream, time.perf_counter() - start, ok)
 	return None
 
+
+def quantize_location(lat: float, lon: float, places: int = 2) -> Tuple[float, float]:
+	"""Round coordinates so nearby requests share state (~1 km at 2 places)."""
+	return (round(lat, places), round(lon, places))
+
 # -------------- OpenWeather AQI (forecast/current) --------------
+#
+# Coordinate-based fetchers go through ``upstream_cache`` keyed by quantized
+# location; the ``_fetch_*`` functions below are the raw upstream calls it
+# registers (and the background refresher re-runs).
+
+# Source kind -> URL template; shared with the asyncio fetchers of the ASGI mode.
+# ``base`` is OPENWEATHER_BASE_URL (the real API, or the offline stand-in).
+OPENWEATHER_BASE_URL = "https://api.openweathermap.org"
+OPENWEATHER_URLS: Dict[str, str] = {
+	"ow_forecast": "{base}/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={key}",
+	"ow_weather_forecast": "{base}/data/2.5/forecast?lat={lat}&lon={lon}&appid={key}&units={units}",
+	"ow_current": "{base}/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={key}",
+	"ow_weather": "{base}/data/2.5/weather?units={units}&lat={lat}&lon={lon}&appid={key}",
+}
+
+
+def openweather_url(kind: str, lat: float, lon: float, key: str | None, units: str = "metric",
+					base: str | None = None) -> str:
+	return OPENWEATHER_URLS[kind].format(base=base or OPENWEATHER_BASE_URL, lat=lat, lon=lon, key=key, units=units)
+
+
+def openweather_city_url(city: str, key: str | None, units: str = "metric", base: str | None = None) -> str:
+	return f"{base or OPENWEATHER_BASE_URL}/data/2.5/weather?units={units}&q={city}&appid={key}"
+
+
+def _fetch_openweather(kind: str, lat: float, lon: float, units: str = "metric") -> dict | None:
+	cfg = current_app.config
+	url = openweather_url(kind, lat, lon, cfg.get("OPENWEATHER_KEY"), units, cfg.get("OPENWEATHER_BASE_URL"))
+	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
+
+
+def _fetch_openweather_forecast(lat: float, lon: float) -> dict | None:
+	return _fetch_openweather("ow_forecast", lat, lon)
+
+
+def _fetch_openweather_weather_forecast(lat: float, lon: float, units: str = "metric") -> dict | None:
+	return _fetch_openweather("ow_weather_forecast", lat, lon, units)
+
+
+def _fetch_openweather_current(lat: float, lon: float) -> dict | None:
+	return _fetch_openweather("ow_current", lat, lon)
+
+
+def _fetch_openweather_weather_by_coords(lat: float, lon: float, units: str = "metric") -> dict | None:
+	return _fetch_openweather("ow_weather", lat, lon, units)
+
+
+upstream_cache.register("ow_forecast", _fetch_openweather_forecast, ttl=1800)
+upstream_cache.register("ow_weather_forecast", _fetch_openweather_weather_forecast, ttl=1800)
+upstream_cache.register(
+	"ow_current", _fetch_openweather_current, ttl=600,
+	on_result=lambda lat, lon, data: record_current_pollution(nowcast_store, (lat, lon), data),
+)
+upstream_cache.register("ow_weather", _fetch_openweather_weather_by_coords, ttl=600)
+
 
 def fetch_openweather_forecast(lat: float, lon: float) -> dict | None:
-	key = current_app.config.get("OPENWEATHER_KEY")
-	if not key:
+	if not current_app.config.get("OPENWEATHER_KEY"):
 		return None
-	url = (
-		f"http://api.openweathermap.org/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={key}"
-	)
-	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
+	return upstream_cache.get("ow_forecast", *quantize_location(lat, lon))
 
 
 def fetch_openweather_weather_forecast(lat: float, lon: float, units: str = "metric") -> dict | None:
 	"""Get 5-day weather forecast with 3-hour intervals"""
-	key = current_app.config.get("OPENWEATHER_KEY")
-	if not key:
+	if not current_app.config.get("OPENWEATHER_KEY"):
 		return None
-	url = (
-		f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={key}&units={units}"
-	)
-	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
+	if units != "metric":
+		return _fetch_openweather_weather_forecast(lat, lon, units)
+	return upstream_cache.get("ow_weather_forecast", *quantize_location(lat, lon))
 
 
 def fetch_openweather_current(lat: float, lon: float) -> dict | None:
-	key = current_app.config.get("OPENWEATHER_KEY")
-	if not key:
+	if not current_app.config.get("OPENWEATHER_KEY"):
 		return None
-	url = (
-		f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={key}"
-	)
-	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
+	return upstream_cache.get("ow_current", *quantize_location(lat, lon))
 
 # -------------- OpenWeather Weather (by city and coordinates) --------------
 
@@ -55,46 +115,35 @@ def fetch_openweather_weather_by_city(city: str, units: str = "metric") -> dict
 	key = current_app.config.get("OPENWEATHER_KEY")
 	if not key:
 		return None
-	url = f"https://api.openweathermap.org/data/2.5/weather?units={units}&q={city}&appid={key}"
+	url = openweather_city_url(city, key, units, current_app.config.get("OPENWEATHER_BASE_URL"))
 	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
 
 
 def fetch_openweather_weather_by_coords(lat: float, lon: float, units: str = "metric") -> dict | None:
-	key = current_app.config.get("OPENWEATHER_KEY")
-	if not key:
+	if not current_app.config.get("OPENWEATHER_KEY"):
 		return None
-	url = f"https://api.openweathermap.org/data/2.5/weather?units={units}&lat={lat}&lon={lon}&appid={key}"
-	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
+	if units != "metric":
+		return _fetch_openweather_weather_by_coords(lat, lon, units)
+	return upstream_cache.get("ow_weather", *quantize_location(lat, lon))
 
 # -------------- Reverse Geolocation (ipapi.co) --------------
 
 def fetch_revgeo_ip() -> dict | None:
 	url = "https://ipapi.co/json/"
-	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"))
+	return _get(url, timeout=current_app.config.get("REQUEST_TIMEOUT_SECONDS"), upstream="ipapi")
 
 # -------------- Processing helpers --------------
 
-def summarize_openweather_to_daily_aqi(ow_data: dict | None, days: int = 7) -> List[Tuple[str, float]]:
+def summarize_openweather_to_daily_aqi(ow_data: dict | None, days: int = 7, tz_offset: int | None = None) -> List[Tuple[str, float]]:
+	"""Average OpenWeather 1–5 AQI per local calendar day.
+	``tz_offset`` is the location's UTC offset in seconds (UTC when unknown).
+	"""
 	if not ow_data or "list" not in ow_data:
 		return []
-	date_to_values: Dict[str, List[int]] = defaultdict(list)
-	for item in ow_data.get("list", []):
-		ts = item.get("dt")
-		main = item.get("main", {})
-		aqi = main.get("aqi")
-		if ts is None or aqi is None:
-			continue
-		date_str = datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
-		date_to_values[date_str].append(int(aqi))
-	
-	daily: List[Tuple[str, float]] = []
-	for date_str in sorted(date_to_values.keys())[:days]:
-		values = date_to_values[date_str]
-		if not values:
-			continue
-		avg = sum(values) / len(values)
-		daily.append((date_str, round(avg, 2)))
-	return daily[:days]
+	from app.services.forecast import daily_aggregates, daily_aqi_pairs, parse_forecast
+
+	cols = parse_forecast(ow_data, tz_offset=tz_offset)
+	return daily_aqi_pairs(daily_aggregates(cols, fields=("aqi",), days=days, require="aqi"))
 
 
 def extract_ow_pollutants_from_list(list_obj: List[dict] | None) -> Dict[str, float]:
@@ -132,53 +181,24 @@ def extract_realtime_aqi_openweather(ow_current: dict | None) -> Dict[str, Any]
 
 # -------------- AQI (0–500) computation from components --------------
 
-def _compute_subindex(val: float, breakpoints: List[Tuple[float, float, int, int]]) -> int | None:
-	for Clow, Chigh, Ilow, Ihigh in breakpoints:
-		if Clow <= val <= Chigh:
-			# Linear scaling
-			return round(((Ihigh - Ilow) / (Chigh - Clow)) * (val - Clow) + Ilow)
-	return None
-
-# US EPA breakpoints (µg/m³) for PM2.5 and PM10
-_PM25_BP: List[Tuple[float, float, int, int]] = [
-	(0.0, 12.0, 0, 50),
-	(12.1, 35.4, 51, 100),
-	(35.5, 55.4, 101, 150),
-	(55.5, 150.4, 151, 200),
-	(150.5, 250.4, 201, 300),
-	(250.5, 350.4, 301, 400),
-	(350.5, 500.4, 401, 500),
-]
-_PM10_BP: List[Tuple[float, float, int, int]] = [
-	(0, 54, 0, 50),
-	(55, 154, 51, 100),
-	(155, 254, 101, 150),
-	(255, 354, 151, 200),
-	(355, 424, 201, 300),
-	(425, 504, 301, 400),
-	(505, 604, 401, 500),
-]
-
-
 def compute_aqi_from_components(components: Dict[str, float]) -> Dict[str, Any]:
-	"""Compute 0–500 AQI using available components (PM2.5/PM10 supported now).
-	Returns { overall: int|None, subindices: { pollutant: int } }.
+	"""Compute 0–500 AQI from one set of µg/m³ components (PM2.5, PM10, O3,
+	NO2, SO2, CO). Thin scalar wrapper over ``app.services.aqi``.
+	Returns { overall: int|None, dominant: str|None, subindices: { pollutant: int } }.
 	"""
-	subindices: Dict[str, int] = {}
-	overall: int | None = None
-
-	pm25 = components.get("pm2_5")
-	if isinstance(pm25, (int, float)):
-		idx = _compute_subindex(float(pm25), _PM25_BP)
-		if idx is not None:
-			subindices["pm2_5"] = idx
-			overall = idx if overall is None else max(overall, idx)
-
-	pm10 = components.get("pm10")
-	if isinstance(pm10, (int, float)):
-		idx = _compute_subindex(float(pm10), _PM10_BP)
-		if idx is not None:
-			subindices["pm10"] = idx
-			overall = idx if overall is None else max(overall, idx)
-
-	return {"overall": overall, "subindices": subindices}
+	from app.services.aqi import POLLUTANTS, compute_aqi_arrays
+
+	scalars = {k: float(v) for k, v in components.items() if k in POLLUTANTS and isinstance(v, (int, float))}
+	if not scalars:
+		return {"overall": None, "dominant": None, "subindices": {}}
+
+	result = compute_aqi_arrays(scalars)
+	subindices: Dict[str, int] = {
+		name: int(val) for name, val in result["subindices"].items() if not math.isnan(float(val))
+	}
+	overall = float(result["overall"])
+	return {
+		"overall": None if math.isnan(overall) else int(overall),
+		"dominant": result["dominant"].item(),
+		"subindices": subindices,
+	}
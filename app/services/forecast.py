@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# -------------- Columnar OpenWeather forecast parsing --------------
+#
+# Both OpenWeather forecast payloads (air pollution and 5-day/3-hour weather)
+# carry a ``list`` of items. ``parse_forecast`` walks that list once and
+# returns NumPy columns; bucketing and aggregation are then array reductions
+# in the location's local time rather than the server's.
+
+SECONDS_PER_DAY = 86400
+
+# Numeric column -> path inside each list item
+NUMERIC_FIELDS: Dict[str, Tuple[str, str]] = {
+	"aqi": ("main", "aqi"),
+	"temp": ("main", "temp"),
+	"feels_like": ("main", "feels_like"),
+	"humidity": ("main", "humidity"),
+	"pressure": ("main", "pressure"),
+	"wind_speed": ("wind", "speed"),
+	"clouds": ("clouds", "all"),
+	"co": ("components", "co"),
+	"no": ("components", "no"),
+	"no2": ("components", "no2"),
+	"o3": ("components", "o3"),
+	"so2": ("components", "so2"),
+	"pm2_5": ("components", "pm2_5"),
+	"pm10": ("components", "pm10"),
+	"nh3": ("components", "nh3"),
+}
+POLLUTANT_FIELDS: Tuple[str, ...] = ("co", "no", "no2", "o3", "so2", "pm2_5", "pm10", "nh3")
+
+
+class ForecastColumns:
+	"""Forecast ``list`` as arrays sorted by time, plus the local UTC offset."""
+
+	def __init__(self, dt: np.ndarray, numeric: Dict[str, np.ndarray], weather_main: np.ndarray,
+				 weather_description: np.ndarray, tz_offset: int) -> None:
+		self.dt = dt
+		self.numeric = numeric
+		self.weather_main = weather_main
+		self.weather_description = weather_description
+		self.tz_offset = tz_offset
+
+	def __len__(self) -> int:
+		return len(self.dt)
+
+	def __getitem__(self, name: str) -> np.ndarray:
+		return self.numeric[name]
+
+	def value(self, name: str, row: int, default: Any = None) -> Any:
+		"""Scalar at ``row`` as a float, or ``default`` when missing."""
+		val = self.numeric[name][row]
+		return default if np.isnan(val) else float(val)
+
+	def has(self, name: str) -> bool:
+		"""True when at least one item carried ``name``."""
+		return name in self.numeric and bool(np.isfinite(self.numeric[name]).any())
+
+	@property
+	def local_seconds(self) -> np.ndarray:
+		return self.dt + self.tz_offset
+
+	@property
+	def local_day(self) -> np.ndarray:
+		"""Days since the epoch in the location's local time."""
+		return self.local_seconds // SECONDS_PER_DAY
+
+	@property
+	def local_hour(self) -> np.ndarray:
+		return (self.local_seconds % SECONDS_PER_DAY) // 3600
+
+
+def estimate_utc_offset(lon: float) -> int:
+	"""Solar-time UTC offset in seconds, for payloads that carry no timezone."""
+	return int(round(lon / 15.0)) * 3600
+
+
+def timezone_offset(*payloads: dict | None, lon: float | None = None) -> int:
+	"""UTC offset (seconds) from the first OpenWeather payload that reports one
+	(``timezone`` on current weather, ``city.timezone`` on forecasts), falling
+	back to a longitude estimate and finally UTC."""
+	for payload in payloads:
+		if not isinstance(payload, dict):
+			continue
+		tz = payload.get("timezone")
+		if not isinstance(tz, (int, float)):
+			tz = (payload.get("city") or {}).get("timezone")
+		if isinstance(tz, (int, float)):
+			return int(tz)
+	return estimate_utc_offset(lon) if lon is not None else 0
+
+
+def parse_forecast(payload: dict | None, tz_offset: int | None = None) -> ForecastColumns:
+	"""Single pass over ``payload['list']``. Items without ``dt`` are dropped,
+	missing numeric values become NaN."""
+	items: Sequence[dict] = (payload.get("list") or []) if isinstance(payload, dict) else []
+	if tz_offset is None:
+		tz_offset = timezone_offset(payload)
+
+	n = len(items)
+	dt = np.zeros(n, dtype=np.int64)
+	keep = np.zeros(n, dtype=bool)
+	numeric = {name: np.full(n, np.nan) for name in NUMERIC_FIELDS}
+	weather_main = np.empty(n, dtype=object)
+	weather_description = np.empty(n, dtype=object)
+
+	for i, item in enumerate(items):
+		if not isinstance(item, dict):
+			continue
+		ts = item.get("dt")
+		if not isinstance(ts, (int, float)):
+			continue
+		dt[i] = int(ts)
+		keep[i] = True
+		for name, (group, key) in NUMERIC_FIELDS.items():
+			val = (item.get(group) or {}).get(key)
+			if isinstance(val, (int, float)):
+				numeric[name][i] = val
+		weather = (item.get("weather") or [{}])[0] or {}
+		weather_main[i] = weather.get("main")
+		weather_description[i] = weather.get("description")
+
+	order = np.argsort(dt[keep], kind="stable")
+	return ForecastColumns(
+		dt=dt[keep][order],
+		numeric={name: col[keep][order] for name, col in numeric.items()},
+		weather_main=weather_main[keep][order],
+		weather_description=weather_description[keep][order],
+		tz_offset=int(tz_offset),
+	)
+
+
+def _group_mean_max(values: np.ndarray, inverse: np.ndarray, starts: np.ndarray, groups: int) -> Tuple[np.ndarray, np.ndarray]:
+	valid = np.isfinite(values)
+	sums = np.bincount(inverse, weights=np.where(valid, values, 0.0), minlength=groups)
+	counts = np.bincount(inverse, weights=valid.astype(np.float64), minlength=groups)
+	with np.errstate(invalid="ignore", divide="ignore"):
+		means = np.where(counts > 0, sums / counts, np.nan)
+	maxes = np.fmax.reduceat(values, starts) if len(values) else np.empty(0)
+	return means, maxes
+
+
+def _aggregate(cols: ForecastColumns, buckets: np.ndarray, fields: Iterable[str], limit: int | None,
+			   require: str | None = None) -> List[Tuple[int, int, Dict[str, Any]]]:
+	"""Group rows by the non-decreasing ``buckets`` key; (key, count, stats) per group.
+	With ``require``, groups without a value of that field are dropped before ``limit`` applies."""
+	if not len(cols):
+		return []
+	keys, starts, inverse = np.unique(buckets, return_index=True, return_inverse=True)
+	counts = np.bincount(inverse)
+	stats: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+	for name in fields:
+		if cols.has(name):
+			stats[name] = _group_mean_max(cols[name], inverse, starts, len(starts))
+
+	groups = np.arange(len(keys))
+	if require is not None:
+		groups = groups[~np.isnan(stats[require][0])] if require in stats else groups[:0]
+	if limit is not None:
+		groups = groups[:limit]
+	out: List[Tuple[int, int, Dict[str, Any]]] = []
+	for g in groups:
+		row: Dict[str, Any] = {}
+		for name, (means, maxes) in stats.items():
+			row[name] = {
+				"mean": None if np.isnan(means[g]) else float(means[g]),
+				"max": None if np.isnan(maxes[g]) else float(maxes[g]),
+			}
+		out.append((int(keys[g]), int(counts[g]), row))
+	return out
+
+
+def daily_aggregates(cols: ForecastColumns, fields: Iterable[str] = ("aqi",), days: int | None = None,
+					 require: str | None = None) -> List[Dict[str, Any]]:
+	"""Per local calendar day: ``{date, count, <field>: {mean, max}}`` for every
+	requested field that has data. Days come out in chronological order; with
+	``require``, the first ``days`` days that have a value of that field."""
+	out: List[Dict[str, Any]] = []
+	for day_id, count, stats in _aggregate(cols, cols.local_day, fields, days, require):
+		out.append({"date": str(np.datetime64(day_id, "D")), "count": count, **stats})
+	return out
+
+
+def hourly_aggregates(cols: ForecastColumns, fields: Iterable[str] = ("aqi",), hours: int | None = None) -> List[Dict[str, Any]]:
+	"""Per local clock hour: ``{datetime, hour, count, <field>: {mean, max}}``."""
+	out: List[Dict[str, Any]] = []
+	for hour_id, count, stats in _aggregate(cols, cols.local_seconds // 3600, fields, hours):
+		stamp = np.datetime64(hour_id * 3600, "s")
+		out.append({
+			"datetime": str(stamp)[:16].replace("T", " "),
+			"hour": hour_id % 24,
+			"count": count,
+			**stats,
+		})
+	return out
+
+
+def summarize_forecast(payload: dict | None, tz_offset: int | None = None, days: int = 7, hours: int = 24,
+					   fields: Iterable[str] = ("aqi",) + POLLUTANT_FIELDS) -> Dict[str, Any]:
+	"""Daily and hourly aggregates of a forecast payload in local time."""
+	cols = parse_forecast(payload, tz_offset=tz_offset)
+	fields = tuple(fields)
+	return {
+		"tz_offset": cols.tz_offset,
+		"daily": daily_aggregates(cols, fields, days, require="aqi" if "aqi" in fields else None),
+		"hourly": hourly_aggregates(cols, fields, hours),
+	}
+
+
+def daily_aqi_pairs(daily: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+	"""``[(date, mean 1–5 AQI)]`` from ``daily_aggregates`` rows, skipping days without AQI."""
+	pairs: List[Tuple[str, float]] = []
+	for row in daily:
+		mean = (row.get("aqi") or {}).get("mean")
+		if mean is not None:
+			pairs.append((row["date"], round(mean, 2)))
+	return pairs
+
+
+def representative_rows(cols: ForecastColumns, target_hour: int = 12) -> Dict[int, int]:
+	"""Row index per local day of the item closest to ``target_hour`` (first on ties)."""
+	if not len(cols):
+		return {}
+	day = cols.local_day
+	distance = np.abs(cols.local_hour - target_hour)
+	# Sort by (day, distance, time); the first row of each day wins
+	order = np.lexsort((cols.dt, distance, day))
+	first = np.ones(len(order), dtype=bool)
+	first[1:] = day[order][1:] != day[order][:-1]
+	return {int(day[i]): int(i) for i in order[first]}
+
+
+def local_today(tz_offset: int, now: float) -> int:
+	"""Local calendar day (days since the epoch) for a UTC timestamp."""
+	return int((int(now) + tz_offset) // SECONDS_PER_DAY)
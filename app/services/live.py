@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Set, Tuple
+
+from app.services.external import quantize_location
+
+logger = logging.getLogger(__name__)
+
+# -------------- Live location updates (Server-Sent Events) --------------
+#
+# Clients subscribe to a quantized location. One daemon thread per process
+# rebuilds each subscribed location's payload once per interval, however
+# many clients watch it, and pushes only what changed as a JSON merge patch
+# (RFC 7386: nested objects, ``null`` removes a key). Upstream load therefore
+# follows the number of distinct locations, not the number of open tabs.
+#
+# Under gunicorn's gthread workers a stream occupies a worker thread for as
+# long as it is open, so streams are capped at GUNICORN_THREADS minus
+# LIVE_RESERVED_THREADS per worker; the reserved threads keep serving
+# ordinary requests. Async (ASGI) streams are coroutines and only count
+# towards LIVE_MAX_SUBSCRIBERS.
+
+Location = Tuple[float, float]
+_CLOSED = object()
+_MISSING = object()
+_RETRY = "retry: 5000\n\n"  # browser reconnect delay (ms)
+
+
+def merge_patch(old: Any, new: Any) -> Dict[str, Any] | None:
+	"""Merge patch turning ``old`` into ``new`` (both dicts); None when equal."""
+	patch: Dict[str, Any] = {}
+	for key in old.keys() - new.keys():
+		patch[key] = None
+	for key, value in new.items():
+		before = old.get(key, _MISSING)
+		if before == value:
+			continue
+		if isinstance(before, dict) and isinstance(value, dict):
+			patch[key] = merge_patch(before, value)
+		else:
+			patch[key] = value
+	return patch or None
+
+
+class Subscriber:
+	"""One client's bounded event queue. The hub drops clients that fall behind."""
+
+	holds_thread = True  # streamed by a WSGI worker thread for its whole life
+
+	def __init__(self, loc: Location, max_queue: int) -> None:
+		self.loc = loc
+		self.max_queue = max_queue
+		self.events: "queue.Queue[Any]" = queue.Queue(max_queue)
+		self.closed = False
+
+	def push(self, event: Tuple[str, Dict[str, Any]]) -> bool:
+		try:
+			self.events.put_nowait(event)
+			return True
+		except queue.Full:
+			return False
+
+	def close(self) -> None:
+		self.closed = True
+		try:
+			self.events.put_nowait(_CLOSED)
+		except queue.Full:
+			pass
+
+
+class AsyncSubscriber(Subscriber):
+	"""Subscriber whose queue lives on the event loop (ASGI mode); the hub
+	thread hands events over with ``call_soon_threadsafe``."""
+
+	holds_thread = False
+
+	def __init__(self, loc: Location, max_queue: int) -> None:
+		super().__init__(loc, max_queue)
+		self.loop = asyncio.get_running_loop()
+		self.events = asyncio.Queue()
+
+	def _put(self, event: Any) -> bool:
+		try:
+			self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+			return True
+		except RuntimeError:  # loop already closed
+			return False
+
+	def push(self, event: Tuple[str, Dict[str, Any]]) -> bool:
+		return self.events.qsize() < self.max_queue and self._put(event)
+
+	def close(self) -> None:
+		self.closed = True
+		self._put(_CLOSED)
+
+
+class _Location:
+	__slots__ = ("subscribers", "snapshot", "version", "updated_at", "due", "lock")
+
+	def __init__(self) -> None:
+		self.subscribers: Set[Subscriber] = set()
+		self.snapshot: Dict[str, Any] | None = None
+		self.version = 0
+		self.updated_at = 0.0
+		self.due = 0.0
+		self.lock = threading.Lock()
+
+
+class LiveHub:
+	def __init__(self, interval: float = 300, keepalive: float = 15, max_subscribers: int = 64,
+				 max_queue: int = 16, max_threaded: int = 4) -> None:
+		self.interval = interval
+		self.keepalive = keepalive
+		self.max_subscribers = max_subscribers
+		self.max_threaded = max_threaded  # streams that each hold a worker thread
+		self.max_queue = max_queue
+		self.app = None
+		self.build: Callable[[float, float], Dict[str, Any]] | None = None
+		self._locations: Dict[Location, _Location] = {}
+		self._count = 0
+		self._threaded = 0
+		self._lock = threading.Lock()
+		self._wake = threading.Event()
+		self._pid: int | None = None
+		self.stats: Dict[str, int] = {"refreshes": 0, "patches": 0, "dropped": 0}
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.app = app
+		self.interval = float(cfg.get("LIVE_INTERVAL_SECONDS", self.interval))
+		self.keepalive = float(cfg.get("LIVE_KEEPALIVE_SECONDS", self.keepalive))
+		self.max_subscribers = int(cfg.get("LIVE_MAX_SUBSCRIBERS", self.max_subscribers))
+		threads = int(cfg.get("GUNICORN_THREADS", 8))
+		self.max_threaded = max(0, threads - int(cfg.get("LIVE_RESERVED_THREADS", 4)))
+
+	def register(self, build: Callable[[float, float], Dict[str, Any]]) -> None:
+		"""Payload builder for a quantized ``(lat, lon)``; called in an app context."""
+		self.build = build
+
+	def subscribe(self, lat: float, lon: float, factory: Callable[[Location, int], Subscriber] = Subscriber) -> Subscriber | None:
+		"""New subscriber for the location, or None when this process is at capacity."""
+		loc = quantize_location(lat, lon)
+		self._ensure_started()
+		with self._lock:
+			threaded = getattr(factory, "holds_thread", True)
+			if self._count >= self.max_subscribers or (threaded and self._threaded >= self.max_threaded):
+				return None
+			state = self._locations.get(loc)
+			if state is None:
+				state = self._locations[loc] = _Location()
+				state.due = time.time() + self.interval
+			sub = factory(loc, self.max_queue)
+			state.subscribers.add(sub)
+			self._count += 1
+			self._threaded += threaded
+		self._wake.set()
+		return sub
+
+	def unsubscribe(self, sub: Subscriber) -> None:
+		with self._lock:
+			state = self._locations.get(sub.loc)
+			if state is None or sub not in state.subscribers:
+				return
+			state.subscribers.discard(sub)
+			self._count -= 1
+			self._threaded -= sub.holds_thread
+			if not state.subscribers:
+				del self._locations[sub.loc]
+		sub.close()
+
+	def snapshot(self, sub: Subscriber) -> Tuple[str, Dict[str, Any]] | None:
+		"""Full state for a new subscriber; the first one for a location builds it."""
+		state = self._locations.get(sub.loc)
+		if state is None:
+			return None
+		with state.lock:
+			if state.snapshot is None:
+				self._refresh(sub.loc, state, notify=False)
+			if state.snapshot is None:
+				return None
+			return "snapshot", {"version": state.version, "updatedAt": state.updated_at, "data": state.snapshot}
+
+	def _refresh(self, loc: Location, state: _Location, notify: bool = True) -> None:
+		try:
+			with self.app.app_context():
+				payload = self.build(*loc)
+		except Exception as e:
+			logger.warning("Live refresh failed for %s: %s", loc, e)
+			return
+		self.stats["refreshes"] += 1
+		previous = state.snapshot
+		state.snapshot = payload
+		state.updated_at = time.time()
+		if previous is None:
+			state.version += 1
+			event = ("snapshot", {"version": state.version, "updatedAt": state.updated_at, "data": payload})
+		else:
+			patch = merge_patch(previous, payload)
+			if patch is None:
+				return
+			state.version += 1
+			self.stats["patches"] += 1
+			event = ("patch", {"version": state.version, "updatedAt": state.updated_at, "patch": patch})
+		if not notify:
+			return
+		with self._lock:
+			subscribers = list(state.subscribers)
+		for sub in subscribers:
+			if not sub.push(event):
+				# Too far behind: close it; the browser reconnects and gets a fresh snapshot
+				self.stats["dropped"] += 1
+				self.unsubscribe(sub)
+
+	def refresh_due(self, now: float | None = None) -> float:
+		"""Rebuild locations whose interval elapsed; returns seconds until the next one is due."""
+		now = time.time() if now is None else now
+		with self._lock:
+			due: List[Tuple[Location, _Location]] = [(loc, s) for loc, s in self._locations.items() if s.due <= now]
+			for _, state in due:
+				state.due = now + self.interval
+		for loc, state in due:
+			with state.lock:
+				self._refresh(loc, state)
+		with self._lock:
+			upcoming = min((s.due for s in self._locations.values()), default=now + self.interval)
+		return max(0.0, upcoming - time.time())
+
+	def _ensure_started(self) -> None:
+		# Threads do not survive fork; (re)start lazily in each worker process
+		if self._pid == os.getpid():
+			return
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			self._locations.clear()
+			self._count = 0
+			threading.Thread(target=self._loop, name="live-hub", daemon=True).start()
+			self._pid = os.getpid()
+
+	def _loop(self) -> None:
+		wait = self.interval
+		while True:
+			self._wake.wait(wait)
+			self._wake.clear()
+			try:
+				wait = self.refresh_due()
+			except Exception as e:
+				logger.exception("Live refresh loop error: %s", e)
+				wait = self.interval
+
+	def stream(self, sub: Subscriber, dumps: Callable[[Any], str] = json.dumps) -> Iterator[str]:
+		"""Blocking SSE stream for the WSGI route: snapshot, then patches and keep-alives."""
+		yield _RETRY
+		first = self.snapshot(sub)
+		if first is not None:
+			yield sse_event(*first, dumps=dumps)
+		while not sub.closed:
+			try:
+				event = sub.events.get(timeout=self.keepalive)
+			except queue.Empty:
+				yield ": keep-alive\n\n"
+				continue
+			if event is _CLOSED:
+				return
+			yield sse_event(*event, dumps=dumps)
+
+	async def astream(self, sub: AsyncSubscriber, dumps: Callable[[Any], str] = json.dumps) -> AsyncIterator[str]:
+		"""``stream`` for the ASGI front end; only the first build runs in a thread."""
+		yield _RETRY
+		first = await asyncio.to_thread(self.snapshot, sub)
+		if first is not None:
+			yield sse_event(*first, dumps=dumps)
+		while not sub.closed:
+			try:
+				event = await asyncio.wait_for(sub.events.get(), self.keepalive)
+			except asyncio.TimeoutError:
+				yield ": keep-alive\n\n"
+				continue
+			if event is _CLOSED:
+				return
+			yield sse_event(*event, dumps=dumps)
+
+
+def sse_event(name: str, data: Dict[str, Any], dumps: Callable[[Any], str] = json.dumps) -> str:
+	return f"event: {name}\nid: {data.get('version', '')}\ndata: {dumps(data)}\n\n"
+
+
+# Global hub; the aggregate builder is registered by routes.py
+live_hub = LiveHub()
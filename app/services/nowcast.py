@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+# -------------- EPA NowCast for PM2.5 / PM10 --------------
+#
+# Each quantized location keeps a 12-slot ring of hourly averages per
+# pollutant. A new sample only touches the slot for its hour (running sum and
+# count), so raw history is never revisited; the NowCast itself is a fixed
+# 12-term weighted sum over the ring and is cached until the next sample.
+
+NOWCAST_POLLUTANTS: Tuple[str, ...] = ("pm2_5", "pm10")
+WINDOW_HOURS = 12
+_MIN_WEIGHT = 0.5  # EPA floor for the PM weight factor
+
+
+class HourlyWindow:
+	"""Rolling 12-hour window of hourly means for one pollutant."""
+
+	__slots__ = ("_hour", "_sum", "_count", "_last_ts", "_cached")
+
+	def __init__(self) -> None:
+		self._hour: List[int] = [-1] * WINDOW_HOURS
+		self._sum: List[float] = [0.0] * WINDOW_HOURS
+		self._count: List[int] = [0] * WINDOW_HOURS
+		self._last_ts: float | None = None
+		self._cached: Tuple[int, float | None] | None = None
+
+	def add(self, ts: float, value: float) -> bool:
+		"""Fold one sample into its hourly slot. Returns False for repeats of an
+		already-seen timestamp (cached payloads) and samples older than the window."""
+		if self._last_ts is not None and ts <= self._last_ts:
+			return False
+		hour = int(ts // 3600)
+		latest = max(self._hour)
+		if latest >= 0 and hour <= latest - WINDOW_HOURS:
+			return False
+		slot = hour % WINDOW_HOURS
+		if self._hour[slot] != hour:
+			self._hour[slot] = hour
+			self._sum[slot] = 0.0
+			self._count[slot] = 0
+		self._sum[slot] += value
+		self._count[slot] += 1
+		self._last_ts = ts
+		self._cached = None
+		return True
+
+	def hourly_means(self, current_hour: int) -> List[float | None]:
+		"""Hourly means, most recent first, for the 12 hours ending at ``current_hour``."""
+		means: List[float | None] = []
+		for age in range(WINDOW_HOURS):
+			hour = current_hour - age
+			slot = hour % WINDOW_HOURS
+			if self._hour[slot] == hour and self._count[slot]:
+				means.append(self._sum[slot] / self._count[slot])
+			else:
+				means.append(None)
+		return means
+
+	def nowcast(self, now: float) -> float | None:
+		"""EPA NowCast concentration, or None when fewer than 2 of the last 3 hours are valid."""
+		current_hour = int(now // 3600)
+		if self._cached is not None and self._cached[0] == current_hour:
+			return self._cached[1]
+
+		means = self.hourly_means(current_hour)
+		result: float | None = None
+		if sum(1 for c in means[:3] if c is not None) >= 2:
+			valid = [c for c in means if c is not None]
+			cmax = max(valid)
+			weight = 1.0 if cmax <= 0 else max(min(valid) / cmax, _MIN_WEIGHT)
+			num = 0.0
+			den = 0.0
+			factor = 1.0
+			for c in means:
+				if c is not None:
+					num += factor * c
+					den += factor
+				factor *= weight
+			result = num / den
+
+		self._cached = (current_hour, result)
+		return result
+
+	def hours_available(self, now: float) -> int:
+		return sum(1 for c in self.hourly_means(int(now // 3600)) if c is not None)
+
+
+class NowCastStore:
+	"""Per-location NowCast windows, bounded by least recent update."""
+
+	def __init__(self, max_locations: int = 5000) -> None:
+		self.max_locations = max_locations
+		self._windows: "OrderedDict[Tuple[float, float], Dict[str, HourlyWindow]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def observe(self, key: Tuple[float, float], components: Dict[str, Any], ts: float | None = None) -> None:
+		ts = time.time() if ts is None else float(ts)
+		with self._lock:
+			windows = self._windows.get(key)
+			if windows is None:
+				windows = {name: HourlyWindow() for name in NOWCAST_POLLUTANTS}
+				self._windows[key] = windows
+				while len(self._windows) > self.max_locations:
+					self._windows.popitem(last=False)
+			else:
+				self._windows.move_to_end(key)
+			for name in NOWCAST_POLLUTANTS:
+				val = components.get(name)
+				if isinstance(val, (int, float)) and val >= 0:
+					windows[name].add(ts, float(val))
+
+	def get(self, key: Tuple[float, float], now: float | None = None) -> Dict[str, Any] | None:
+		now = time.time() if now is None else float(now)
+		with self._lock:
+			windows = self._windows.get(key)
+			if windows is None:
+				return None
+			concentrations = {name: windows[name].nowcast(now) for name in NOWCAST_POLLUTANTS}
+			hours = {name: windows[name].hours_available(now) for name in NOWCAST_POLLUTANTS}
+
+		available = {k: v for k, v in concentrations.items() if v is not None}
+		if not available:
+			return {"source": "nowcast", "aqi": None, "dominant": None, "scale": "EPA_0_500",
+				"subindices": {}, "concentrations": concentrations, "hours": hours}
+
+		from app.services.aqi import compute_aqi_arrays
+
+		result = compute_aqi_arrays(available)
+		subindices = {k: int(v) for k, v in result["subindices"].items() if v == v}
+		overall = float(result["overall"])
+		return {
+			"source": "nowcast",
+			"aqi": None if overall != overall else int(overall),
+			"dominant": result["dominant"].item(),
+			"scale": "EPA_0_500",
+			"subindices": subindices,
+			"concentrations": {k: (round(v, 1) if v is not None else None) for k, v in concentrations.items()},
+			"hours": hours,
+		}
+
+
+def record_current_pollution(store: NowCastStore, key: Tuple[float, float], ow_current: dict | None) -> None:
+	"""Feed the first item of an OpenWeather current-pollution payload into ``store``."""
+	lst = (ow_current or {}).get("list") or []
+	if not lst:
+		return
+	entry = lst[0] or {}
+	components = entry.get("components") or {}
+	store.observe(key, components, entry.get("dt"))
+
+
+# Global store fed by fetch_openweather_current
+nowcast_store = NowCastStore()
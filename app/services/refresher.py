@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+from app.services.cache import UpstreamCache, upstream_cache
+
+logger = logging.getLogger(__name__)
+
+# -------------- Background refresh of hot locations --------------
+#
+# Request frequency is tracked per quantized location with exponentially
+# decaying counts. A daemon thread periodically re-fetches cached sources of
+# the top-N locations shortly before they expire, and stale hits from the
+# cache are refreshed on a small worker pool instead of the request path.
+# Only locations still in demand are kept warm: a decayed score of at least
+# REFRESH_MIN_SCORE (about that many requests in the last half-life) and a
+# request within REFRESH_IDLE_SECONDS. Entries already past the cache's stale
+# grace are left to the next request, so a location asked for once is not
+# refreshed forever.
+
+Location = Tuple[float, float]
+
+
+class HotLocations:
+	"""Decaying request counter per location."""
+
+	def __init__(self, half_life: float = 900, max_tracked: int = 10000) -> None:
+		self.half_life = half_life
+		self.max_tracked = max_tracked
+		self._scores: Dict[Location, Tuple[float, float]] = {}
+		self._lock = threading.Lock()
+
+	def _decayed(self, score: float, updated: float, now: float) -> float:
+		return score * 0.5 ** ((now - updated) / self.half_life)
+
+	def hit(self, loc: Location, now: float | None = None) -> None:
+		now = time.time() if now is None else now
+		with self._lock:
+			score, updated = self._scores.get(loc, (0.0, now))
+			self._scores[loc] = (self._decayed(score, updated, now) + 1.0, now)
+			if len(self._scores) > self.max_tracked:
+				self._prune(now)
+
+	def _prune(self, now: float) -> None:
+		keep = heapq.nlargest(self.max_tracked // 2, self._scores.items(),
+							  key=lambda kv: self._decayed(kv[1][0], kv[1][1], now))
+		self._scores = dict(keep)
+
+	def top(self, n: int, now: float | None = None, min_score: float = 0.0,
+			max_idle: float | None = None) -> List[Location]:
+		"""Up to ``n`` locations by decayed score, skipping those under ``min_score`` or
+		not requested within ``max_idle`` seconds."""
+		now = time.time() if now is None else now
+		with self._lock:
+			items = list(self._scores.items())
+		scored = [(self._decayed(score, updated, now), loc) for loc, (score, updated) in items
+				  if max_idle is None or now - updated <= max_idle]
+		ranked = heapq.nlargest(n, [(score, loc) for score, loc in scored if score >= min_score])
+		return [loc for _, loc in ranked]
+
+
+class BackgroundRefresher:
+	"""Keeps cache entries of popular locations warm."""
+
+	def __init__(self, cache: UpstreamCache, top_n: int = 20, refresh_ahead: float = 120,
+				 interval: float = 30, workers: int = 2, min_score: float = 1.5,
+				 max_idle: float = 3600) -> None:
+		self.cache = cache
+		self.top_n = top_n
+		self.refresh_ahead = refresh_ahead
+		self.min_score = min_score
+		self.max_idle = max_idle
+		self.interval = interval
+		self.workers = workers
+		self.hot = HotLocations()
+		self.app = None
+		self._in_flight: Set[Tuple[str, float, float]] = set()
+		self._lock = threading.Lock()
+		self._executor: ThreadPoolExecutor | None = None
+		self._thread: threading.Thread | None = None
+		self._pid: int | None = None
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.app = app
+		self.top_n = int(cfg.get("REFRESH_TOP_N", self.top_n))
+		self.refresh_ahead = float(cfg.get("REFRESH_AHEAD_SECONDS", self.refresh_ahead))
+		self.interval = float(cfg.get("REFRESH_INTERVAL_SECONDS", self.interval))
+		self.min_score = float(cfg.get("REFRESH_MIN_SCORE", self.min_score))
+		self.max_idle = float(cfg.get("REFRESH_IDLE_SECONDS", self.max_idle))
+		if cfg.get("BACKGROUND_REFRESH", True):
+			self.cache.on_access = self.track
+			self.cache.schedule_refresh = self.schedule
+
+	def track(self, lat: float, lon: float) -> None:
+		self.hot.hit((lat, lon))
+		self._ensure_started()
+
+	def _ensure_started(self) -> None:
+		# Threads do not survive fork; (re)start lazily in each worker process
+		if self._pid == os.getpid():
+			return
+		with self._lock:
+			if self._pid == os.getpid():
+				return
+			self._in_flight.clear()
+			self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="refresh")
+			self._thread = threading.Thread(target=self._loop, name="hot-location-refresher", daemon=True)
+			self._thread.start()
+			self._pid = os.getpid()
+
+	def schedule(self, kind: str, lat: float, lon: float) -> bool:
+		"""Queue a background refresh; False if one is already running for this key."""
+		self._ensure_started()
+		key = (kind, lat, lon)
+		with self._lock:
+			if key in self._in_flight or self._executor is None:
+				return False
+			self._in_flight.add(key)
+			executor = self._executor
+		executor.submit(self._refresh, key)
+		return True
+
+	def _refresh(self, key: Tuple[str, float, float]) -> None:
+		try:
+			with self.app.app_context():
+				self.cache.refresh(*key)
+		except Exception as e:
+			logger.warning("Background refresh failed for %s: %s", key, e)
+		finally:
+			with self._lock:
+				self._in_flight.discard(key)
+
+	def refresh_hot(self, now: float | None = None) -> int:
+		"""Schedule refreshes for hot entries close to expiry; returns how many were queued."""
+		now = time.time() if now is None else now
+		queued = 0
+		for lat, lon in self.hot.top(self.top_n, now, self.min_score, self.max_idle):
+			for kind in self.cache.kinds():
+				remaining = self.cache.expires_in(kind, lat, lon, now)
+				if remaining is None or remaining >= self.refresh_ahead:
+					continue
+				if remaining + self.cache.stale_ttl <= 0:
+					continue  # past the stale grace: the next request fetches it
+				queued += self.schedule(kind, lat, lon)
+		return queued
+
+	def _loop(self) -> None:
+		while True:
+			time.sleep(self.interval)
+			try:
+				self.refresh_hot()
+			except Exception as e:
+				logger.exception("Hot location refresh loop error: %s", e)
+
+
+# Global refresher wired to the upstream cache by create_app()
+refresher = BackgroundRefresher(upstream_cache)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.metrics import regrid_weights
+from app.services.tempo_tiles import TileCache
+
+logger = logging.getLogger(__name__)
+
+# -------------- Regridding weights per scan geometry --------------
+#
+# Granules of the same TEMPO scan position share their pixel geometry, so the
+# pixel -> grid cell mapping is a property of the scan, not the granule. It is
+# built once as a sparse (cells x pixels) weight matrix and cached in memory
+# and on disk under the scan identity (scan/granule id and swath size), grid
+# size and method. Regridding a granule is then one sparse-dense product over
+# all pixels, with the validity mask as an input column, so granules with
+# different cloud/fill patterns reuse the same matrix.
+#
+# Geolocation of the same scan position wanders a little from day to day, so
+# the weights carry a probe of the coordinates they were built from and are
+# reused while the swath stays within TOLERANCE_DEGREES of it (a pixel that
+# moved across a cell edge by less than that keeps its old cell); further
+# off, they are rebuilt.
+#
+# "centre" puts each pixel wholly in the cell holding its centre, which is
+# what aggregate_to_grid's binning does. "area" spreads each pixel over the
+# cells its footprint overlaps: the corner quadrilateral is sampled on an
+# AREA_SAMPLES x AREA_SAMPLES lattice, so a weight is the fraction of the
+# pixel in the cell.
+
+METHODS = ("centre", "area")
+AREA_SAMPLES = 3
+TOLERANCE_DEGREES = 0.02  # ~2 km, well under a TEMPO pixel
+PROBE_PIXELS = 4096
+_CHUNK_PIXELS = 65536
+_SEEN_KEYS = 1024
+
+
+def weights_key(scan: str, pixels: int, grid_size: float, method: str) -> str:
+	"""Cache key of the weights of one scan position at one grid size and method."""
+	return hashlib.sha1(f"{scan}|{pixels}|{grid_size!r}|{method}".encode("utf-8")).hexdigest()
+
+
+def _probe(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+	"""(2, <= PROBE_PIXELS) evenly strided pixel centres, NaN where not finite."""
+	step = max(1, len(lat) // PROBE_PIXELS)
+	return np.stack([lat[::step][:PROBE_PIXELS], lon[::step][:PROBE_PIXELS]]).astype(np.float32)
+
+
+def _area_samples(lat_bounds: np.ndarray, lon_bounds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""(pixels, AREA_SAMPLES**2) points spread bilinearly over each corner quadrilateral."""
+	steps = (np.arange(AREA_SAMPLES) + 0.5) / AREA_SAMPLES
+	s, t = (a.ravel() for a in np.meshgrid(steps, steps))
+	coeffs = np.stack([(1 - s) * (1 - t), s * (1 - t), s * t, (1 - s) * t])  # corners in ring order
+	return lat_bounds @ coeffs, lon_bounds @ coeffs
+
+
+class RegridWeights:
+	"""Sparse weights from swath pixels to the non-empty cells of one grid."""
+
+	__slots__ = ("matrix", "pattern", "unit", "cell_lat", "cell_lon", "grid_size", "probe")
+
+	def __init__(self, matrix, cell_lat: np.ndarray, cell_lon: np.ndarray, grid_size: float,
+				 probe: np.ndarray) -> None:
+		self.matrix = matrix.tocsr().astype(np.float64)  # same dtype as the inputs: no per-call upcast
+		self.unit = bool(np.all(self.matrix.data == 1.0))  # one cell per pixel: counts are the weight sums
+		self.pattern = None
+		if not self.unit:
+			self.pattern = self.matrix.copy()
+			self.pattern.data = np.ones_like(self.pattern.data)
+		self.cell_lat = cell_lat
+		self.cell_lon = cell_lon
+		self.grid_size = grid_size
+		self.probe = probe  # coordinates the weights were built from, see matches()
+
+	def matches(self, lat: np.ndarray, lon: np.ndarray) -> bool:
+		"""Whether a swath is close enough to the one these weights were built from to reuse them."""
+		probe = _probe(lat, lon)
+		return probe.shape == self.probe.shape and bool(np.allclose(
+			probe, self.probe, rtol=0, atol=TOLERANCE_DEGREES, equal_nan=True))
+
+	@property
+	def nbytes(self) -> int:
+		sizes = [m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (self.matrix, self.pattern) if m is not None]
+		return sum(sizes) + self.cell_lat.nbytes + self.cell_lon.nbytes
+
+	@classmethod
+	def build(cls, lat: np.ndarray, lon: np.ndarray, grid_size: float, method: str = "centre",
+			  lat_bounds: np.ndarray | None = None, lon_bounds: np.ndarray | None = None) -> "RegridWeights":
+		from scipy import sparse
+
+		if method not in METHODS:
+			raise ValueError(f"Unknown regrid method {method!r}; choose from {', '.join(METHODS)}")
+		if not grid_size > 0:
+			raise ValueError(f"grid_size must be positive, got {grid_size!r}")
+		pixels = len(lat)
+		corners = 4 if method == "area" else 1
+		lat_pts = np.asarray(lat_bounds if method == "area" else lat, dtype=np.float64).reshape(pixels, corners)
+		lon_pts = np.asarray(lon_bounds if method == "area" else lon, dtype=np.float64).reshape(pixels, corners)
+		finite = np.isfinite(lat_pts) & np.isfinite(lon_pts)
+		lat_cells = np.rint(np.where(finite, lat_pts, 0) / grid_size).astype(np.int64)
+		lon_cells = np.rint(np.where(finite, lon_pts, 0) / grid_size).astype(np.int64)
+		lat0 = int(lat_cells.min()) - 1  # area samples stay within a cell of the corners
+		lon0 = int(lon_cells.min()) - 1
+		span = int(lon_cells.max()) - lon0 + 2
+
+		# Cell id and pixel of every sample, in blocks of pixels to bound the temporaries
+		ids, cols = [], []
+		for start in range(0, pixels, _CHUNK_PIXELS):
+			stop = min(pixels, start + _CHUNK_PIXELS)
+			if method == "area":
+				sample_lat, sample_lon = _area_samples(lat_pts[start:stop], lon_pts[start:stop])
+				ok = np.all(finite[start:stop], axis=1)
+			else:
+				sample_lat, sample_lon = lat_pts[start:stop], lon_pts[start:stop]
+				ok = finite[start:stop, 0]
+			ok = ok & (np.abs(lat_pts[start:stop, 0]) <= 90) & (np.abs(lon_pts[start:stop, 0]) <= 180)
+			with np.errstate(invalid="ignore"):  # non-finite samples are dropped by ``ok``
+				cells = ((np.rint(sample_lat / grid_size).astype(np.int64) - lat0) * span
+						 + np.rint(sample_lon / grid_size).astype(np.int64) - lon0)
+			ids.append(cells[ok].ravel())
+			cols.append(np.repeat(np.arange(start, stop)[ok], cells.shape[1]))
+
+		# One row per non-empty cell (compacted as _bin does, not one per cell of the bounding
+		# rectangle); samples landing in the same cell are summed by the COO->CSR conversion
+		keys, rows = np.unique(np.concatenate(ids), return_inverse=True)
+		weight = 1.0 / AREA_SAMPLES ** 2 if method == "area" else 1.0
+		matrix = sparse.coo_matrix((np.full(len(rows), weight), (rows, np.concatenate(cols))),
+								   shape=(len(keys), pixels)).tocsr()
+		return cls(matrix, (keys // span + lat0).astype(np.int32), (keys % span + lon0).astype(np.int32), grid_size,
+				   _probe(np.asarray(lat), np.asarray(lon)))
+
+	def apply(self, valid: np.ndarray, values: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+		"""Per-cell weighted mean and std of each array in ``values`` (one value per ``valid``
+		pixel of the swath), plus the latitude/longitude, contributing-pixel count and summed
+		weight of each cell. Cells without valid pixels are dropped."""
+		# One full-swath row per input: the validity mask, then x - ref and (x - ref)² per array
+		# (shifted by the mean before squaring to keep precision); invalid pixels stay 0. Rows
+		# rather than a (pixels x inputs) block: a 1-D masked scatter is several times cheaper
+		inputs = np.zeros((1 + 2 * len(values), len(valid)))
+		inputs[0] = valid
+		refs = {}
+		for i, (name, v) in enumerate(values.items()):
+			refs[name] = float(np.mean(v, dtype=np.float64)) if len(v) else 0.0
+			inputs[1 + 2 * i][valid] = np.subtract(v, refs[name], dtype=np.float64)
+			np.square(inputs[1 + 2 * i], out=inputs[2 + 2 * i])
+		sums = [self.matrix @ row for row in inputs]
+		keep = sums[0] > 0
+		weight = sums[0][keep]
+		count = weight if self.unit else (self.pattern @ inputs[0])[keep]
+		count = np.rint(count).astype(np.int64)
+		out = {
+			"latitude": self.cell_lat[keep] * self.grid_size,
+			"longitude": self.cell_lon[keep] * self.grid_size,
+			"count": count,
+			"weight": weight,
+		}
+		for i, name in enumerate(values):
+			mean = sums[1 + 2 * i][keep] / weight
+			var = np.maximum(sums[2 + 2 * i][keep] / weight - mean * mean, 0.0)
+			with np.errstate(divide="ignore", invalid="ignore"):
+				std = np.sqrt(var * count / (count - 1))  # sample std, as the binned path
+			std[count < 2] = np.nan
+			out[f"{name}_mean"] = mean + refs[name]
+			out[f"{name}_std"] = std
+		return out
+
+	def to_bytes(self) -> bytes:
+		m = self.matrix
+		buf = io.BytesIO()
+		np.savez(buf, data=m.data.astype(np.float32), indices=m.indices, indptr=m.indptr, shape=np.array(m.shape),
+				 cell_lat=self.cell_lat, cell_lon=self.cell_lon, grid_size=np.array(self.grid_size), probe=self.probe)
+		return buf.getvalue()
+
+	@classmethod
+	def from_bytes(cls, data: bytes) -> "RegridWeights":
+		from scipy import sparse
+
+		with np.load(io.BytesIO(data)) as f:
+			matrix = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+			return cls(matrix, f["cell_lat"], f["cell_lon"], float(f["grid_size"]), f["probe"])
+
+
+class Regridder:
+	"""Weights by key: small in-memory LRU, then the size-bounded disk ``cache``, then built."""
+
+	def __init__(self, cache: TileCache | None = None, memory_entries: int = 8) -> None:
+		self.cache = cache
+		self.memory_entries = memory_entries
+		self._memory: "OrderedDict[str, RegridWeights]" = OrderedDict()
+		self._seen: "OrderedDict[str, None]" = OrderedDict()  # keys deferred by a lazy lookup
+		self._lock = threading.Lock()
+
+	def weights(self, key: str, build, matches, lazy: bool = False) -> RegridWeights | None:
+		"""Weights for ``key``, reused when ``matches(weights)`` and otherwise made by
+		``build()``. Held under the lock, so concurrent requests for a new geometry wait
+		for one build. With ``lazy`` a key without weights is only noted the first time
+		and None returned (the caller bins instead): the build pays off only once the
+		scan comes round again."""
+		with self._lock:
+			weights = self._memory.get(key)
+			source = "memory"
+			if weights is None and self.cache is not None:
+				data = self.cache.get(key, "npz")
+				if data is not None:
+					source = "disk"
+					try:
+						weights = RegridWeights.from_bytes(data)
+					except (OSError, ValueError, KeyError) as e:
+						logger.warning("Regrid weights %s unreadable, rebuilding: %s", key[:12], e)
+			if weights is not None and not matches(weights):
+				regrid_weights.inc("stale")
+				weights = None
+			if weights is not None:
+				regrid_weights.inc(source)
+			elif lazy and key not in self._seen:
+				self._seen[key] = None
+				while len(self._seen) > _SEEN_KEYS:
+					self._seen.popitem(last=False)
+				regrid_weights.inc("deferred")
+				return None
+			else:
+				weights = build()
+				regrid_weights.inc("built")
+				logger.info("Built regrid weights %s: %d cells, %d nonzeros", key[:12],
+							weights.matrix.shape[0], weights.matrix.nnz)
+				if self.cache is not None:
+					self.cache.put(key, "npz", weights.to_bytes())
+			self._memory[key] = weights
+			self._memory.move_to_end(key)
+			while len(self._memory) > self.memory_entries:
+				self._memory.popitem(last=False)
+			return weights
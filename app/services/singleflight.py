@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict
+
+try:  # POSIX only; on other platforms coordination stays within the process
+	import fcntl
+except ImportError:  # pragma: no cover
+	fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# -------------- Single-flight upstream calls --------------
+#
+# Concurrent callers asking for the same key share one in-flight call.
+# Inside a worker, followers wait on the leader's event. Across gunicorn
+# workers on the same host, leaders serialize on a per-key lock file; the
+# winner writes its JSON result next to the lock so workers that were
+# waiting pick it up instead of calling upstream again.
+#
+# Nobody waits forever: a follower whose leader has not finished within
+# wait_timeout makes the call itself. The lock directory is private to the
+# user (0700). If it exists but belongs to someone else, coordination stays
+# within the process rather than trusting files there.
+# Results and lock files unused for result_max_age are removed from time to time.
+
+
+class _Call:
+	__slots__ = ("done", "value", "error")
+
+	def __init__(self) -> None:
+		self.done = threading.Event()
+		self.value: Any = None
+		self.error: BaseException | None = None
+
+
+class SingleFlight:
+	def __init__(self, lock_dir: str | None = None, wait_timeout: float = 30.0, reuse_window: float = 2.0,
+				 result_max_age: float = 60.0) -> None:
+		self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), "tempo-vision-singleflight")
+		self.wait_timeout = wait_timeout
+		self.reuse_window = reuse_window
+		self.result_max_age = result_max_age
+		self.cross_process = fcntl is not None
+		self._calls: Dict[str, _Call] = {}
+		self._lock = threading.Lock()
+		self._writes = 0
+		self._dir_ok: bool | None = None
+		self.stats: Dict[str, int] = {"leaders": 0, "shared": 0, "shared_cross_process": 0, "follower_timeouts": 0}
+
+	def do(self, key: str, fn: Callable[[], Any]) -> Any:
+		"""Run ``fn`` once per key across concurrent callers and return its result."""
+		with self._lock:
+			call = self._calls.get(key)
+			leader = call is None
+			if leader:
+				call = _Call()
+				self._calls[key] = call
+
+		if not leader:
+			if not call.done.wait(self.wait_timeout):
+				self.stats["follower_timeouts"] += 1  # the leader is stuck: do not wait on it any longer
+				return fn()
+			self.stats["shared"] += 1
+			if call.error is not None:
+				raise call.error
+			return call.value
+
+		self.stats["leaders"] += 1
+		try:
+			call.value = self._run_leader(key, fn)
+		except BaseException as e:
+			call.error = e
+			raise
+		finally:
+			with self._lock:
+				self._calls.pop(key, None)
+			call.done.set()
+		return call.value
+
+	def _paths(self, key: str) -> tuple[str, str]:
+		digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+		return (os.path.join(self.lock_dir, f"{digest}.lock"), os.path.join(self.lock_dir, f"{digest}.json"))
+
+	def _private_dir(self) -> bool:
+		"""Create the lock directory 0700; False if it is not ours alone."""
+		if self._dir_ok is None:
+			try:
+				os.makedirs(self.lock_dir, mode=0o700, exist_ok=True)
+				st = os.stat(self.lock_dir)
+				self._dir_ok = st.st_uid == os.getuid()
+				if self._dir_ok and st.st_mode & 0o077:
+					os.chmod(self.lock_dir, 0o700)  # created before it was private; only we could write there
+			except OSError:
+				self._dir_ok = False
+			if not self._dir_ok:
+				logger.warning("Single-flight directory %s is not private; sharing results within this process only",
+							   self.lock_dir)
+		return self._dir_ok
+
+	def _run_leader(self, key: str, fn: Callable[[], Any]) -> Any:
+		if not self.cross_process or not self._private_dir():
+			return fn()
+		try:
+			lock_path, result_path = self._paths(key)
+			lock_file = open(lock_path, "a+")
+		except OSError:
+			return fn()
+
+		# Results another worker wrote just before we arrived are as good as our own
+		started = time.time() - self.reuse_window
+		try:
+			if not self._acquire(lock_file):
+				return fn()
+			try:
+				os.utime(lock_path)  # last use, for _cleanup
+				shared = self._read_result(result_path, since=started)
+				if shared is not None:
+					self.stats["shared_cross_process"] += 1
+					return shared["value"]
+				value = fn()
+				if value is not None:
+					self._write_result(result_path, value)
+				return value
+			finally:
+				fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+		finally:
+			lock_file.close()
+
+	def _acquire(self, lock_file) -> bool:
+		deadline = time.time() + self.wait_timeout
+		while True:
+			try:
+				fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+				return True
+			except BlockingIOError:
+				if time.time() >= deadline:
+					return False
+				time.sleep(0.02)
+
+	def _read_result(self, path: str, since: float) -> Dict[str, Any] | None:
+		"""Result another worker wrote while we were waiting for the lock."""
+		try:
+			with open(path, "r", encoding="utf-8") as fh:
+				payload = json.load(fh)
+		except (OSError, ValueError):
+			return None
+		if payload.get("written_at", 0) < since:
+			return None
+		return payload
+
+	def _write_result(self, path: str, value: Any) -> None:
+		tmp = f"{path}.{os.getpid()}.tmp"
+		try:
+			with open(tmp, "w", encoding="utf-8") as fh:
+				json.dump({"written_at": time.time(), "value": value}, fh)
+			os.replace(tmp, path)
+		except (OSError, TypeError, ValueError):
+			try:
+				os.remove(tmp)
+			except OSError:
+				pass
+			return
+		self._writes += 1
+		if self._writes % 100 == 0:
+			self._cleanup()
+
+	def _cleanup(self) -> None:
+		cutoff = time.time() - self.result_max_age
+		try:
+			names = os.listdir(self.lock_dir)
+		except OSError:
+			return
+		for name in names:
+			path = os.path.join(self.lock_dir, name)
+			try:
+				if os.path.getmtime(path) >= cutoff:
+					continue
+				if name.endswith(".json"):
+					os.remove(path)
+				elif name.endswith(".lock"):
+					self._remove_lock(path)
+			except OSError:
+				continue
+
+	def _remove_lock(self, path: str) -> None:
+		"""Delete an unused lock file, only while holding it so no leader is running."""
+		with open(path, "a+") as lock_file:
+			try:
+				fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				return
+			os.remove(path)
+
+
+# Shared by the upstream cache
+single_flight = SingleFlight()
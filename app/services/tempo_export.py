@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+# -------------- Streaming export of TEMPO data --------------
+#
+# Observations (one row per valid pixel) and grid cells are written a chunk
+# of rows at a time: the bbox/QA mask is applied per chunk and each chunk is
+# encoded and yielded before the next is touched, so the response never holds
+# more than one chunk of text and the client sees rows after the first chunk.
+#
+# Binary layout ("bin"): MAGIC, uint32 header length, a JSON header
+# ({"columns": [[name, numpy dtype str], ...], "meta": {...}}), then frames of
+# uint32 row count followed by each column's little-endian values in header
+# order; a frame of 0 rows ends the stream. ``read_binary`` decodes it.
+
+FORMATS: Dict[str, str] = {
+	"ndjson": "application/x-ndjson",
+	"csv": "text/csv",
+	"bin": "application/octet-stream",
+}
+MAGIC = b"TMPOCOL1"
+DEFAULT_CHUNK_ROWS = 8192
+
+# (name, dtype in the binary format, printf format for text); float32 sources
+# carry ~7 significant digits, so text is not printed beyond that
+Spec = Tuple[Tuple[str, str, str], ...]
+OBSERVATION_COLUMNS: Spec = (
+	("latitude", "<f4", "%.5f"),
+	("longitude", "<f4", "%.5f"),
+	("no2_column", "<f4", "%.7g"),
+	("estimated_aqi", "<f4", "%.3f"),
+)
+QA_COLUMN = ("qa_flag", "|u1", "%d")
+GRID_COLUMNS: Spec = (
+	("latitude", "<f8", "%.6g"),
+	("longitude", "<f8", "%.6g"),
+	("no2_mean", "<f8", "%.7g"),
+	("no2_std", "<f8", "%.7g"),
+	("no2_count", "<i4", "%d"),
+	("aqi_mean", "<f8", "%.3f"),
+	("aqi_std", "<f8", "%.3f"),
+)
+
+Chunk = Dict[str, np.ndarray]
+
+
+def _bbox_mask(lat: np.ndarray, lon: np.ndarray, lat_range, lon_range) -> np.ndarray | None:
+	mask = None
+	if lat_range is not None:
+		mask = (lat >= lat_range[0]) & (lat <= lat_range[1])
+	if lon_range is not None:
+		lon_mask = (lon >= lon_range[0]) & (lon <= lon_range[1])
+		mask = lon_mask if mask is None else mask & lon_mask
+	return mask
+
+
+def observation_columns(observations) -> Spec:
+	return OBSERVATION_COLUMNS + ((QA_COLUMN,) if observations.qa_flag is not None else ())
+
+
+def observation_chunks(observations, lat_range=None, lon_range=None, qa_mask: int | None = None,
+					   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Chunk]:
+	"""Column slices of a TempoObservations, filtered per chunk."""
+	from app.tempo_processor import no2_to_aqi
+
+	for start in range(0, len(observations), chunk_rows):
+		rows = slice(start, start + chunk_rows)
+		chunk = {
+			"latitude": observations.latitude[rows],
+			"longitude": observations.longitude[rows],
+			"no2_column": observations.no2_column[rows],
+		}
+		if observations.qa_flag is not None:
+			chunk["qa_flag"] = observations.qa_flag[rows]
+		mask = _bbox_mask(chunk["latitude"], chunk["longitude"], lat_range, lon_range)
+		if qa_mask is not None and observations.qa_flag is not None:
+			qa_ok = (chunk["qa_flag"] & np.uint8(qa_mask)) == 0
+			mask = qa_ok if mask is None else mask & qa_ok
+		if mask is not None:
+			if not mask.any():
+				continue
+			chunk = {name: values[mask] for name, values in chunk.items()}
+		chunk["estimated_aqi"] = no2_to_aqi(chunk["no2_column"])
+		yield chunk
+
+
+def grid_chunks(grid, lat_range=None, lon_range=None, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Chunk]:
+	"""Column slices of an aggregate_to_grid() frame; a cell is kept when its centre is in the bbox."""
+	columns = {name: grid[name].to_numpy() for name, _, _ in GRID_COLUMNS}
+	mask = _bbox_mask(columns["latitude"], columns["longitude"], lat_range, lon_range)
+	if mask is not None:
+		columns = {name: values[mask] for name, values in columns.items()}
+	for start in range(0, len(columns["latitude"]), chunk_rows):
+		yield {name: values[start:start + chunk_rows] for name, values in columns.items()}
+
+
+def _text_rows(spec: Spec, chunk: Chunk, layout: Callable[[list], str], null: str) -> str:
+	"""One chunk as text; ``layout`` turns per-column printf formats into a row template."""
+	names = [name for name, _, _ in spec]
+	values = [chunk[name].tolist() for name in names]
+	if not any(chunk[name].dtype.kind == "f" and np.isnan(chunk[name]).any() for name in names):
+		template = layout([fmt for _, _, fmt in spec])
+		return "".join([template % row for row in zip(*values)])
+	# Rare path (single-pixel grid cells have no std): format column by column
+	cells = [[null if v != v else fmt % v for v in column] for (_, _, fmt), column in zip(spec, values)]
+	template = layout(["%s"] * len(spec))
+	return "".join([template % row for row in zip(*cells)])
+
+
+def encode_ndjson(spec: Spec, chunks: Iterable[Chunk]) -> Iterator[bytes]:
+	def layout(fmts):
+		return "{" + ",".join(f'"{name}":{fmt}' for (name, _, _), fmt in zip(spec, fmts)) + "}\n"
+
+	for chunk in chunks:
+		yield _text_rows(spec, chunk, layout, "null").encode("ascii")
+
+
+def encode_csv(spec: Spec, chunks: Iterable[Chunk]) -> Iterator[bytes]:
+	def layout(fmts):
+		return ",".join(fmts) + "\n"
+
+	yield (",".join(name for name, _, _ in spec) + "\n").encode("ascii")
+	for chunk in chunks:
+		yield _text_rows(spec, chunk, layout, "").encode("ascii")
+
+
+def encode_binary(spec: Spec, chunks: Iterable[Chunk], meta: Dict[str, Any] | None = None) -> Iterator[bytes]:
+	header = json.dumps({"columns": [[name, dtype] for name, dtype, _ in spec], "meta": meta or {}}).encode("utf-8")
+	yield MAGIC + struct.pack("<I", len(header)) + header
+	for chunk in chunks:
+		parts = [struct.pack("<I", len(chunk[spec[0][0]]))]
+		parts.extend(np.ascontiguousarray(chunk[name], dtype=dtype).tobytes() for name, dtype, _ in spec)
+		yield b"".join(parts)
+	yield struct.pack("<I", 0)
+
+
+def encode(fmt: str, spec: Spec, chunks: Iterable[Chunk], meta: Dict[str, Any] | None = None) -> Iterator[bytes]:
+	if fmt == "ndjson":
+		return encode_ndjson(spec, chunks)
+	if fmt == "csv":
+		return encode_csv(spec, chunks)
+	if fmt == "bin":
+		return encode_binary(spec, chunks, meta)
+	raise ValueError(f"Unknown export format {fmt!r}; choose from {', '.join(FORMATS)}")
+
+
+def read_binary(fp: BinaryIO) -> Tuple[Dict[str, Any], Iterator[Chunk]]:
+	"""Client-side decoder for the binary format: ``(header, chunks)``."""
+	def read_exact(size: int) -> bytes:
+		data = fp.read(size)
+		if len(data) != size:
+			raise ValueError("Truncated TEMPO export stream")
+		return data
+
+	if read_exact(len(MAGIC)) != MAGIC:
+		raise ValueError("Not a TEMPO column export")
+	(length,) = struct.unpack("<I", read_exact(4))
+	header = json.loads(read_exact(length))
+	columns = [(name, np.dtype(dtype)) for name, dtype in header["columns"]]
+
+	def chunks() -> Iterator[Chunk]:
+		while True:
+			(rows,) = struct.unpack("<I", read_exact(4))
+			if rows == 0:
+				return
+			yield {name: np.frombuffer(read_exact(rows * dtype.itemsize), dtype=dtype) for name, dtype in columns}
+
+	return header, chunks()
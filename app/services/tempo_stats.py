@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# -------------- Streaming statistics for TEMPO file summaries --------------
+#
+# Variables are read a block of leading-dimension rows at a time (about
+# CHUNK_ELEMENTS values, rounded up to whole rows of the file's own chunks). Each block is folded into running count/mean/M2
+# with Chan's parallel form of Welford's update, plus min/max, so a variable
+# is read once and never held whole. Quantiles are approximate: they come
+# from a fixed-size uniform sample drawn from every block in proportion to
+# its valid values (deterministic seed, so a file always summarises the same).
+#
+# Summaries are cached by a hash of the file's bytes: in memory, and as JSON
+# under a cache directory so other workers and restarts reuse them.
+
+CHUNK_ELEMENTS = 1 << 18
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+QUANTILE_SAMPLE = 10000
+MODES = ("full", "metadata")
+_HASH_BLOCK = 1 << 20
+
+
+class RunningStats:
+	"""Single-pass count/min/max/mean/std and a quantile sample of finite values."""
+
+	__slots__ = ("expected", "count", "mean", "m2", "min", "max", "_sample", "_rng")
+
+	def __init__(self, expected: int) -> None:
+		self.expected = max(1, expected)  # values the variable may hold, for sampling rates
+		self.count = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+		self.min = np.inf
+		self.max = -np.inf
+		self._sample = []
+		self._rng = np.random.default_rng(0)
+
+	def update(self, block: np.ndarray) -> None:
+		values = np.asarray(block).ravel()
+		if values.dtype.kind != "f":
+			values = values.astype(np.float64)
+		finite = np.isfinite(values)
+		if not finite.all():
+			values = values[finite]
+		n = len(values)
+		if not n:
+			return
+		block_mean = float(np.mean(values, dtype=np.float64))
+		deviation = np.subtract(values, block_mean, dtype=np.float64)
+		block_m2 = float(np.dot(deviation, deviation))
+		total = self.count + n
+		delta = block_mean - self.mean
+		self.mean += delta * n / total
+		self.m2 += block_m2 + delta * delta * self.count * n / total
+		self.count = total
+		self.min = min(self.min, float(values.min()))
+		self.max = max(self.max, float(values.max()))
+		take = min(n, int(np.ceil(n * QUANTILE_SAMPLE / self.expected)))
+		sample = values if take == n else values[self._rng.integers(0, n, take)]
+		self._sample.append(sample.astype(np.float64))
+
+	def result(self) -> Dict[str, Any]:
+		if not self.count:
+			return {"valid_points": 0, "min": None, "max": None, "mean": None, "std": None, "quantiles": None}
+		sample = np.concatenate(self._sample)
+		return {
+			"valid_points": self.count,
+			"min": self.min,
+			"max": self.max,
+			"mean": self.mean,
+			"std": float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None,
+			"quantiles": {f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, np.quantile(sample, QUANTILES))},
+		}
+
+
+def is_numeric(variable) -> bool:
+	return variable.dtype.kind in "biuf"
+
+
+def variable_metadata(variable) -> Dict[str, Any]:
+	"""What the file header says about a variable; reads no data."""
+	meta = {"shape": list(variable.shape), "dtype": str(variable.dtype), "dims": list(variable.dims)}
+	for attr in ("units", "long_name"):
+		if attr in variable.attrs:
+			meta[attr] = str(variable.attrs[attr])
+	return meta
+
+
+def variable_stats(variable, chunk_elements: int = CHUNK_ELEMENTS) -> Dict[str, Any]:
+	"""Streaming statistics of a numeric xarray Variable, read in leading-dimension blocks."""
+	stats = RunningStats(int(np.prod(variable.shape, dtype=np.int64)))
+	if variable.ndim == 0:
+		stats.update(variable.values)
+		return stats.result()
+	row_size = max(1, int(np.prod(variable.shape[1:], dtype=np.int64)))
+	rows = max(1, chunk_elements // row_size)
+	chunks = variable.encoding.get("chunksizes")
+	if chunks:  # whole on-disk chunks per block, or compressed chunks are inflated once per block
+		rows = -(-rows // chunks[0]) * chunks[0]
+	for start in range(0, variable.shape[0], rows):
+		stats.update(variable[start:start + rows].values)
+	return stats.result()
+
+
+def content_hash():
+	"""The hash summaries (and stored uploads) are keyed by; hexdigest() is the key."""
+	return hashlib.blake2b(digest_size=16)
+
+
+def file_digest(path: str) -> str:
+	"""Content hash of a file, read in blocks."""
+	digest = content_hash()
+	with open(path, "rb") as fh:
+		for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+class SummaryCache:
+	"""Summaries by (file hash, mode): an in-memory LRU in front of JSON files in ``directory``."""
+
+	def __init__(self, directory: str | None = None, max_entries: int = 32) -> None:
+		self.directory = directory
+		self.max_entries = max_entries
+		self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+		self._digests: Dict[str, str] = {}  # file identity (path:size:mtime) -> content hash
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _identity(path: str) -> str:
+		stat = os.stat(path)
+		return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+	def digest(self, path: str) -> str:
+		"""Content hash of ``path``, computed once per size/mtime of the file."""
+		identity = self._identity(path)
+		digest = self._digests.get(identity)
+		if digest is None:
+			digest = self._digests[identity] = file_digest(path)
+		return digest
+
+	def remember_digest(self, path: str, digest: str) -> None:
+		"""Record the hash of ``path`` computed elsewhere (e.g. while an upload was stored)."""
+		self._digests[self._identity(path)] = digest
+
+	def _path(self, key: str) -> str | None:
+		return os.path.join(self.directory, f"{key}.json") if self.directory else None
+
+	def get(self, key: str) -> Dict[str, Any] | None:
+		with self._lock:
+			summary = self._memory.get(key)
+			if summary is not None:
+				self._memory.move_to_end(key)
+				return summary
+		path = self._path(key)
+		if not path or not os.path.exists(path):
+			return None
+		try:
+			with open(path, "r", encoding="utf-8") as fh:
+				summary = json.load(fh)
+		except (OSError, ValueError) as e:
+			logger.warning("Summary cache entry %s unreadable: %s", path, e)
+			return None
+		self._remember(key, summary)
+		return summary
+
+	def put(self, key: str, summary: Dict[str, Any]) -> None:
+		self._remember(key, summary)
+		path = self._path(key)
+		if not path:
+			return
+		try:
+			os.makedirs(self.directory, exist_ok=True)
+			tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+			with open(tmp, "w", encoding="utf-8") as fh:
+				json.dump(summary, fh)
+			os.replace(tmp, path)
+		except (OSError, TypeError, ValueError) as e:
+			logger.warning("Summary cache write failed: %s", e)
+
+	def _remember(self, key: str, summary: Dict[str, Any]) -> None:
+		with self._lock:
+			self._memory[key] = summary
+			self._memory.move_to_end(key)
+			while len(self._memory) > self.max_entries:
+				self._memory.popitem(last=False)
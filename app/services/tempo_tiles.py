@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.metrics import tile_requests
+
+logger = logging.getLogger(__name__)
+
+# -------------- Map tiles of gridded TEMPO NO2 --------------
+#
+# XYZ (Web Mercator) 256x256 tiles of the loaded granule's NO2 column. Each
+# zoom samples one level of a lazily built pyramid: the aggregate_to_grid()
+# means at the finest grid size in GRID_LEVELS that is still at least a tile
+# pixel wide, so low zooms read coarse means instead of skipping pixels. A
+# level is a dense float32 raster (NaN where no pixel fell), built once per
+# data version and kept in memory. Rendered tiles go to a disk cache with LRU
+# eviction, so a tile that was seen before costs one file read. Keys are the
+# processor's data_version() (file content hash and extraction filters), so a
+# cache directory shared by workers and restarts never serves another file's tiles.
+
+TILE_SIZE = 256
+GRID_LEVELS = (1.0, 0.5, 0.25, 0.1, 0.05)  # degrees, coarse to fine
+MAX_ZOOM = 14
+NO2_RANGE = (1e14, 2e16)  # molecules/cm², log-scaled onto the colour ramp
+FORMATS: Dict[str, str] = {"png": "image/png", "f32": "application/octet-stream"}
+
+# Colour ramp from clean to polluted, as a 256-entry RGBA lookup table
+_RAMP_STOPS = ((0.0, (49, 54, 149)), (0.25, (69, 117, 180)), (0.45, (171, 217, 233)),
+			   (0.6, (254, 224, 144)), (0.8, (244, 109, 67)), (1.0, (165, 0, 38)))
+_positions = np.linspace(0.0, 1.0, 256)
+RAMP = np.empty((256, 4), dtype=np.uint8)
+for _channel in range(3):
+	RAMP[:, _channel] = np.rint(np.interp(_positions, [p for p, _ in _RAMP_STOPS], [c[_channel] for _, c in _RAMP_STOPS]))
+RAMP[:, 3] = 200  # slightly see-through over the base map
+
+
+def grid_size_for_zoom(z: int) -> float:
+	"""Finest pyramid level whose cells are at least one pixel of a zoom-``z`` tile."""
+	pixel = 360.0 / (TILE_SIZE * 2 ** z)
+	fitting = [g for g in GRID_LEVELS if g >= pixel]
+	return min(fitting) if fitting else max(GRID_LEVELS)
+
+
+def tile_centres(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+	"""Latitudes of the pixel rows and longitudes of the pixel columns of a tile."""
+	n = 2 ** z
+	offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+	lons = (x + offsets) / n * 360.0 - 180.0
+	lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+	return lats, lons
+
+
+def _fill_gaps(values: np.ndarray) -> None:
+	"""Fill empty cells that have valid neighbours with their mean, so cells finer than the
+	swath spacing (between mirror steps) do not show as stripes; wider holes stay empty."""
+	padded = np.pad(values, 1, constant_values=np.nan)
+	neighbours = np.stack([padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]])
+	found = np.sum(~np.isnan(neighbours), axis=0)
+	fill = np.isnan(values) & (found >= 2)
+	if fill.any():
+		values[fill] = np.nansum(neighbours[:, fill], axis=0) / found[fill]
+
+
+class GridLevel:
+	"""One pyramid level: grid means as a dense raster over the granule's extent."""
+
+	__slots__ = ("grid_size", "lat0", "lon0", "values")
+
+	def __init__(self, grid, grid_size: float) -> None:
+		lat_idx = np.rint(grid["latitude"].to_numpy() / grid_size).astype(np.int64)
+		lon_idx = np.rint(grid["longitude"].to_numpy() / grid_size).astype(np.int64)
+		self.grid_size = grid_size
+		self.lat0 = int(lat_idx.min())
+		self.lon0 = int(lon_idx.min())
+		self.values = np.full((int(lat_idx.max()) - self.lat0 + 1, int(lon_idx.max()) - self.lon0 + 1), np.nan, dtype=np.float32)
+		self.values[lat_idx - self.lat0, lon_idx - self.lon0] = grid["no2_mean"].to_numpy()
+		_fill_gaps(self.values)
+
+	def sample(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray | None:
+		"""Nearest-cell values at every (lat, lon) pixel centre; None when the tile misses the level."""
+		rows = np.rint(lats / self.grid_size).astype(np.int64) - self.lat0
+		cols = np.rint(lons / self.grid_size).astype(np.int64) - self.lon0
+		row_ok = (rows >= 0) & (rows < self.values.shape[0])
+		col_ok = (cols >= 0) & (cols < self.values.shape[1])
+		if not row_ok.any() or not col_ok.any():
+			return None
+		out = np.full((len(lats), len(lons)), np.nan, dtype=np.float32)
+		out[np.ix_(row_ok, col_ok)] = self.values[np.ix_(rows[row_ok], cols[col_ok])]
+		return out
+
+
+def colourize(values: np.ndarray) -> np.ndarray:
+	"""RGBA pixels for NO2 values; missing values are fully transparent."""
+	lo, hi = np.log10(NO2_RANGE[0]), np.log10(NO2_RANGE[1])
+	missing = np.isnan(values)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		scaled = (np.log10(np.where(missing, NO2_RANGE[0], values)) - lo) / (hi - lo)
+	rgba = RAMP[np.rint(np.clip(scaled, 0.0, 1.0) * 255).astype(np.uint8)]
+	rgba[missing] = 0
+	return rgba
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+	return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def encode_png(values: np.ndarray) -> bytes:
+	"""8-bit RGBA PNG (filter type 0 on every row)."""
+	rgba = colourize(values)
+	height, width = values.shape
+	scanlines = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1)
+	header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+	return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+			+ _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)) + _png_chunk(b"IEND", b""))
+
+
+def encode_f32(values: np.ndarray) -> bytes:
+	"""Row-major little-endian float32 (NaN = no data), gzip-compressed."""
+	return gzip.compress(values.astype("<f4").tobytes(), compresslevel=6, mtime=0)
+
+
+ENCODERS = {"png": encode_png, "f32": encode_f32}
+_EMPTY = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+EMPTY_TILES = {fmt: encode(_EMPTY) for fmt, encode in ENCODERS.items()}
+
+
+class TileCache:
+	"""Files on disk keyed by a hash of the key, evicted least recently used first.
+
+	A hit touches the file, so mtime is the last use. The byte total is
+	tracked per process; once over the budget, the directory is rescanned
+	(other workers write there too) and the oldest files are deleted.
+	"""
+
+	def __init__(self, directory: str, max_bytes: int, name: str = "Tile cache") -> None:
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.name = name  # for log messages
+		self._total: int | None = None
+		self._lock = threading.Lock()
+
+	def _path(self, key: str, fmt: str) -> str:
+		return os.path.join(self.directory, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.{fmt}")
+
+	def _scan(self):
+		try:
+			entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")]
+		except FileNotFoundError:
+			return []
+		files = []
+		for entry in entries:
+			try:
+				stat = entry.stat()
+			except FileNotFoundError:
+				continue
+			files.append((stat.st_mtime, stat.st_size, entry.path))
+		return files
+
+	def get(self, key: str, fmt: str) -> bytes | None:
+		path = self._path(key, fmt)
+		try:
+			with open(path, "rb") as fh:
+				data = fh.read()
+			os.utime(path)
+		except FileNotFoundError:
+			return None
+		return data
+
+	def put(self, key: str, fmt: str, data: bytes) -> None:
+		path = self._path(key, fmt)
+		try:
+			os.makedirs(self.directory, exist_ok=True)
+			tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+			with open(tmp, "wb") as fh:
+				fh.write(data)
+			os.replace(tmp, path)
+		except OSError as e:
+			logger.warning("%s write failed: %s", self.name, e)
+			return
+		with self._lock:
+			if self._total is None:
+				self._total = sum(size for _, size, _ in self._scan())
+			else:
+				self._total += len(data)
+			if self._total > self.max_bytes:
+				self._evict()
+
+	def _evict(self) -> None:
+		files = sorted(self._scan())
+		total = sum(size for _, size, _ in files)
+		target = self.max_bytes * 0.9  # some headroom so every write does not rescan
+		removed = 0
+		for _, size, path in files:
+			if total <= target:
+				break
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+			total -= size
+			removed += 1
+		self._total = total
+		if removed:
+			logger.info("%s evicted %d files", self.name, removed)
+
+
+class TileService:
+	def __init__(self, cache: TileCache, max_levels: int = 16) -> None:
+		self.cache = cache
+		self.max_levels = max_levels  # across data versions (one per workspace in use), least recently used dropped
+		self._levels: "OrderedDict[Tuple[str, float], GridLevel]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def level(self, processor, version: str, grid_size: float) -> GridLevel:
+		# Built under the lock: concurrent first requests for a level wait for one build
+		key = (version, grid_size)
+		with self._lock:
+			level = self._levels.get(key)
+			if level is None:
+				level = self._levels[key] = GridLevel(processor.aggregate_to_grid(grid_size), grid_size)
+				while len(self._levels) > self.max_levels:
+					self._levels.popitem(last=False)
+			self._levels.move_to_end(key)
+			return level
+
+	def tile(self, processor, z: int, x: int, y: int, fmt: str) -> bytes:
+		"""Encoded tile for the processor's current observations (extracted first if needed)."""
+		if processor.observations is None:
+			processor.extract_observations()
+		version = processor.data_version(processed=True)
+		if version is None:
+			raise ValueError("The loaded TEMPO file is no longer available; upload it again")
+		key = f"{version}|{z}/{x}/{y}"
+		data = self.cache.get(key, fmt)
+		if data is not None:
+			tile_requests.inc(fmt, "hit")
+			return data
+
+		values = self.level(processor, version, grid_size_for_zoom(z)).sample(*tile_centres(z, x, y))
+		if values is None:
+			tile_requests.inc(fmt, "empty")
+			return EMPTY_TILES[fmt]
+		data = ENCODERS[fmt](values)
+		self.cache.put(key, fmt, data)
+		tile_requests.inc(fmt, "miss")
+		return data
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Callable, Iterable, List, Tuple
+
+from flask import Request
+
+from app.metrics import upload_evictions, upload_ingests
+from app.services.tempo_stats import content_hash
+
+logger = logging.getLogger(__name__)
+
+# -------------- Content-addressed store of TEMPO uploads --------------
+#
+# An upload is written into the store directory as the request body is parsed
+# (UploadRequest hands Werkzeug an UploadSpool instead of its own temp file),
+# and its content hash (the hash file summaries are cached by) is computed as
+# the blocks arrive. Once received it is renamed to
+# <directory>/<hash>/<file name>. The name is kept because TEMPO metadata
+# (observation time, scan, granule) is parsed from it. If the store already
+# has those bytes the new copy is dropped, so a re-upload, from any
+# workspace, costs one pass over the data and no extra disk.
+#
+# The entry directory also holds the file's extractions
+# (observations-v<N>-<filters>.npz, written by the processor), so a file seen
+# before skips straight to its cached extraction.
+#
+# Once the store is over its size budget, whole entries are deleted least
+# recently used first (the entry directory's mtime, touched on every use).
+# Entries loaded by a workspace this worker holds in memory are kept; a
+# manifest alone does not pin its file, so workspaces nobody uses any more
+# cannot hold the store over budget. A workspace whose file was evicted comes
+# back empty and needs a new upload.
+
+EXTRACTION_VERSION = 1  # bump when the layout of cached observations changes
+_BLOCK = 1 << 20
+_STALE_PART_SECONDS = 3600  # partial uploads left by a crashed worker
+
+
+def _touch(path: str) -> None:
+	try:
+		os.utime(path)
+	except OSError:
+		pass
+
+
+class UploadSpool:
+	"""An upload being received: a ``.part`` file in the store, hashed as it is written.
+
+	Readable and seekable as Werkzeug needs; closing it removes the file unless
+	ingest() kept it.
+	"""
+
+	def __init__(self, directory: str) -> None:
+		fd, self.path = tempfile.mkstemp(suffix=".part", prefix=".", dir=directory)
+		self._file = os.fdopen(fd, "w+b")
+		self.digest = content_hash()
+		self.size = 0
+		self.kept = False
+
+	def write(self, data: bytes) -> int:
+		self.digest.update(data)
+		self.size += len(data)
+		return self._file.write(data)
+
+	def keep(self, path: str) -> None:
+		self._file.flush()
+		os.replace(self.path, path)
+		self.path = path
+		self.kept = True
+
+	def close(self) -> None:
+		self._file.close()
+		if not self.kept:
+			try:
+				os.remove(self.path)
+			except FileNotFoundError:
+				pass
+
+	def __getattr__(self, name: str):  # read, readline, seek, tell, ...
+		return getattr(self._file, name)
+
+
+class UploadStore:
+	"""Uploaded files by content hash, with their cached extractions, evicted by size."""
+
+	def __init__(self) -> None:
+		self.directory = os.path.join(tempfile.gettempdir(), "tempo-vision-uploads")
+		self.max_bytes = 2048 * 2 ** 20
+		self.pinned: Callable[[], Iterable[str]] = lambda: ()  # files still in use, never evicted
+		self._total: int | None = None
+		self._lock = threading.Lock()
+
+	def init_app(self, app, pinned: Callable[[], Iterable[str]] | None = None) -> None:
+		cfg = app.config
+		self.directory = os.path.abspath(cfg.get("UPLOAD_STORE_DIR", self.directory))
+		self.max_bytes = int(cfg.get("UPLOAD_STORE_MAX_MB", 2048)) * 2 ** 20
+		if pinned is not None:
+			self.pinned = pinned
+
+	def _stored_file(self, entry: str) -> str | None:
+		try:
+			names = sorted(n for n in os.listdir(entry) if n.endswith(".nc"))
+		except FileNotFoundError:
+			return None
+		return os.path.join(entry, names[0]) if names else None
+
+	def spool(self) -> UploadSpool:
+		"""A new UploadSpool in the store directory."""
+		os.makedirs(self.directory, exist_ok=True)
+		return UploadSpool(self.directory)
+
+	def ingest(self, stream: BinaryIO, filename: str) -> Tuple[str, str, bool]:
+		"""Store an upload: (stored path, content hash, whether it was already stored).
+
+		``stream`` is normally the UploadSpool the request body was parsed into,
+		already hashed and only renamed here; any other stream is copied in.
+		"""
+		spool = stream if isinstance(stream, UploadSpool) and not stream.kept else None
+		if spool is None or os.path.dirname(spool.path) != self.directory:
+			spool = self.spool()
+			for block in iter(lambda: stream.read(_BLOCK), b""):
+				spool.write(block)
+		size = spool.size
+		try:
+			key = spool.digest.hexdigest()
+			entry = os.path.join(self.directory, key)
+			stored = self._stored_file(entry)
+			if stored is None:
+				os.makedirs(entry, exist_ok=True)
+				path = os.path.join(entry, os.path.basename(filename))
+				spool.keep(path)
+		finally:
+			spool.close()
+		if stored is not None:
+			_touch(entry)
+			upload_ingests.inc("hit")
+			logger.info("Upload %s already stored as %s", filename, key)
+			return stored, key, True
+		upload_ingests.inc("miss")
+		self.added(size, keep=entry)
+		return path, key, False
+
+	def discard(self, key: str) -> None:
+		"""Remove an entry, e.g. a new upload that turned out not to be a readable TEMPO file."""
+		entry = os.path.join(self.directory, key)
+		if any(os.path.dirname(os.path.abspath(p)) == entry for p in self.pinned() if p):
+			return  # another workspace loaded the same bytes meanwhile
+		try:
+			size = sum(f.stat().st_size for f in os.scandir(entry) if f.is_file())
+		except FileNotFoundError:
+			return
+		shutil.rmtree(entry, ignore_errors=True)
+		with self._lock:
+			if self._total is not None:
+				self._total -= size
+
+	def extraction_path(self, source: str, filters) -> str | None:
+		"""Where the extraction of a stored file with ``filters`` is cached; None for files outside the store."""
+		entry = os.path.dirname(os.path.abspath(source))
+		if os.path.dirname(entry) != self.directory:
+			return None
+		_touch(entry)
+		key = hashlib.sha1(json.dumps(filters).encode("utf-8")).hexdigest()[:16]
+		return os.path.join(entry, f"observations-v{EXTRACTION_VERSION}-{key}.npz")
+
+	def added(self, nbytes: int, keep: str | None = None) -> None:
+		"""Account for ``nbytes`` written to the store; evicts other entries once over budget."""
+		with self._lock:
+			if self._total is None:
+				self._total = sum(size for _, size, _ in self._scan())
+			else:
+				self._total += nbytes
+			if self._total > self.max_bytes:
+				self._evict(keep)
+
+	def _scan(self) -> List[Tuple[float, int, str]]:
+		"""(last use, bytes, path) of every entry; also clears stale partial uploads."""
+		try:
+			items = list(os.scandir(self.directory))
+		except FileNotFoundError:
+			return []
+		entries = []
+		now = time.time()
+		for item in items:
+			try:
+				if item.is_dir():
+					size = sum(f.stat().st_size for f in os.scandir(item.path) if f.is_file())
+					entries.append((item.stat().st_mtime, size, item.path))
+				elif item.name.endswith(".part") and now - item.stat().st_mtime > _STALE_PART_SECONDS:
+					os.remove(item.path)
+			except FileNotFoundError:
+				continue
+		return entries
+
+	def _evict(self, keep: str | None) -> None:
+		entries = sorted(self._scan())
+		total = sum(size for _, size, _ in entries)
+		pinned = {os.path.dirname(os.path.abspath(p)) for p in self.pinned() if p}
+		target = self.max_bytes * 0.9  # some headroom so every upload does not rescan
+		for _, size, path in entries:
+			if total <= target:
+				break
+			if path == keep or path in pinned:
+				continue
+			shutil.rmtree(path, ignore_errors=True)
+			total -= size
+			upload_evictions.inc()
+			logger.info("Upload store evicted %s", os.path.basename(path))
+		self._total = total
+
+
+uploads = UploadStore()
+
+
+class UploadRequest(Request):
+	"""Request whose TEMPO upload parts are parsed straight into the upload store."""
+
+	upload_endpoints = frozenset({"api.upload_tempo_file"})
+
+	def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+		if self.endpoint in self.upload_endpoints and filename and filename.lower().endswith(".nc"):
+			return uploads.spool()
+		return super()._get_file_stream(total_content_length, content_type, filename, content_length)
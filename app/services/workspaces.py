@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.metrics import workspace_bytes, workspace_evictions, workspaces_loaded
+
+logger = logging.getLogger(__name__)
+
+# -------------- Per-session TEMPO workspaces --------------
+#
+# Each workspace (named by the client: ?workspace= or X-Workspace) has its
+# own TempoDataProcessor, so one analyst's upload or extraction never
+# replaces another's. "default" is the process-wide processor the app has
+# always used (and the one preloaded in the gunicorn master).
+#
+# What a workspace holds is also written to a small manifest on disk: the
+# source file and the last extraction's filters. Workers compare the
+# manifest with what they hold on every access and reload when another
+# worker changed it, so a workspace looks the same whichever worker serves
+# the request, and one unloaded from memory comes back on its next use.
+#
+# Memory: a workspace over WORKSPACE_QUOTA_MB is refused (the load or
+# extraction is undone). Across a worker, workspaces idle longer than
+# WORKSPACE_IDLE_SECONDS, beyond WORKSPACE_MAX, or over WORKSPACE_MEMORY_MB in
+# total are unloaded, least recently used first.
+
+DEFAULT_WORKSPACE = "default"
+WORKSPACE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MANIFEST = "manifest.json"
+
+
+class WorkspaceError(Exception):
+	status = 400
+
+
+class WorkspaceQuotaExceeded(WorkspaceError):
+	status = 413
+
+
+def _default_processor():
+	from app.tempo_processor import tempo_processor
+
+	return tempo_processor
+
+
+def _new_processor(name: str):
+	from app.tempo_processor import TempoDataProcessor
+
+	return TempoDataProcessor(name)
+
+
+class Workspace:
+	"""One client's TEMPO data: a processor plus the manifest that can rebuild it."""
+
+	def __init__(self, manager: "WorkspaceManager", workspace_id: str, processor) -> None:
+		self.manager = manager
+		self.id = workspace_id
+		self.processor = processor
+		self.lock = threading.RLock()  # loads, extractions and manifest syncs
+		self.last_used = time.monotonic()
+		self.manifest_stamp: int | None = None  # mtime_ns of the manifest this state matches
+		self.manifest: Dict[str, Any] = {}
+
+	@property
+	def directory(self) -> str:
+		return os.path.join(self.manager.directory, self.id)
+
+	@property
+	def memory_bytes(self) -> int:
+		return self.processor.memory_bytes()
+
+	def load(self, path: str) -> Dict[str, Any]:
+		"""Read a TEMPO file into the workspace; file info as read_tempo_file()."""
+		path = os.path.abspath(path)
+		with self.lock:
+			try:
+				file_info = self.processor.read_tempo_file(path)
+				self._check_quota("loading this file")
+			except Exception:
+				self.manifest_stamp = None  # back to what the manifest records on next use
+				raise
+			self._write_manifest({"source": path, "extract": None})
+		self.manager.enforce_budget(keep=self)
+		return file_info
+
+	def extract(self, lat_range=None, lon_range=None, qa_mask: int | None = None):
+		"""Extract observations (see TempoDataProcessor.extract_observations) and record the filters."""
+		with self.lock:
+			if self.processor.data is None:
+				self.sync()  # unloaded by the budget while a request still held the workspace
+			observations = self.processor.extract_observations(lat_range, lon_range, qa_mask)
+			self._check_quota("extracting")
+			self._write_manifest({**self.manifest, "extract": {
+				"lat_range": lat_range, "lon_range": lon_range, "qa_mask": qa_mask}})
+		self.manager.enforce_budget(keep=self)
+		return observations
+
+	def observations(self):
+		"""The current observations, extracted without filters if there are none yet."""
+		observations = self.processor.observations  # one read: a concurrent extract may replace it
+		return observations if observations is not None else self.extract()
+
+	def unload(self) -> None:
+		"""Close the file and drop the data now, once no load or extraction is running."""
+		with self.lock:
+			self.processor.unload()
+			self.manifest_stamp = None  # reload from the manifest if used again
+
+	def _check_quota(self, action: str) -> None:
+		used = self.memory_bytes
+		if used > self.manager.quota_bytes:
+			self.processor.unload()
+			self.manifest_stamp = None  # reload from the manifest on next use
+			raise WorkspaceQuotaExceeded(
+				f"Workspace '{self.id}' would use {used / 2 ** 20:.0f} MB after {action}; "
+				f"the quota is {self.manager.quota_bytes / 2 ** 20:.0f} MB")
+
+	def _manifest_path(self) -> str:
+		return os.path.join(self.directory, MANIFEST)
+
+	def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+		path = self._manifest_path()
+		try:
+			os.makedirs(self.directory, exist_ok=True)
+			tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+			with open(tmp, "w", encoding="utf-8") as fh:
+				json.dump({**manifest, "updated": time.time()}, fh)
+			os.replace(tmp, path)
+			self.manifest_stamp = os.stat(path).st_mtime_ns
+		except OSError as e:
+			logger.warning("Workspace %s manifest not written: %s", self.id, e)
+		self.manifest = manifest
+
+	def sync(self) -> None:
+		"""Bring the processor in line with the manifest if another worker (or an unload) changed it."""
+		path = self._manifest_path()
+		try:
+			stamp = os.stat(path).st_mtime_ns
+		except FileNotFoundError:
+			return  # nothing recorded: keep whatever is loaded (e.g. the preloaded default)
+		if stamp == self.manifest_stamp:
+			return
+		with self.lock:
+			if stamp == self.manifest_stamp:
+				return
+			with open(path, "r", encoding="utf-8") as fh:
+				manifest = json.load(fh)
+			source = manifest.get("source")
+			if source and os.path.exists(source):
+				if self.processor.source_path != source or self.processor.data is None:
+					self.processor.read_tempo_file(source)
+				extract = manifest.get("extract")
+				if extract is not None:
+					self.processor.extract_observations(
+						_range(extract.get("lat_range")), _range(extract.get("lon_range")), extract.get("qa_mask"))
+				logger.info("Workspace %s loaded %s", self.id, os.path.basename(source))
+			elif source:
+				logger.warning("Workspace %s: %s is no longer in the upload store", self.id, os.path.basename(source))
+			self.manifest = manifest
+			self.manifest_stamp = stamp
+
+	def describe(self) -> Dict[str, Any]:
+		processor = self.processor
+		return {
+			"id": self.id,
+			"source": os.path.basename(self.manifest.get("source") or processor.source_path or "") or None,
+			"loaded": processor.data is not None,
+			"observations": len(processor.observations) if processor.observations is not None else 0,
+			"memory_mb": round(self.memory_bytes / 2 ** 20, 1),
+			"idle_seconds": round(time.monotonic() - self.last_used, 1),
+		}
+
+
+def _range(value) -> Tuple[float, float] | None:
+	return tuple(value) if value is not None else None
+
+
+class WorkspaceManager:
+	"""Workspaces held by this process, unloaded least recently used first."""
+
+	def __init__(self) -> None:
+		self.directory = os.path.join(tempfile.gettempdir(), "tempo-vision-workspaces")
+		self.quota_bytes = 512 * 2 ** 20
+		self.budget_bytes = 2048 * 2 ** 20
+		self.idle_seconds = 1800.0
+		self.max_workspaces = 16
+		self.processor_factory: Callable[[str], Any] = _new_processor
+		self.default_factory: Callable[[], Any] = _default_processor
+		self._workspaces: "OrderedDict[str, Workspace]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def init_app(self, app) -> None:
+		cfg = app.config
+		self.directory = cfg.get("WORKSPACE_DIR", self.directory)
+		self.quota_bytes = int(cfg.get("WORKSPACE_QUOTA_MB", 512)) * 2 ** 20
+		self.budget_bytes = int(cfg.get("WORKSPACE_MEMORY_MB", 2048)) * 2 ** 20
+		self.idle_seconds = float(cfg.get("WORKSPACE_IDLE_SECONDS", self.idle_seconds))
+		self.max_workspaces = int(cfg.get("WORKSPACE_MAX", self.max_workspaces))
+
+	def get(self, workspace_id: str | None = None) -> Workspace:
+		"""The workspace (created on first use), in step with its manifest."""
+		workspace_id = workspace_id or DEFAULT_WORKSPACE
+		if not WORKSPACE_ID.match(workspace_id):
+			raise WorkspaceError("Workspace ids are 1-64 letters, digits, '-' or '_'")
+		with self._lock:
+			workspace = self._workspaces.get(workspace_id)
+			if workspace is None:
+				processor = self.default_factory() if workspace_id == DEFAULT_WORKSPACE else self.processor_factory(workspace_id)
+				workspace = self._workspaces[workspace_id] = Workspace(self, workspace_id, processor)
+			self._workspaces.move_to_end(workspace_id)
+			workspace.last_used = time.monotonic()
+		workspace.sync()
+		self.enforce_budget(keep=workspace)
+		return workspace
+
+	def enforce_budget(self, keep: Workspace | None = None) -> None:
+		"""Unload idle workspaces, then the least recently used ones until within count and memory."""
+		now = time.monotonic()
+		with self._lock:
+			candidates = [w for w in self._workspaces.values() if w is not keep and w.id != DEFAULT_WORKSPACE]
+			evict: List[Tuple[Workspace, str]] = [(w, "idle") for w in candidates if now - w.last_used > self.idle_seconds]
+			remaining = [w for w in candidates if now - w.last_used <= self.idle_seconds]
+			count = len(self._workspaces) - len(evict)
+			total = sum(w.memory_bytes for w in self._workspaces.values() if all(w is not e for e, _ in evict))
+			for workspace in remaining:  # oldest first
+				if count <= self.max_workspaces and total <= self.budget_bytes:
+					break
+				evict.append((workspace, "count" if count > self.max_workspaces else "memory"))
+				count -= 1
+				total -= workspace.memory_bytes
+			for workspace, _ in evict:
+				del self._workspaces[workspace.id]
+		for workspace, reason in evict:
+			workspace.unload()
+			workspace_evictions.inc(reason)
+			logger.info("Unloaded workspace %s (%s)", workspace.id, reason)
+
+	def delete(self, workspace_id: str) -> bool:
+		"""Forget a workspace: unload it and remove its manifest (uploads stay in the upload store)."""
+		if not WORKSPACE_ID.match(workspace_id):
+			raise WorkspaceError("Workspace ids are 1-64 letters, digits, '-' or '_'")
+		if workspace_id == DEFAULT_WORKSPACE:
+			raise WorkspaceError("The default workspace cannot be deleted")
+		with self._lock:
+			held = self._workspaces.pop(workspace_id, None)
+		if held is not None:
+			held.unload()
+		directory = os.path.join(self.directory, workspace_id)
+		existed = held is not None or os.path.isdir(directory)
+		shutil.rmtree(directory, ignore_errors=True)
+		return existed
+
+	def loaded_sources(self) -> List[str]:
+		"""Files the workspaces this process holds in memory have loaded."""
+		with self._lock:
+			workspaces = list(self._workspaces.values())
+		return [w.processor.source_path for w in workspaces if w.processor.source_path]
+
+	def describe(self) -> List[Dict[str, Any]]:
+		with self._lock:
+			workspaces = list(self._workspaces.values())
+		return [w.describe() for w in reversed(workspaces)]  # most recently used first
+
+	def collect(self) -> None:
+		with self._lock:
+			workspaces = list(self._workspaces.values())
+		workspaces_loaded.set(len(workspaces))
+		workspace_bytes.set(sum(w.memory_bytes for w in workspaces))
+
+
+workspaces = WorkspaceManager()
@@ -10,29 +10,217 @@ import netCDF4 as nc
 from datetime import datetime, timedelta
 import os
 import json
+import hashlib
+import logging
 from typing import Dict, List, Tuple, Optional, Any
 
+from app.metrics import extraction_cache, summary_requests, tempo_duration
+from app.profiling import profiler
+from app.services.upload_store import uploads
+
+logger = logging.getLogger(__name__)
+
+QA_FLAG_VARIABLE = 'main_data_quality_flag'
+BOUNDS_VARIABLES = ('latitude_bounds', 'longitude_bounds')  # pixel corners, (..., 4)
+COORDINATE_NAMES = ('latitude', 'longitude', 'lat', 'lon')
+
+_regridder = None
+_summary_cache = None
+
+
+def get_regridder():
+    """Process-wide regridding weight cache, configured from Config on first use"""
+    global _regridder
+    if _regridder is None:
+        from app.config import Config
+        from app.services.regrid import Regridder
+        from app.services.tempo_tiles import TileCache
+        
+        cache = TileCache(Config.REGRID_CACHE_DIR, Config.REGRID_CACHE_MAX_MB * 2 ** 20, 'Regrid cache')
+        _regridder = Regridder(cache, Config.REGRID_MEMORY_ENTRIES)
+    return _regridder
+
+
+def get_summary_cache():
+    """Process-wide cache of file summaries by content hash"""
+    global _summary_cache
+    if _summary_cache is None:
+        from app.config import Config
+        from app.services.tempo_stats import SummaryCache
+        
+        _summary_cache = SummaryCache(Config.SUMMARY_CACHE_DIR)
+    return _summary_cache
+
+
+def no2_to_aqi(no2_column: np.ndarray) -> np.ndarray:
+    """
+    Convert NO2 column density to estimated AQI
+    Note: This is a simplified conversion for demonstration
+    """
+    # TEMPO NO2 is typically in molecules/cm²
+    # Convert to AQI using rough approximation
+    
+    # Normalize NO2 values (typical range: 1e14 to 1e16 molecules/cm²)
+    no2_normalized = np.log10(no2_column + 1e14) - 14  # Log scale 0-2
+    
+    # Map to AQI scale (0-500)
+    aqi_estimated = np.clip(no2_normalized * 100, 0, 300)  # Scale to 0-300 AQI
+    
+    return aqi_estimated
+
+
+class MissingQAFlags(ValueError):
+    """QA filtering was asked for but the file has no QA flag variable"""
+
+
+class TempoObservations:
+    """
+    Valid NO2 pixels of one granule in columnar form: float32 coordinates
+    and columns (TEMPO geolocation is float32 already, and 7 significant
+    digits are plenty for column densities), the granule-level
+    observation time, hour and weekday stored once, and the per-pixel QA
+    flags as a uint8 bitmask when the file has them.
+    
+    ``frame()`` gives the historical DataFrame on top of the same arrays.
+    ``pixel_mask`` (bit-packed, one bit per swath pixel) records which
+    pixels of the granule these are, so they can be regridded with the
+    swath's precomputed weights.
+    """
+    
+    def __init__(self, latitude: np.ndarray, longitude: np.ndarray, no2_column: np.ndarray,
+                 observation_time: datetime, qa_flag: Optional[np.ndarray] = None,
+                 pixel_mask: Optional[np.ndarray] = None):
+        self.latitude = np.ascontiguousarray(latitude, dtype=np.float32)
+        self.longitude = np.ascontiguousarray(longitude, dtype=np.float32)
+        self.no2_column = np.ascontiguousarray(no2_column, dtype=np.float32)
+        self.qa_flag = None if qa_flag is None else np.ascontiguousarray(qa_flag, dtype=np.uint8)
+        self.swath_size = None if pixel_mask is None else len(pixel_mask)
+        self.pixel_mask = None if pixel_mask is None else np.packbits(pixel_mask)
+        self.observation_time = observation_time
+        self.hour = observation_time.hour
+        self.day_of_week = observation_time.weekday()
+        self._estimated_aqi = None
+        self._frame = None
+    
+    def __len__(self) -> int:
+        return len(self.no2_column)
+    
+    @property
+    def estimated_aqi(self) -> np.ndarray:
+        if self._estimated_aqi is None:
+            self._estimated_aqi = no2_to_aqi(self.no2_column).astype(np.float32, copy=False)
+        return self._estimated_aqi
+    
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.latitude, self.longitude, self.no2_column, self.qa_flag, self.pixel_mask, self._estimated_aqi)
+        return sum(a.nbytes for a in arrays if a is not None)
+    
+    def valid_pixels(self) -> np.ndarray:
+        """Boolean mask over the swath of the pixels these observations came from"""
+        return np.unpackbits(self.pixel_mask, count=self.swath_size).view(bool)
+    
+    def save(self, path: str) -> None:
+        """Write the columns to an .npz file (atomically: readers never see a partial file)"""
+        arrays = {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'no2_column': self.no2_column,
+            'observation_time': np.array(self.observation_time.isoformat()),
+        }
+        if self.qa_flag is not None:
+            arrays['qa_flag'] = self.qa_flag
+        if self.pixel_mask is not None:
+            arrays['pixel_mask'] = self.pixel_mask
+            arrays['swath_size'] = np.array(self.swath_size)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'TempoObservations':
+        with np.load(path) as f:
+            observations = cls(f['latitude'], f['longitude'], f['no2_column'],
+                               datetime.fromisoformat(str(f['observation_time'])),
+                               f['qa_flag'] if 'qa_flag' in f else None)
+            if 'pixel_mask' in f:
+                observations.pixel_mask = f['pixel_mask']
+                observations.swath_size = int(f['swath_size'])
+        return observations
+    
+    def frame(self) -> pd.DataFrame:
+        """
+        DataFrame with the columns extract_no2_data() has always returned.
+        The float32 columns share memory with the arrays; the constant
+        columns cost one byte per row (observation_time is a one-category
+        Categorical, so ``.dt`` still works).
+        """
+        if self._frame is None:
+            rows = len(self)
+            columns = {
+                'latitude': self.latitude,
+                'longitude': self.longitude,
+                'no2_column': self.no2_column,
+                'observation_time': pd.Categorical.from_codes(
+                    np.zeros(rows, dtype=np.int8), categories=pd.DatetimeIndex([self.observation_time])),
+                'hour': np.full(rows, self.hour, dtype=np.int8),
+                'day_of_week': np.full(rows, self.day_of_week, dtype=np.int8),
+                'estimated_aqi': self.estimated_aqi,
+            }
+            if self.qa_flag is not None:
+                columns['qa_flag'] = self.qa_flag
+            self._frame = pd.DataFrame(columns, copy=False)
+        return self._frame
+
+
+def _grouped_mean_std(cell: np.ndarray, values: np.ndarray, count: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-cell mean and sample std (NaN for single-pixel cells), accumulated in float64"""
+    mean = np.bincount(cell, weights=values) / count
+    resid = values - mean[cell]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(np.bincount(cell, weights=resid * resid) / (count - 1))
+    std[count < 2] = np.nan
+    return mean, std
+
+
+def _sample_std(values: np.ndarray) -> float:
+    return float(np.std(values, dtype=np.float64, ddof=1)) if len(values) > 1 else float('nan')
+
 
 class TempoDataProcessor:
     """
     Process TEMPO NO2 satellite data for machine learning predictions
     """
     
-    def __init__(self):
+    def __init__(self, name: str = 'default'):
+        self.name = name  # workspace this processor belongs to
         self.data = None
-        self.processed_data = None
+        self.observations = None  # TempoObservations from the last extraction
         self.metadata = {}
+        self.source_path = None
+        self._source_hash = None  # content hash of source_path, once computed
+        self.extraction_filters = None  # (lat_range, lon_range, qa_mask) of the current observations
+        self.swath = None  # flattened full-swath (lat, lon, lat_bounds, lon_bounds) of the last extraction
+    
+    @property
+    def processed_data(self) -> Optional[pd.DataFrame]:
+        """DataFrame view of the last extraction (built on first access)"""
+        return None if self.observations is None else self.observations.frame()
         
     def read_tempo_file(self, filepath: str) -> Dict[str, Any]:
         """
         Read TEMPO NetCDF file and extract relevant data
         """
+        with tempo_duration.time('read'), profiler.trace_memory('read'):
+            return self._read_tempo_file(filepath)
+
+    def _read_tempo_file(self, filepath: str) -> Dict[str, Any]:
         try:
             # Check if file exists
             if not os.path.exists(filepath):
                 raise FileNotFoundError(f"TEMPO file not found: {filepath}")
             
-            print(f"Reading TEMPO file: {filepath}")
+            logger.info("Reading TEMPO file: %s", filepath)
             
             # Open NetCDF file using xarray with groups support
             try:
@@ -42,7 +230,7 @@ class TempoDataProcessor:
                 
                 # Check if it has groups (TEMPO L2 structure)
                 if hasattr(nc_ds, 'groups') and len(nc_ds.groups) > 0:
-                    print(f"Found groups: {list(nc_ds.groups.keys())}")
+                    logger.debug("Found groups: %s", list(nc_ds.groups.keys()))
                     
                     # Open each group as xarray dataset
                     self.data = {}
@@ -50,9 +238,9 @@ class TempoDataProcessor:
                         group_path = f"{filepath}#{group_name}"
                         try:
                             self.data[group_name] = xr.open_dataset(filepath, group=group_name, engine='netcdf4')
-                            print(f"Loaded group '{group_name}' with variables: {list(self.data[group_name].variables.keys())}")
+                            logger.debug("Loaded group '%s' with variables: %s", group_name, list(self.data[group_name].variables.keys()))
                         except Exception as e:
-                            print(f"Warning: Could not load group '{group_name}': {e}")
+                            logger.warning("Could not load group '%s': %s", group_name, e)
                     
                     # Also load root level
                     self.data['root'] = xr.open_dataset(filepath, engine='netcdf4')
@@ -71,7 +259,7 @@ class TempoDataProcessor:
                     self.main_data = self.data
                     
             except Exception as e:
-                print(f"Warning: Group loading failed, trying standard approach: {e}")
+                logger.warning("Group loading failed, trying standard approach: %s", e)
                 # Fallback to standard loading
                 self.data = xr.open_dataset(filepath, engine='netcdf4')
                 self.main_data = self.data
@@ -79,6 +267,11 @@ class TempoDataProcessor:
             # Extract metadata from filename
             filename = os.path.basename(filepath)
             self.metadata = self._parse_tempo_filename(filename)
+            self.source_path = filepath
+            self._source_hash = None
+            self.swath = None
+            self.observations = None
+            self.extraction_filters = None
             
             # Get file information
             if isinstance(self.data, dict):
@@ -106,11 +299,11 @@ class TempoDataProcessor:
                     'metadata': self.metadata
                 }
             
-            print(f"Successfully loaded TEMPO data with variables: {file_info['variables'][:10]}...")  # Show first 10
+            logger.info("Loaded TEMPO data with %d variables", len(file_info['variables']))
             return file_info
             
         except Exception as e:
-            print(f"Error reading TEMPO file: {e}")
+            logger.error("Error reading TEMPO file: %s", e)
             raise
     
     def _parse_tempo_filename(self, filename: str) -> Dict[str, Any]:
@@ -144,341 +337,496 @@ class TempoDataProcessor:
         return metadata
     
     def extract_no2_data(self, lat_range: Tuple[float, float] = None, 
-                        lon_range: Tuple[float, float] = None) -> pd.DataFrame:
+                        lon_range: Tuple[float, float] = None, qa_mask: Optional[int] = None) -> pd.DataFrame:
         """
         Extract NO2 data and convert to DataFrame for ML processing
         """
+        return self.extract_observations(lat_range, lon_range, qa_mask).frame()
+    
+    def extract_observations(self, lat_range: Tuple[float, float] = None,
+                             lon_range: Tuple[float, float] = None,
+                             qa_mask: Optional[int] = None) -> TempoObservations:
+        """
+        Extract valid NO2 pixels without building a DataFrame. With
+        ``qa_mask``, pixels whose QA flag has any of those bits set are
+        dropped (TEMPO: 1 = suspect, 2 = bad, so 2 keeps suspect pixels and
+        3 keeps only good ones).
+        """
+        with tempo_duration.time('extract'), profiler.trace_memory('extract'):
+            cache_path = self._extraction_cache_path(lat_range, lon_range, qa_mask)
+            if cache_path is not None and os.path.exists(cache_path):
+                try:
+                    observations = TempoObservations.load(cache_path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Cached extraction %s unreadable, extracting again: %s", cache_path, e)
+                else:
+                    extraction_cache.inc('hit')
+                    self.observations = observations
+                    self.swath = None  # read from the file if regridding needs it
+                    self.extraction_filters = self._filters(lat_range, lon_range, qa_mask)
+                    return observations
+            observations = self._extract_observations(lat_range, lon_range, qa_mask)
+            if cache_path is not None:
+                extraction_cache.inc('miss')
+                try:
+                    observations.save(cache_path)
+                    uploads.added(os.path.getsize(cache_path))
+                except OSError as e:
+                    logger.warning("Could not cache extraction: %s", e)
+            return observations
+    
+    def _extraction_cache_path(self, lat_range, lon_range, qa_mask) -> Optional[str]:
+        """Cache file for this extraction when the loaded file is in the upload store"""
+        if self.source_path is None:
+            return None
+        return uploads.extraction_path(self.source_path, self._filters(lat_range, lon_range, qa_mask))
+    
+    @staticmethod
+    def _filters(lat_range, lon_range, qa_mask) -> List[Any]:
+        """JSON form of an extraction's filters, for cache file names and data versions"""
+        return [list(lat_range) if lat_range is not None else None,
+                list(lon_range) if lon_range is not None else None, qa_mask]
+
+    def _extract_observations(self, lat_range: Tuple[float, float] = None,
+                              lon_range: Tuple[float, float] = None,
+                              qa_mask: Optional[int] = None) -> TempoObservations:
         if self.data is None:
             raise ValueError("No TEMPO data loaded. Call read_tempo_file() first.")
         
         try:
-            # Handle grouped vs single dataset
-            if isinstance(self.data, dict):
-                # TEMPO L2 grouped structure
-                product_data = self.data.get('product')
-                geolocation_data = self.data.get('geolocation')
-                
-                if not product_data or not geolocation_data:
-                    raise ValueError("Required TEMPO groups 'product' and 'geolocation' not found")
-                
-                # Get NO2 column data from product group
-                no2_var_names = ['vertical_column_troposphere', 'no2_column', 'column_amount']
-                no2_var = None
-                
-                for var_name in no2_var_names:
-                    if var_name in product_data.variables:
-                        no2_var = var_name
-                        break
-                
-                if not no2_var:
-                    print("Available product variables:", list(product_data.variables.keys()))
-                    raise ValueError("No NO2 data variable found in TEMPO product group")
-                
-                print(f"Using NO2 variable: {no2_var}")
-                
-                # Get coordinates from geolocation group
-                if 'latitude' not in geolocation_data.variables or 'longitude' not in geolocation_data.variables:
-                    print("Available geolocation variables:", list(geolocation_data.variables.keys()))
-                    raise ValueError("Latitude/Longitude coordinates not found in geolocation group")
-                
-                # Extract data
-                no2_data = product_data[no2_var]
-                lat_data = geolocation_data['latitude']
-                lon_data = geolocation_data['longitude']
-                
-                # Get time if available
-                time_data = geolocation_data.get('time', None)
-                
-            else:
-                # Single dataset structure
-                no2_var_names = [var for var in self.data.variables if 'no2' in var.lower() or 'nitrogen' in var.lower()]
-                
-                if not no2_var_names:
-                    possible_vars = ['vertical_column_troposphere', 'column_amount', 'no2_column', 'no2_vertical_column']
-                    no2_var_names = [var for var in possible_vars if var in self.data.variables]
-                
-                if not no2_var_names:
-                    print("Available variables:", list(self.data.variables.keys()))
-                    raise ValueError("No NO2 data variable found in TEMPO file")
-                
-                no2_var = no2_var_names[0]
-                print(f"Using NO2 variable: {no2_var}")
-                
-                # Get coordinates
-                lat_var = 'latitude' if 'latitude' in self.data.variables else 'lat'
-                lon_var = 'longitude' if 'longitude' in self.data.variables else 'lon'
-                
-                if lat_var not in self.data.variables or lon_var not in self.data.variables:
-                    print("Available coordinate variables:", [v for v in self.data.variables if any(coord in v.lower() for coord in ['lat', 'lon'])])
-                    raise ValueError("Latitude/Longitude coordinates not found")
-                
-                # Extract data
-                no2_data = self.data[no2_var]
-                lat_data = self.data[lat_var]
-                lon_data = self.data[lon_var]
-                time_data = None
+            no2_data, lat_data, lon_data, qa_data, bounds_data = self._locate_variables()
             
             # Convert to numpy arrays
             no2_values = no2_data.values
             lat_values = lat_data.values
             lon_values = lon_data.values
+            qa_values = qa_data.values if qa_data is not None else None
             
-            print(f"Data shapes - NO2: {no2_values.shape}, Lat: {lat_values.shape}, Lon: {lon_values.shape}")
+            logger.debug("Data shapes - NO2: %s, Lat: %s, Lon: %s", no2_values.shape, lat_values.shape, lon_values.shape)
             
-            # Handle multi-dimensional data - flatten all arrays consistently
-            if len(no2_values.shape) > 1:
-                no2_flat = no2_values.flatten()
-                lat_flat = lat_values.flatten()
-                lon_flat = lon_values.flatten()
-            else:
-                no2_flat = no2_values
-                lat_flat = lat_values
-                lon_flat = lon_values
-            
-            # Ensure all arrays have the same length
+            # Flatten all arrays consistently (views where possible) to the same length
+            no2_flat = no2_values.ravel()
+            lat_flat = lat_values.ravel()
+            lon_flat = lon_values.ravel()
             min_length = min(len(no2_flat), len(lat_flat), len(lon_flat))
             no2_flat = no2_flat[:min_length]
             lat_flat = lat_flat[:min_length]
             lon_flat = lon_flat[:min_length]
+            qa_flat = None
+            if qa_values is not None and qa_values.size >= min_length:
+                qa_flat = qa_values.ravel()[:min_length]
+                if qa_flat.dtype.kind == 'f':  # decoded with a fill value: missing counts as flagged
+                    qa_flat = np.nan_to_num(qa_flat, nan=255)
+                qa_flat = qa_flat.astype(np.uint8)
+            bounds_flat = [None, None]
+            if all(b is not None and b.size == 4 * lat_values.size for b in bounds_data):
+                bounds_flat = [b.values.reshape(-1, 4)[:min_length] for b in bounds_data]
+            
+            # Remove invalid values (NaN, fill values, negative values)
+            valid_mask = (~np.isnan(no2_flat) & 
+                         ~np.isnan(lat_flat) & 
+                         ~np.isnan(lon_flat) & 
+                         (no2_flat > -9999) & 
+                         (no2_flat < 1e20) &
+                         (no2_flat > 0) &  # NO2 should be positive
+                         (lat_flat >= -90) & (lat_flat <= 90) &
+                         (lon_flat >= -180) & (lon_flat <= 180))
             
             # Filter by geographic bounds if provided
             if lat_range is not None and lon_range is not None:
-                lat_mask = (lat_flat >= lat_range[0]) & (lat_flat <= lat_range[1])
-                lon_mask = (lon_flat >= lon_range[0]) & (lon_flat <= lon_range[1])
-                combined_mask = lat_mask & lon_mask
-                
-                no2_filtered = no2_flat[combined_mask]
-                lat_filtered = lat_flat[combined_mask]
-                lon_filtered = lon_flat[combined_mask]
-            else:
-                no2_filtered = no2_flat
-                lat_filtered = lat_flat
-                lon_filtered = lon_flat
+                valid_mask &= (lat_flat >= lat_range[0]) & (lat_flat <= lat_range[1])
+                valid_mask &= (lon_flat >= lon_range[0]) & (lon_flat <= lon_range[1])
             
-            # Remove invalid values (NaN, fill values, negative values)
-            valid_mask = (~np.isnan(no2_filtered) & 
-                         ~np.isnan(lat_filtered) & 
-                         ~np.isnan(lon_filtered) & 
-                         (no2_filtered > -9999) & 
-                         (no2_filtered < 1e20) &
-                         (no2_filtered > 0) &  # NO2 should be positive
-                         (lat_filtered >= -90) & (lat_filtered <= 90) &
-                         (lon_filtered >= -180) & (lon_filtered <= 180))
+            if qa_mask is not None:
+                if qa_flat is None:
+                    raise MissingQAFlags(f"QA filtering requested but '{QA_FLAG_VARIABLE}' not found")
+                valid_mask &= (qa_flat & np.uint8(qa_mask)) == 0
             
             if valid_mask.sum() == 0:
                 raise ValueError("No valid NO2 observations found after filtering")
             
-            # Create DataFrame
-            df = pd.DataFrame({
-                'latitude': lat_filtered[valid_mask],
-                'longitude': lon_filtered[valid_mask],
-                'no2_column': no2_filtered[valid_mask],
-                'observation_time': self.metadata.get('observation_time', datetime.now())
-            })
-            
-            # Add additional features
-            df['hour'] = df['observation_time'].dt.hour if hasattr(df['observation_time'], 'dt') else self.metadata.get('observation_time', datetime.now()).hour
-            df['day_of_week'] = df['observation_time'].dt.dayofweek if hasattr(df['observation_time'], 'dt') else self.metadata.get('observation_time', datetime.now()).weekday()
+            observations = TempoObservations(
+                lat_flat[valid_mask],
+                lon_flat[valid_mask],
+                no2_flat[valid_mask],
+                self.metadata.get('observation_time') or datetime.now(),
+                qa_flat[valid_mask] if qa_flat is not None else None,
+                valid_mask,
+            )
             
-            # Convert NO2 to AQI estimate (simplified conversion)
-            df['estimated_aqi'] = self._no2_to_aqi(df['no2_column'])
+            logger.info("Extracted %d valid NO2 observations", len(observations))
+            if logger.isEnabledFor(logging.DEBUG):  # full scans of every column
+                logger.debug("NO2 range: %.2e to %.2e molecules/cm²; coverage Lat %.2f-%.2f, Lon %.2f-%.2f",
+                             observations.no2_column.min(), observations.no2_column.max(), observations.latitude.min(),
+                             observations.latitude.max(), observations.longitude.min(), observations.longitude.max())
             
-            print(f"Extracted {len(df)} valid NO2 observations")
-            print(f"NO2 range: {df['no2_column'].min():.2e} to {df['no2_column'].max():.2e} molecules/cm²")
-            print(f"Geographic coverage: Lat {df['latitude'].min():.2f}-{df['latitude'].max():.2f}, Lon {df['longitude'].min():.2f}-{df['longitude'].max():.2f}")
-            
-            self.processed_data = df
-            return df
+            self.observations = observations
+            self.swath = (lat_flat, lon_flat, *bounds_flat)
+            self.extraction_filters = self._filters(lat_range, lon_range, qa_mask)
+            return observations
             
         except Exception as e:
-            print(f"Error extracting NO2 data: {e}")
+            logger.error("Error extracting NO2 data: %s", e)
             raise
     
-    def _no2_to_aqi(self, no2_column: np.ndarray) -> np.ndarray:
+    def _locate_variables(self) -> Tuple[Any, Any, Any, Any, List[Any]]:
         """
-        Convert NO2 column density to estimated AQI
-        Note: This is a simplified conversion for demonstration
+        The NO2, latitude, longitude and QA flag variables of the loaded file
+        and its pixel corner bounds (None where absent), grouped or not
         """
-        # TEMPO NO2 is typically in molecules/cm²
-        # Convert to AQI using rough approximation
-        
-        # Normalize NO2 values (typical range: 1e14 to 1e16 molecules/cm²)
-        no2_normalized = np.log10(no2_column + 1e14) - 14  # Log scale 0-2
-        
-        # Map to AQI scale (0-500)
-        aqi_estimated = np.clip(no2_normalized * 100, 0, 300)  # Scale to 0-300 AQI
-        
-        return aqi_estimated
+        # Handle grouped vs single dataset
+        if isinstance(self.data, dict):
+            # TEMPO L2 grouped structure
+            product_data = self.data.get('product')
+            geolocation_data = self.data.get('geolocation')
+            
+            if not product_data or not geolocation_data:
+                raise ValueError("Required TEMPO groups 'product' and 'geolocation' not found")
+            
+            # Get NO2 column data from product group
+            no2_var_names = ['vertical_column_troposphere', 'no2_column', 'column_amount']
+            no2_var = None
+            
+            for var_name in no2_var_names:
+                if var_name in product_data.variables:
+                    no2_var = var_name
+                    break
+            
+            if not no2_var:
+                logger.error("Available product variables: %s", list(product_data.variables.keys()))
+                raise ValueError("No NO2 data variable found in TEMPO product group")
+            
+            logger.debug("Using NO2 variable: %s", no2_var)
+            
+            # Get coordinates from geolocation group
+            if 'latitude' not in geolocation_data.variables or 'longitude' not in geolocation_data.variables:
+                logger.error("Available geolocation variables: %s", list(geolocation_data.variables.keys()))
+                raise ValueError("Latitude/Longitude coordinates not found in geolocation group")
+            
+            # Variables (read lazily)
+            no2_data = product_data[no2_var]
+            lat_data = geolocation_data['latitude']
+            lon_data = geolocation_data['longitude']
+            qa_data = product_data.get(QA_FLAG_VARIABLE, None)
+            bounds_data = [geolocation_data.get(name, None) for name in BOUNDS_VARIABLES]
+            
+        else:
+            # Single dataset structure
+            no2_var_names = [var for var in self.data.variables if 'no2' in var.lower() or 'nitrogen' in var.lower()]
+            
+            if not no2_var_names:
+                possible_vars = ['vertical_column_troposphere', 'column_amount', 'no2_column', 'no2_vertical_column']
+                no2_var_names = [var for var in possible_vars if var in self.data.variables]
+            
+            if not no2_var_names:
+                logger.error("Available variables: %s", list(self.data.variables.keys()))
+                raise ValueError("No NO2 data variable found in TEMPO file")
+            
+            no2_var = no2_var_names[0]
+            logger.debug("Using NO2 variable: %s", no2_var)
+            
+            # Get coordinates
+            lat_var = 'latitude' if 'latitude' in self.data.variables else 'lat'
+            lon_var = 'longitude' if 'longitude' in self.data.variables else 'lon'
+            
+            if lat_var not in self.data.variables or lon_var not in self.data.variables:
+                logger.error("Available coordinate variables: %s", [v for v in self.data.variables if any(coord in v.lower() for coord in ['lat', 'lon'])])
+                raise ValueError("Latitude/Longitude coordinates not found")
+            
+            # Variables (read lazily)
+            no2_data = self.data[no2_var]
+            lat_data = self.data[lat_var]
+            lon_data = self.data[lon_var]
+            qa_data = self.data.get(QA_FLAG_VARIABLE, None)
+            bounds_data = [self.data.get(name, None) for name in BOUNDS_VARIABLES]
+        return no2_data, lat_data, lon_data, qa_data, bounds_data
+    
+    def _read_swath(self, size: int) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """Flattened full-swath coordinates and corners, as _extract_observations() keeps them"""
+        _, lat_data, lon_data, _, bounds_data = self._locate_variables()
+        bounds_flat = [None, None]
+        if all(b is not None and b.size == 4 * lat_data.size for b in bounds_data):
+            bounds_flat = [b.values.reshape(-1, 4)[:size] for b in bounds_data]
+        return (lat_data.values.ravel()[:size], lon_data.values.ravel()[:size], *bounds_flat)
+    
+    def _no2_to_aqi(self, no2_column: np.ndarray) -> np.ndarray:
+        return no2_to_aqi(no2_column)
     
     def aggregate_to_grid(self, grid_size: float = 0.1) -> pd.DataFrame:
         """
         Aggregate data to regular grid for ML processing
         """
-        if self.processed_data is None:
+        if self.observations is None:
             raise ValueError("No processed data available. Call extract_no2_data() first.")
         
-        df = self.processed_data.copy()
-        
-        # Create grid coordinates
-        df['lat_grid'] = np.round(df['latitude'] / grid_size) * grid_size
-        df['lon_grid'] = np.round(df['longitude'] / grid_size) * grid_size
+        obs = self.observations
+        with tempo_duration.time('aggregate'):
+            cells = self._regrid(obs, grid_size)
+            if cells is None:
+                cells = self._bin(obs, grid_size)
         
-        # Aggregate by grid cell
-        aggregated = df.groupby(['lat_grid', 'lon_grid']).agg({
-            'no2_column': ['mean', 'std', 'count'],
-            'estimated_aqi': ['mean', 'std'],
-            'hour': 'first',
-            'day_of_week': 'first'
-        }).reset_index()
-        
-        # Flatten column names
-        aggregated.columns = ['latitude', 'longitude', 'no2_mean', 'no2_std', 'no2_count', 
-                             'aqi_mean', 'aqi_std', 'hour', 'day_of_week']
+        aggregated = pd.DataFrame({
+            'latitude': cells['latitude'],
+            'longitude': cells['longitude'],
+            'no2_mean': cells['no2_mean'],
+            'no2_std': cells['no2_std'],
+            'no2_count': cells['count'],
+            'aqi_mean': cells['aqi_mean'],
+            'aqi_std': cells['aqi_std'],
+            'hour': obs.hour,
+            'day_of_week': obs.day_of_week,
+        })
         
         # Add metadata
-        aggregated['observation_time'] = self.metadata.get('observation_time', datetime.now())
+        aggregated['observation_time'] = obs.observation_time
         aggregated['data_source'] = 'TEMPO'
         
         return aggregated
     
+    def _regrid(self, obs: TempoObservations, grid_size: float) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Grid cells through the sparse pixel -> cell weights of the swath
+        geometry (app.services.regrid), built once per scan position and
+        reused by its later granules. None when the observations did not
+        come from this processor's swath, or for ``centre`` the first time a
+        scan is seen, where binning is as fast as building the weights.
+        """
+        if obs.pixel_mask is None:
+            return None
+        if self.swath is None and self.data is not None:
+            self.swath = self._read_swath(obs.swath_size)  # observations restored from the extraction cache
+        if self.swath is None or len(self.swath[0]) != obs.swath_size:
+            return None
+        from app.config import Config
+        from app.services.regrid import RegridWeights, weights_key
+        
+        lat, lon, lat_bounds, lon_bounds = self.swath
+        method = Config.REGRID_METHOD
+        if method == 'area' and lat_bounds is None:
+            method = 'centre'  # no pixel corners in this file
+        scan = self.metadata.get('spatial_id') or self._content_hash()
+        if scan is None:
+            return None
+        weights = get_regridder().weights(
+            weights_key(scan, len(lat), grid_size, method),
+            lambda: RegridWeights.build(lat, lon, grid_size, method, lat_bounds, lon_bounds),
+            lambda w: w.matches(lat, lon), lazy=(method == 'centre'))
+        if weights is None:
+            return None
+        
+        return weights.apply(obs.valid_pixels(), {'no2': obs.no2_column, 'aqi': obs.estimated_aqi})
+    
+    def _bin(self, obs: TempoObservations, grid_size: float) -> Dict[str, np.ndarray]:
+        """Grid cells by binning each pixel centre into its cell"""
+        # Integer grid cell of every pixel, as one int64 key ordered by latitude then longitude
+        lat_cell = np.rint(np.divide(obs.latitude, grid_size, dtype=np.float64)).astype(np.int64)
+        lon_cell = np.rint(np.divide(obs.longitude, grid_size, dtype=np.float64)).astype(np.int64)
+        lon_min = lon_cell.min()
+        span = int(lon_cell.max() - lon_min) + 1
+        keys, cell = np.unique(lat_cell * span + (lon_cell - lon_min), return_inverse=True)
+        
+        # Aggregate by grid cell
+        count = np.bincount(cell)
+        no2_mean, no2_std = _grouped_mean_std(cell, obs.no2_column, count)
+        aqi_mean, aqi_std = _grouped_mean_std(cell, obs.estimated_aqi, count)
+        return {
+            'latitude': (keys // span) * grid_size,
+            'longitude': (keys % span + lon_min) * grid_size,
+            'count': count,
+            'no2_mean': no2_mean,
+            'no2_std': no2_std,
+            'aqi_mean': aqi_mean,
+            'aqi_std': aqi_std,
+        }
+    
     def create_ml_features(self, target_location: Tuple[float, float] = None) -> Dict[str, Any]:
         """
         Create features for ML prediction from TEMPO data
         """
-        if self.processed_data is None:
+        if self.observations is None:
             raise ValueError("No processed data available. Call extract_no2_data() first.")
         
+        obs = self.observations
+        no2 = obs.no2_column
         features = {}
         
         # Overall statistics
-        features['no2_mean'] = float(self.processed_data['no2_column'].mean())
-        features['no2_median'] = float(self.processed_data['no2_column'].median())
-        features['no2_std'] = float(self.processed_data['no2_column'].std())
-        features['no2_max'] = float(self.processed_data['no2_column'].max())
-        features['no2_min'] = float(self.processed_data['no2_column'].min())
+        features['no2_mean'] = float(np.mean(no2, dtype=np.float64))
+        features['no2_median'] = float(np.median(no2))
+        features['no2_std'] = _sample_std(no2)
+        features['no2_max'] = float(no2.max())
+        features['no2_min'] = float(no2.min())
         
         # Time features
-        obs_time = self.metadata.get('observation_time', datetime.now())
+        obs_time = obs.observation_time
         features['observation_time'] = obs_time.isoformat() if hasattr(obs_time, 'isoformat') else str(obs_time)
-        features['hour'] = obs_time.hour
-        features['day_of_week'] = obs_time.weekday()
+        features['hour'] = obs.hour
+        features['day_of_week'] = obs.day_of_week
         features['month'] = obs_time.month
         features['season'] = (obs_time.month % 12) // 3  # 0=Winter, 1=Spring, 2=Summer, 3=Fall
         
         # Spatial features
-        features['lat_center'] = float(self.processed_data['latitude'].mean())
-        features['lon_center'] = float(self.processed_data['longitude'].mean())
-        features['spatial_coverage'] = len(self.processed_data)
+        features['lat_center'] = float(np.mean(obs.latitude, dtype=np.float64))
+        features['lon_center'] = float(np.mean(obs.longitude, dtype=np.float64))
+        features['spatial_coverage'] = len(obs)
         
         # Target location specific (if provided)
         if target_location is not None:
             target_lat, target_lon = target_location
             
             # Find nearest observations
-            distances = np.sqrt((self.processed_data['latitude'] - target_lat)**2 + 
-                              (self.processed_data['longitude'] - target_lon)**2)
-            
-            nearest_idx = distances.idxmin()
-            nearest_data = self.processed_data.iloc[nearest_idx]
+            distances = np.sqrt((obs.latitude - target_lat)**2 + (obs.longitude - target_lon)**2)
+            nearest_idx = int(np.argmin(distances))
             
-            features['target_no2'] = float(nearest_data['no2_column'])
-            features['target_aqi_estimate'] = float(nearest_data['estimated_aqi'])
-            features['distance_to_nearest'] = float(distances.min())
+            features['target_no2'] = float(no2[nearest_idx])
+            features['target_aqi_estimate'] = float(obs.estimated_aqi[nearest_idx])
+            features['distance_to_nearest'] = float(distances[nearest_idx])
             
             # Local statistics (within 0.5 degrees)
-            local_mask = distances <= 0.5
-            if local_mask.sum() > 0:
-                local_data = self.processed_data[local_mask]
-                features['local_no2_mean'] = float(local_data['no2_column'].mean())
-                features['local_no2_std'] = float(local_data['no2_column'].std())
-                features['local_observations'] = len(local_data)
+            local_no2 = no2[distances <= 0.5]
+            if len(local_no2) > 0:
+                features['local_no2_mean'] = float(np.mean(local_no2, dtype=np.float64))
+                features['local_no2_std'] = _sample_std(local_no2)
+                features['local_observations'] = len(local_no2)
             else:
                 features['local_no2_mean'] = features['no2_mean']
                 features['local_no2_std'] = features['no2_std']
                 features['local_observations'] = 1
         
         # Data quality indicators
-        features['data_completeness'] = float(len(self.processed_data) / max(1, len(self.processed_data)))
+        features['data_completeness'] = float(len(obs) / max(1, len(obs)))
         features['no2_variability'] = float(features['no2_std'] / (features['no2_mean'] + 1e-6))
         
         return features
     
-    def get_file_summary(self) -> Dict[str, Any]:
+    def data_version(self, processed: bool = False) -> Optional[str]:
+        """
+        Version of the loaded data for HTTP validators and tile keys: the
+        file's content hash, plus with ``processed`` the filters of the
+        current extraction and the regrid method. Derived from content
+        only, so it agrees across workers and restarts
+        """
+        version = self._content_hash()
+        if version is None:
+            return None
+        if not processed:
+            return version
+        from app.config import Config
+        
+        # Nothing extracted yet: the view about to run extracts without filters
+        filters = json.dumps(self.extraction_filters or self._filters(None, None, None)).encode('utf-8')
+        return f"{version}:{hashlib.sha1(filters).hexdigest()[:16]}:{Config.REGRID_METHOD}"
+    
+    def _content_hash(self) -> Optional[str]:
         """
-        Get summary information about the loaded TEMPO file
+        Content hash of the loaded file, kept once known: the upload store
+        may evict the file while it is still open here
+        """
+        if self._source_hash is None and self.source_path is not None:
+            try:
+                self._source_hash = get_summary_cache().digest(self.source_path)
+            except OSError:
+                return None
+        return self._source_hash
+    
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held: the decoded size of every variable of the
+        loaded file (an upper bound, as xarray reads variables lazily) plus
+        the extracted observations
+        """
+        total = 0
+        if self.data is not None:
+            datasets = self.data.values() if isinstance(self.data, dict) else [self.data]
+            total += sum(ds.nbytes for ds in datasets)
+        if self.observations is not None:
+            total += self.observations.nbytes
+        return total
+    
+    def unload(self) -> None:
+        """Close the loaded file and drop everything derived from it"""
+        datasets = self.data.values() if isinstance(self.data, dict) else [self.data] if self.data is not None else []
+        for ds in datasets:
+            ds.close()
+        self.data = None
+        self.main_data = None
+        self.observations = None
+        self.metadata = {}
+        self.source_path = None
+        self._source_hash = None
+        self.swath = None
+        self.extraction_filters = None
+    
+    def get_file_summary(self, mode: str = 'full', cached: bool = True) -> Dict[str, Any]:
+        """
+        Get summary information about the loaded TEMPO file. ``full`` adds
+        single-pass statistics of every numeric variable (valid count, min,
+        max, mean, std, approximate quantiles); ``metadata`` reads only the
+        file header. Summaries are cached by the file's content hash.
         """
         if self.data is None:
             return {"error": "No TEMPO data loaded"}
+        from app.services.tempo_stats import MODES
+        
+        if mode not in MODES:
+            raise ValueError(f"Unknown summary mode {mode!r}; choose from {', '.join(MODES)}")
+        
+        cache = get_summary_cache()
+        file_hash = None
+        if cached and self.source_path is not None:
+            try:
+                file_hash = cache.digest(self.source_path)
+            except OSError as e:  # e.g. an upload's temp file already removed
+                logger.debug("Not caching summary of %s: %s", self.source_path, e)
+        key = f"{file_hash}-{mode}" if file_hash else None
+        body = cache.get(key) if key else None
+        summary_requests.inc(mode, 'hit' if body is not None else 'miss')
+        if body is None:
+            with tempo_duration.time('summary'), profiler.trace_memory('summary'):
+                body = self._summarize(mode == 'full')
+            body['file_hash'] = file_hash
+            if key:
+                cache.put(key, body)
+        return {"metadata": self.metadata, **body}
+    
+    def _summarize(self, with_stats: bool) -> Dict[str, Any]:
+        from app.services.tempo_stats import is_numeric, variable_metadata, variable_stats
         
+        grouped = isinstance(self.data, dict)
         summary = {
-            "metadata": self.metadata,
             "coordinate_ranges": {},
             "data_summary": {}
         }
-        
-        if isinstance(self.data, dict):
-            # Grouped structure
+        if grouped:
             summary["groups"] = list(self.data.keys())
             summary["variables"] = {}
             summary["dimensions"] = {}
-            
-            for group_name, group_data in self.data.items():
-                summary["variables"][group_name] = list(group_data.variables.keys())
-                summary["dimensions"][group_name] = dict(group_data.dims)
-                
-                # Get coordinate ranges for this group
-                for coord in ['latitude', 'longitude', 'lat', 'lon']:
-                    if coord in group_data.variables:
-                        values = group_data[coord].values
-                        summary["coordinate_ranges"][f"{group_name}/{coord}"] = {
-                            "min": float(np.nanmin(values)),
-                            "max": float(np.nanmax(values)),
-                            "shape": list(values.shape)
-                        }
-                
-                # Get data variable summary for this group
-                for var in group_data.variables:
-                    if var not in ['latitude', 'longitude', 'lat', 'lon', 'time']:
-                        try:
-                            values = group_data[var].values
-                            summary["data_summary"][f"{group_name}/{var}"] = {
-                                "shape": list(values.shape),
-                                "min": float(np.nanmin(values)),
-                                "max": float(np.nanmax(values)),
-                                "mean": float(np.nanmean(values)),
-                                "valid_points": int(np.sum(~np.isnan(values)))
-                            }
-                        except:
-                            summary["data_summary"][f"{group_name}/{var}"] = {"error": "Could not process variable"}
         else:
-            # Single dataset structure
             summary["variables"] = list(self.data.variables.keys())
-            summary["dimensions"] = dict(self.data.dims)
-            
-            # Get coordinate ranges
-            for coord in ['latitude', 'longitude', 'lat', 'lon']:
-                if coord in self.data.variables:
-                    values = self.data[coord].values
-                    summary["coordinate_ranges"][coord] = {
-                        "min": float(np.nanmin(values)),
-                        "max": float(np.nanmax(values)),
-                        "shape": list(values.shape)
-                    }
-            
-            # Get data variable summary
-            for var in self.data.variables:
-                if var not in ['latitude', 'longitude', 'lat', 'lon']:
+            summary["dimensions"] = dict(self.data.sizes)
+        
+        for group_name, group_data in (self.data.items() if grouped else [(None, self.data)]):
+            prefix = f"{group_name}/" if grouped else ""
+            if grouped:
+                summary["variables"][group_name] = list(group_data.variables.keys())
+                summary["dimensions"][group_name] = dict(group_data.sizes)
+            
+            for var, variable in group_data.variables.items():
+                coordinate = var in COORDINATE_NAMES
+                if not coordinate and grouped and var == 'time':
+                    continue
+                entry = variable_metadata(variable)
+                if with_stats and is_numeric(variable):
                     try:
-                        values = self.data[var].values
-                        summary["data_summary"][var] = {
-                            "shape": list(values.shape),
-                            "min": float(np.nanmin(values)),
-                            "max": float(np.nanmax(values)),
-                            "mean": float(np.nanmean(values)),
-                            "valid_points": int(np.sum(~np.isnan(values)))
-                        }
-                    except:
-                        summary["data_summary"][var] = {"error": "Could not process variable"}
+                        entry.update(variable_stats(variable))
+                    except Exception as e:
+                        logger.warning("Could not summarise %s%s: %s", prefix, var, e)
+                        entry["error"] = "Could not process variable"
+                if coordinate:
+                    summary["coordinate_ranges"][prefix + var] = {
+                        k: entry[k] for k in ("min", "max", "shape") if k in entry}
+                else:
+                    summary["data_summary"][prefix + var] = entry
         
         return summary
 
@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# ASGI entry point: uvicorn asgi:app (see requirements-async.txt)
+app = create_asgi_app()
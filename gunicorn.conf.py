@@ -0,0 +1,28 @@
+"""
+Gunicorn settings (``gunicorn -c gunicorn.conf.py main:app``).
+
+PRELOAD_APP=1 (default) imports the app in the master, warms the model and
+optional TEMPO data (TEMPO_PRELOAD_FILE), freezes the heap and then forks,
+so workers share those pages copy-on-write. Set PRELOAD_APP=0 to have each
+worker import the app itself (e.g. for code reload during development).
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Threads per worker (gthread); each open /api/live stream holds one, so the app
+# caps streams at GUNICORN_THREADS - LIVE_RESERVED_THREADS per worker
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("PRELOAD_APP", "1") not in ("0", "false", "False")
+
+
+def when_ready(server):
+	if not preload_app:
+		return
+	from app.preload import freeze_heap, warm_up
+
+	report = warm_up()
+	freeze_heap()
+	server.log.info(f"Preloaded in master: {report}")
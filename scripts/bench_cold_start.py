@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark.
+
+Each run spawns a fresh interpreter that imports the app, creates a test
+client and serves one lightweight request, timing everything from process
+start (the serverless cold path). With OPENWEATHER_KEY unset, /api/weather
+returns immediately without network access, so the number measures import
+and app setup only.
+
+Usage:
+    python scripts/bench_cold_start.py [--runs 10] [--path /api/weather?city=London]
+                                       [--target-ms 300] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time, json, sys
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+client = main.app.test_client()
+resp = client.get(sys.argv[1])
+t2 = time.perf_counter()
+heavy = [m for m in ("numpy", "pandas", "sklearn", "xarray", "netCDF4") if m in sys.modules]
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "total_ms": (t2 - t0) * 1000,
+                  "status": resp.status_code, "heavy_modules": heavy}))
+"""
+
+
+def run_once(path):
+    env = dict(os.environ)
+    env.pop("OPENWEATHER_KEY", None)
+    env.setdefault("BACKGROUND_REFRESH", "0")
+    proc = subprocess.run([sys.executable, "-c", CHILD, path], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit("cold start run failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/api/weather?city=London")
+    parser.add_argument("--target-ms", type=float, default=300.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    runs = [run_once(args.path) for _ in range(args.runs)]
+    totals = [r["total_ms"] for r in runs]
+    imports = [r["import_ms"] for r in runs]
+    report = {
+        "path": args.path,
+        "runs": args.runs,
+        "import_median_ms": round(statistics.median(imports), 1),
+        "total_median_ms": round(statistics.median(totals), 1),
+        "total_p90_ms": round(percentile(totals, 90), 1),
+        "target_ms": args.target_ms,
+        "heavy_modules": sorted({m for r in runs for m in r["heavy_modules"]}),
+    }
+    report["within_target"] = report["total_p90_ms"] <= args.target_ms
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.runs} cold starts of GET {args.path}")
+        print(f"  import main   median {report['import_median_ms']:.1f} ms")
+        print(f"  first request median {report['total_median_ms']:.1f} ms, p90 {report['total_p90_ms']:.1f} ms")
+        print(f"  heavy modules loaded: {', '.join(report['heavy_modules']) or 'none'}")
+        print(f"  target {args.target_ms:.0f} ms: {'OK' if report['within_target'] else 'MISSED'}")
+    sys.exit(0 if report["within_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Micro-benchmarks for the TEMPO and ML hot paths.
+
+Times the TempoDataProcessor steps (read_tempo_file, extract_no2_data,
+extract_observations, aggregate_to_grid, create_ml_features, get_file_summary
+without its cache, and the cold build of the regridding weights
+aggregate_to_grid reuses) on synthetic granules of each
+--sizes (scripts/synth_tempo.py, cached under --data), and the model's
+train_models, predict and predict_future on its synthetic training data.
+
+Each case runs --repeat times after one warm-up call and reports
+min/median/mean seconds. Then it runs once more under tracemalloc for the
+peak Python/NumPy allocation; memory NetCDF's C library allocates is not
+seen. The results are written as JSON and compared against the baseline
+(default .benchmarks/baseline.json; --update-baseline writes it). A case
+regresses when its median is more than --tolerance slower (and at least
+--min-delta-ms), or its peak memory more than --mem-tolerance larger.
+Exit status 1 when anything regressed.
+
+Usage:
+    python scripts/bench_hot_paths.py [--sizes small,medium] [--only tempo.extract]
+                                      [--repeat 5] [--train-samples 1000]
+                                      [--out results.json] [--baseline PATH]
+                                      [--update-baseline] [--tolerance 0.15] [--json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth_tempo  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, ".benchmarks", "baseline.json")
+TARGET = (34.05, -118.24)
+
+
+def measure(fn, repeat, setup=None):
+    """Timing and tracemalloc peak of ``fn()``; ``setup()`` runs untimed before each call."""
+    if setup:
+        setup()
+    fn()  # warm-up: imports, caches, first-touch page faults
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+        "peak_bytes": peak,
+    }
+
+
+def tempo_cases(sizes, data_dir):
+    for size in sizes:
+        yield from granule_cases(size, synth_tempo.ensure_granule(data_dir, size))
+
+
+def granule_cases(size, path):
+    from app.services.regrid import RegridWeights
+    from app.tempo_processor import TempoDataProcessor
+
+    proc = TempoDataProcessor()
+
+    def loaded():
+        if proc.data is None:
+            proc.read_tempo_file(path)
+
+    def extracted():
+        loaded()
+        if proc.observations is None:
+            proc.extract_observations()
+
+    summary_proc = None
+
+    def fresh():
+        nonlocal summary_proc
+        summary_proc = fresh_processor(path)
+
+    yield f"tempo.read[{size}]", lambda: proc.read_tempo_file(path), None
+    yield f"tempo.extract[{size}]", proc.extract_no2_data, loaded
+    yield f"tempo.extract_observations[{size}]", proc.extract_observations, loaded
+    yield f"tempo.extract_bbox[{size}]", lambda: proc.extract_no2_data((30.0, 45.0), (-100.0, -70.0)), loaded
+    yield f"tempo.aggregate_to_grid[{size}]", proc.aggregate_to_grid, extracted
+    yield f"tempo.regrid_weights[{size}]", lambda: RegridWeights.build(*proc.swath[:2], 0.1), extracted
+    yield f"tempo.create_ml_features[{size}]", lambda: proc.create_ml_features(TARGET), extracted
+    yield f"tempo.file_summary[{size}]", lambda: summary_proc.get_file_summary(cached=False), fresh
+
+
+def fresh_processor(path):
+    """A processor with the file open but nothing read, so reads start cold."""
+    from app.tempo_processor import TempoDataProcessor
+
+    proc = TempoDataProcessor()
+    proc.read_tempo_file(path)
+    return proc
+
+
+def ml_cases(train_samples):
+    from app.ml_model import WeatherAQIPredictionModel
+
+    model = WeatherAQIPredictionModel()
+    data = model.generate_synthetic_data(train_samples)
+    sample = dict(data[-1])
+    sample.pop("aqi")
+
+    def trained():
+        if not model.trained_models:
+            model.train_models(data)
+
+    yield f"ml.train_models[{train_samples}]", lambda: model.train_models(data), None
+    yield "ml.predict[random_forest]", lambda: model.predict(sample), trained
+    yield "ml.predict_future[24h]", lambda: model.predict_future(24), trained
+
+
+def environment():
+    import numpy
+    import pandas
+
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+    }
+    for name in ("xarray", "netCDF4", "sklearn"):
+        try:
+            meta[name] = __import__(name).__version__
+        except ImportError:
+            meta[name] = None
+    try:
+        meta["git"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                     capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        meta["git"] = None
+    return meta
+
+
+def compare(results, baseline, tolerance, mem_tolerance, min_delta):
+    """Per-case verdicts against the baseline's results."""
+    verdicts = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            verdicts[name] = {"status": "new"}
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        mem_ratio = result["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] else 1.0
+        slower = ratio > 1 + tolerance and result["median_s"] - base["median_s"] > min_delta
+        faster = ratio < 1 - tolerance and base["median_s"] - result["median_s"] > min_delta
+        bigger = mem_ratio > 1 + mem_tolerance
+        status = "regressed" if slower or bigger else ("improved" if faster else "ok")
+        verdicts[name] = {"status": status, "time_ratio": round(ratio, 3), "mem_ratio": round(mem_ratio, 3)}
+    return verdicts
+
+
+def print_report(results, verdicts):
+    print(f"{'case':<38}{'median ms':>11}{'min ms':>10}{'peak MB':>10}{'vs base':>9}  status")
+    for name, r in results.items():
+        v = verdicts.get(name, {})
+        ratio = f"{v['time_ratio']:.2f}x" if "time_ratio" in v else "-"
+        print(f"{name:<38}{r['median_s'] * 1000:>11.2f}{r['min_s'] * 1000:>10.2f}"
+              f"{r['peak_bytes'] / 1e6:>10.1f}{ratio:>9}  {v.get('status', '-')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="small,medium", help=f"comma list of {', '.join(synth_tempo.SIZES)}")
+    parser.add_argument("--only", default=None, help="run cases whose name contains this substring")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--train-repeat", type=int, default=1, help="repeats for ml.train_models (slow)")
+    parser.add_argument("--train-samples", type=int, default=1000)
+    parser.add_argument("--data", default=os.path.join(tempfile.gettempdir(), "tempo-bench"))
+    parser.add_argument("--out", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--mem-tolerance", type=float, default=0.10)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    cases = list(tempo_cases(sizes, args.data)) + list(ml_cases(args.train_samples))
+    results = {}
+    for name, fn, setup in cases:
+        if args.only and args.only not in name:
+            continue
+        repeat = args.train_repeat if name.startswith("ml.train_models") else args.repeat
+        results[name] = measure(fn, repeat, setup)
+        if not args.json:
+            print(f"  {name}: {results[name]['median_s'] * 1000:.2f} ms", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh).get("results", {})
+    verdicts = compare(results, baseline, args.tolerance, args.mem_tolerance, args.min_delta_ms / 1000)
+    report = {"meta": environment(), "results": results, "comparison": verdicts}
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        merged = {**baseline, **results}  # a partial run (--only) keeps the other cases
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump({"meta": report["meta"], "results": merged}, fh, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(results, verdicts)
+        if not baseline and not args.update_baseline:
+            print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+    regressed = [name for name, v in verdicts.items() if v["status"] == "regressed"]
+    if regressed:
+        print(f"Regressed: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
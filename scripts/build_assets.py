@@ -0,0 +1,138 @@
+"""
+Static asset build.
+
+Minifies the page's JS/CSS, writes content-hashed copies to static/dist/
+together with precompressed .gz (and .br when brotli is installed) variants,
+and records the mapping in static/dist/manifest.json. The app resolves
+``asset_url('app.js')`` through the manifest and serves /assets/ with
+immutable caching; without a manifest it falls back to the plain
+/static/ files.
+
+Minification uses rjsmin/rcssmin (requirements-build.txt) when installed;
+otherwise files are only hashed and compressed.
+
+Usage:
+    python scripts/build_assets.py [--check] [--json]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC = os.path.join(ROOT, "static")
+DIST = os.path.join(STATIC, "dist")
+MANIFEST = os.path.join(DIST, "manifest.json")
+
+ASSETS = ("app.js", "layout-customizer.js", "styles.css", "layout-customizer.css")
+
+
+def minify(name, text):
+    if name.endswith(".js") and rjsmin is not None:
+        return rjsmin.jsmin(text)
+    if name.endswith(".css") and rcssmin is not None:
+        return rcssmin.cssmin(text)
+    return text
+
+
+def read_asset(name):
+    """(source text, minified bytes, hashed file name)"""
+    with open(os.path.join(STATIC, name), "r", encoding="utf-8-sig") as fh:
+        source = fh.read()
+    data = minify(name, source).encode("utf-8")
+    stem, ext = os.path.splitext(name)
+    return source, data, f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def build_asset(name):
+    source, data, hashed = read_asset(name)
+
+    outputs = {hashed: data, f"{hashed}.gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        outputs[f"{hashed}.br"] = brotli.compress(data, quality=11)
+    for filename, payload in outputs.items():
+        path = os.path.join(DIST, filename)
+        if not os.path.exists(path):
+            with open(path, "wb") as fh:
+                fh.write(payload)
+
+    return hashed, {
+        "source_bytes": len(source.encode("utf-8")),
+        "bytes": len(data),
+        "gzip_bytes": len(outputs[f"{hashed}.gz"]),
+        "brotli_bytes": len(outputs[f"{hashed}.br"]) if brotli is not None else None,
+    }
+
+
+def prune(keep):
+    """Remove outputs of earlier builds that the new manifest no longer names."""
+    for filename in os.listdir(DIST):
+        base = filename[:-3] if filename.endswith((".gz", ".br")) else filename
+        if filename != "manifest.json" and base not in keep:
+            os.remove(os.path.join(DIST, filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if the manifest is missing or out of date, without writing")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.check:
+        try:
+            with open(MANIFEST, "r", encoding="utf-8") as fh:
+                current = json.load(fh)
+        except (OSError, ValueError):
+            print("static/dist/manifest.json missing; run scripts/build_assets.py")
+            return 1
+        stale = [name for name in ASSETS if current.get(name) != read_asset(name)[2]]
+        if stale:
+            print(f"Out of date: {', '.join(stale)}; run scripts/build_assets.py")
+            return 1
+        return 0
+
+    os.makedirs(DIST, exist_ok=True)
+    manifest = {}
+    report = {}
+    for name in ASSETS:
+        manifest[name], report[name] = build_asset(name)
+    prune(set(manifest.values()))
+    tmp = f"{MANIFEST}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+    if args.json:
+        print(json.dumps({"manifest": manifest, "sizes": report}, indent=2))
+        return 0
+    print(f"minifier: js={'rjsmin' if rjsmin else 'none'} css={'rcssmin' if rcssmin else 'none'}"
+          f"  brotli={'yes' if brotli else 'no'}")
+    print(f"{'asset':<34}{'source':>10}{'min':>10}{'gzip':>10}{'br':>10}")
+    for name in ASSETS:
+        r = report[name]
+        br = r["brotli_bytes"] if r["brotli_bytes"] is not None else "-"
+        print(f"{manifest[name]:<34}{r['source_bytes']:>10}{r['bytes']:>10}{r['gzip_bytes']:>10}{br:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
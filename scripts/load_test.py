@@ -0,0 +1,296 @@
+"""
+HTTP load test for the /api endpoints.
+
+Drives a weighted mix of endpoints over a set of locations where a few are
+hot and many are cold. It reports throughput, p50/p95/p99/max latency and
+the error rate, per endpoint and in total. Pair it with
+scripts/upstream_standin.py to measure without network access or API quota.
+
+Two ways to drive load:
+
+* closed loop (default): ``--concurrency`` clients each send the next
+  request as soon as the previous one answers;
+* open loop: ``--rate`` requests/second on a fixed schedule. Latency is
+  measured from the scheduled start, so a stalled server cannot hide its
+  queueing delay by slowing the load down.
+
+Only 2xx/304 answers count as successes. Requests in the ``--warmup``
+window are sent but not recorded. With ``--standin`` the report also shows
+upstream calls per request, read from the stand-in's /__stats.
+
+Usage:
+    python scripts/load_test.py [--target http://127.0.0.1:5000] [--mix default]
+                                [--endpoint /api/aggregate=30 ...] [--duration 30]
+                                [--warmup 5] [--concurrency 16 | --rate 200]
+                                [--locations 50] [--standin http://127.0.0.1:8900]
+                                [--seed 1] [--json]
+"""
+
+import argparse
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+# A representative mix: page loads (aggregate/dashboard), the forecast views
+# and a trickle of chat and ML calls
+MIXES = {
+    "default": {
+        "/api/aggregate": 30,
+        "/api/dashboard": 15,
+        "/api/nasa/comprehensive": 10,
+        "/api/nasa/7day-forecast": 10,
+        "/api/nasa/24hour-hourly": 10,
+        "/api/weather": 10,
+        "/api/ml/model-info": 5,
+        "/api/gemini/suggest": 5,
+        "/api/gemini/chat": 5,
+    },
+    "page": {"/api/dashboard": 1},
+    "forecast": {"/api/nasa/7day-forecast": 1, "/api/nasa/24hour-hourly": 1},
+    "chat": {"/api/gemini/chat": 1},
+}
+
+CITIES = (
+    ("Delhi", 28.6139, 77.2090), ("Mumbai", 19.0760, 72.8777), ("Los Angeles", 34.0522, -118.2437),
+    ("New York", 40.7128, -74.0060), ("Mexico City", 19.4326, -99.1332), ("Houston", 29.7604, -95.3698),
+    ("Toronto", 43.6532, -79.3832), ("Chicago", 41.8781, -87.6298), ("Denver", 39.7392, -104.9903),
+    ("Phoenix", 33.4484, -112.0740),
+)
+
+CHAT_MESSAGES = ("Is it safe to run outside today?", "What's the forecast for tomorrow?",
+                 "How is the air right now?", "Should I wear a mask?")
+
+
+def make_locations(count, rnd):
+    """``count`` locations around the cities; earlier ones are picked far more often (Zipf-like)."""
+    locations = []
+    for i in range(count):
+        name, lat, lon = CITIES[i % len(CITIES)]
+        jitter = 0 if i < len(CITIES) else 0.5
+        locations.append((name, round(lat + rnd.uniform(-jitter, jitter), 4), round(lon + rnd.uniform(-jitter, jitter), 4)))
+    weights = [1 / (i + 1) for i in range(count)]
+    return locations, weights
+
+
+def build_request(path, location, rnd):
+    """(method, path, params, json body) for one call of ``path`` at ``location``."""
+    name, lat, lon = location
+    if path == "/api/weather":
+        return "GET", path, {"city": name}, None
+    if path == "/api/gemini/suggest":
+        daily = [[f"day{d}", rnd.randint(40, 180)] for d in range(7)]
+        return "POST", path, None, {"dailyAqi": daily, "realtimeAqi": {"aqi": rnd.randint(1, 5)},
+                                    "location": {"lat": lat, "lon": lon, "name": name}, "used": "openweather"}
+    if path == "/api/gemini/chat":
+        return "POST", path, None, {"message": rnd.choice(CHAT_MESSAGES), "history": [],
+                                    "context": {"realtimeAqi": {"aqi": rnd.randint(1, 5)}}}
+    if path.startswith("/api/ml/"):
+        return "GET", path, None, None
+    return "GET", path, {"lat": lat, "lon": lon}, None
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def add(self, path, seconds, status):
+        ok = status is not None and (200 <= status < 300 or status == 304)
+        with self._lock:
+            self.latencies[path].append(seconds)
+            self.statuses[path][str(status) if status is not None else "error"] += 1
+            if not ok:
+                self.errors[path] += 1
+
+    def summary(self, elapsed):
+        def stats(values, errors):
+            ordered = sorted(values)
+            ms = lambda v: round(v * 1000, 1) if v is not None else None
+            return {
+                "requests": len(ordered),
+                "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": ms(percentile(ordered, 50)),
+                "p95_ms": ms(percentile(ordered, 95)),
+                "p99_ms": ms(percentile(ordered, 99)),
+                "max_ms": ms(ordered[-1] if ordered else None),
+                "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+            }
+
+        with self._lock:
+            endpoints = {path: {**stats(values, self.errors[path]), "statuses": dict(self.statuses[path])}
+                         for path, values in sorted(self.latencies.items())}
+            everything = [v for values in self.latencies.values() for v in values]
+            total = stats(everything, sum(self.errors.values()))
+        return {"elapsed_s": round(elapsed, 2), "total": total, "endpoints": endpoints}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.target = args.target.rstrip("/")
+        self.timeout = args.timeout
+        self.rnd = random.Random(args.seed)
+        self.mix = dict(MIXES[args.mix])
+        for value in args.endpoint or ():
+            path, _, weight = value.partition("=")
+            self.mix[path] = float(weight or 1)
+        self.mix = {path: weight for path, weight in self.mix.items() if weight > 0}
+        self.paths = list(self.mix)
+        self.weights = [self.mix[p] for p in self.paths]
+        self.locations, self.location_weights = make_locations(args.locations, self.rnd)
+        self.recorder = Recorder()
+        self.sent = 0  # including warm-up
+        self._local = threading.local()
+        self._rnd_lock = threading.Lock()
+
+    def next_request(self):
+        with self._rnd_lock:
+            self.sent += 1
+            path = self.rnd.choices(self.paths, self.weights)[0]
+            location = self.rnd.choices(self.locations, self.location_weights)[0]
+            return build_request(path, location, self.rnd)
+
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, request, started, record):
+        method, path, params, body = request
+        status = None
+        try:
+            resp = self.session().request(method, self.target + path, params=params, json=body, timeout=self.timeout)
+            resp.content  # read the whole body (streamed views too)
+            status = resp.status_code
+        except requests.RequestException:
+            pass
+        if record:
+            self.recorder.add(path, time.perf_counter() - started, status)
+
+    def run_closed(self, concurrency, warmup_end, end):
+        def client():
+            while True:
+                now = time.perf_counter()
+                if now >= end:
+                    return
+                self.send(self.next_request(), now, now >= warmup_end)
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def run_open(self, rate, max_in_flight, warmup_end, end):
+        """Fixed-rate schedule; each request is timed from its scheduled start,
+        including any time it waits for a free client."""
+        pending = queue.Queue()
+
+        def client():
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                request, at = item
+                self.send(request, at, at >= warmup_end)
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(max_in_flight)]
+        for t in threads:
+            t.start()
+        interval = 1.0 / rate
+        scheduled = time.perf_counter()
+        while scheduled < end:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pending.put((self.next_request(), scheduled))
+            scheduled += interval
+        for _ in threads:
+            pending.put(None)
+        for t in threads:
+            t.join()
+
+
+def standin_stats(url):
+    try:
+        return requests.get(url.rstrip("/") + "/__stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def print_report(report):
+    cols = f"{'requests':>9}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+    print(f"{'endpoint':<28}{cols}")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for path, s in rows:
+        fmt = lambda v: "-" if v is None else v
+        print(f"{path:<28}{s['requests']:>9}{s['rps']:>8}{fmt(s['p50_ms']):>9}{fmt(s['p95_ms']):>9}"
+              f"{fmt(s['p99_ms']):>9}{fmt(s['max_ms']):>9}{s['error_rate'] * 100:>7.1f}%")
+    upstream = report.get("upstream_calls")
+    if upstream:
+        per = ", ".join(f"{name} {calls}" for name, calls in upstream.items())
+        print(f"upstream calls: {per} ({report['upstream_calls_per_request']:.3f} per request)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--endpoint", action="append", metavar="PATH=WEIGHT",
+                        help="add to (or with weight 0 remove from) the mix (repeatable)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds, after the warm-up")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=None, help="open loop: requests per second")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open loop: client threads")
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--standin", default=None, help="stand-in URL, to count upstream calls")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    test = LoadTest(args)
+    before = standin_stats(args.standin) if args.standin else None
+    start = time.perf_counter()
+    warmup_end = start + args.warmup
+    end = warmup_end + args.duration
+    if args.rate:
+        test.run_open(args.rate, args.max_in_flight, warmup_end, end)
+    else:
+        test.run_closed(args.concurrency, warmup_end, end)
+    report = test.recorder.summary(args.duration)
+    report["config"] = {"mix": test.mix, "mode": f"open {args.rate}/s" if args.rate else f"closed x{args.concurrency}",
+                        "locations": args.locations, "duration_s": args.duration, "warmup_s": args.warmup}
+
+    after = standin_stats(args.standin) if args.standin else None
+    if before and after:
+        # Includes warm-up traffic, so divide by every request sent
+        calls = {name: after[name]["requests"] - before[name]["requests"] for name in after}
+        report["upstream_calls"] = calls
+        report["upstream_calls_per_request"] = sum(calls.values()) / test.sent if test.sent else 0.0
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["total"]["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
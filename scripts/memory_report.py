@@ -0,0 +1,112 @@
+"""
+Per-process memory report for a running gunicorn server.
+
+Reads /proc/<pid>/smaps_rollup (Linux) for the master and its workers and
+prints RSS, PSS and the shared/private split. PSS divides shared pages
+between the processes using them, so the PSS total is the real host cost.
+
+Usage:
+    python scripts/memory_report.py [MASTER_PID] [--json]
+
+Without a PID the oldest process whose command line contains
+"gunicorn" and "main:app" is used.
+"""
+
+import json
+import os
+import sys
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_rollup(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1])  # kB
+    return values
+
+
+def children(pid):
+    kids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                stat = fh.read()
+        except OSError:
+            continue
+        # ppid is the 2nd field after the parenthesised command name
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        if ppid == pid:
+            kids.append(int(entry))
+    return sorted(kids)
+
+
+def find_master():
+    candidates = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as fh:
+                cmd = fh.read().replace(b"\0", b" ").decode(errors="ignore")
+        except OSError:
+            continue
+        try:
+            with open(f"/proc/{entry}/comm") as fh:
+                comm = fh.read().strip()
+        except OSError:
+            continue
+        # Skip wrappers such as `timeout gunicorn ...`; keep python/gunicorn processes
+        if "gunicorn" in cmd and "main:app" in cmd and ("python" in comm or "gunicorn" in comm):
+            candidates.append(int(entry))
+    # The master is the candidate whose parent is not itself a candidate
+    masters = [pid for pid in candidates if not any(pid in children(c) for c in candidates)]
+    return min(masters) if masters else None
+
+
+def report(master):
+    rows = [("master", master, read_rollup(master))]
+    for i, pid in enumerate(children(master)):
+        try:
+            rows.append((f"worker-{i}", pid, read_rollup(pid)))
+        except OSError:
+            continue
+    totals = {f: sum(r[2].get(f, 0) for r in rows) for f in FIELDS}
+    return rows, totals
+
+
+def main(argv):
+    as_json = "--json" in argv
+    args = [a for a in argv if not a.startswith("--")]
+    master = int(args[0]) if args else find_master()
+    if master is None:
+        print("No gunicorn master found; pass its PID.")
+        return 1
+
+    rows, totals = report(master)
+    if as_json:
+        print(json.dumps({
+            "processes": [{"role": role, "pid": pid, **{k.lower() + "_kb": v for k, v in vals.items()}}
+                          for role, pid, vals in rows],
+            "totals_kb": {k.lower(): v for k, v in totals.items()},
+        }, indent=2))
+        return 0
+
+    header = f"{'role':<10} {'pid':>7} " + " ".join(f"{f:>14}" for f in FIELDS)
+    print(header)
+    print("-" * len(header))
+    for role, pid, vals in rows:
+        print(f"{role:<10} {pid:>7} " + " ".join(f"{vals.get(f, 0) / 1024:>11.1f} MB" for f in FIELDS))
+    print("-" * len(header))
+    print(f"{'total':<10} {'':>7} " + " ".join(f"{totals[f] / 1024:>11.1f} MB" for f in FIELDS))
+    print("\nHost cost is the PSS total; RSS double-counts pages shared copy-on-write.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,88 @@
+"""
+Import-time profile of the app entry point.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter and
+sums the cumulative import time per top-level package, so regressions in
+cold-start time (a heavy library pulled back to module level) stand out.
+
+Usage:
+    python scripts/profile_imports.py [--top N] [--module main] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_importtime(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"import {module} failed")
+    return proc.stderr
+
+
+def parse(output):
+    """(module, self_us, cumulative_us, depth) per line of -X importtime output."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative), depth))
+    return rows
+
+
+def by_top_level(rows, exclude=()):
+    """Cumulative microseconds per top-level package.
+
+    A package is imported once, and its line in the output already includes
+    everything it pulled in, so the line whose name is the bare package name
+    is its total cost.
+    """
+    totals = {}
+    for name, _self_us, cumulative, _depth in rows:
+        if "." not in name and name not in exclude:
+            totals[name] = totals.get(name, 0) + cumulative
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rows = parse(run_importtime(args.module))
+    entry = next((cum for name, _s, cum, _d in rows if name == args.module), None)
+    totals = sorted(by_top_level(rows, exclude=(args.module,)).items(), key=lambda kv: kv[1], reverse=True)
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "total_ms": round(entry / 1000, 1) if entry else None,
+            "packages": {name: round(us / 1000, 1) for name, us in totals},
+        }, indent=2))
+        return
+
+    if entry:
+        print(f"import {args.module}: {entry / 1000:.1f} ms")
+    print(f"{'package':<30} {'cumulative ms':>14}")
+    for name, us in totals[:args.top]:
+        print(f"{name:<30} {us / 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Synthetic TEMPO L2 NO2 granules.
+
+Writes NetCDF files in the layout of the real product: ``mirror_step`` x
+``xtrack`` swath dimensions, a ``product`` group with
+``vertical_column_troposphere`` (molecules/cm^2, -1e30 fill for cloudy or
+bad pixels) and its quality flag, and a ``geolocation`` group with
+``latitude``/``longitude`` per pixel, their ``latitude_bounds``/
+``longitude_bounds`` pixel corners and ``time`` per mirror step. The NO2
+field is a smooth background with plumes over a few North American cities,
+so aggregation and nearest-pixel lookups do realistic work. Output is
+deterministic for a given size and seed.
+
+Usage:
+    python scripts/synth_tempo.py [--size medium | --shape 131x2048] [--seed 0] [--out DIR]
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# name -> (mirror_step, xtrack); "medium" is the size of one real granule
+SIZES = {
+    "small": (32, 512),
+    "medium": (131, 2048),
+    "large": (524, 2048),
+}
+
+FILL_VALUE = -1.0e30
+GPS_EPOCH = datetime(1980, 1, 6)
+OBSERVATION = datetime(2025, 10, 3, 22, 44, 42)
+PLUMES = ((34.05, -118.24), (40.71, -74.01), (41.88, -87.63), (29.76, -95.37), (19.43, -99.13), (43.65, -79.38))
+
+
+def granule_name(mirror_step, xtrack, seed=0):
+    stamp = (OBSERVATION + timedelta(minutes=seed)).strftime("%Y%m%dT%H%M%SZ")
+    return f"TEMPO_NO2_L2_V03_{stamp}_S{mirror_step:03d}G{xtrack // 64:02d}.nc"
+
+
+def _geolocate(step, row):
+    lon = -125.0 + 60.0 * step + 1.5 * (row - 0.5)
+    lat = 58.0 - 40.0 * row + 0.8 * np.sin(np.pi * step)
+    return lat, lon
+
+
+def swath(mirror_step, xtrack, rng):
+    """Pixel-centre latitude/longitude: E-W mirror steps, N-S detector rows, slightly skewed."""
+    step = np.linspace(0.0, 1.0, mirror_step)[:, None]
+    row = np.linspace(0.0, 1.0, xtrack)[None, :]
+    lat, lon = _geolocate(step, row)
+    lat = lat + rng.normal(0, 0.002, lat.shape)
+    return lat.astype(np.float32), lon.astype(np.float32)
+
+
+def swath_bounds(mirror_step, xtrack):
+    """Pixel corners, (mirror_step, xtrack, 4) in ring order, half a pixel either side of the centres."""
+    half_step = 0.5 / max(1, mirror_step - 1)
+    half_row = 0.5 / max(1, xtrack - 1)
+    step = np.linspace(0.0, 1.0, mirror_step)[:, None, None] + np.array([-1, 1, 1, -1]) * half_step
+    row = np.linspace(0.0, 1.0, xtrack)[None, :, None] + np.array([-1, -1, 1, 1]) * half_row
+    lat, lon = _geolocate(step, row)
+    return lat.astype(np.float32), lon.astype(np.float32)
+
+
+def no2_field(lat, lon, rng, fill_fraction):
+    background = 1.2e15 + 4e14 * np.sin(np.radians(lat) * 3) * np.cos(np.radians(lon) * 2)
+    plumes = np.zeros_like(background)
+    for plat, plon in PLUMES:
+        plumes += 9e15 * np.exp(-((lat - plat) ** 2 + (lon - plon) ** 2) / (2 * 0.6 ** 2))
+    field = (background + plumes) * rng.lognormal(0.0, 0.15, lat.shape)
+    bad = rng.random(lat.shape) < fill_fraction
+    field[bad] = FILL_VALUE
+    return field, bad
+
+
+def write_granule(path, mirror_step, xtrack, seed=0, fill_fraction=0.12):
+    import netCDF4 as nc
+
+    rng = np.random.default_rng(seed)
+    lat, lon = swath(mirror_step, xtrack, rng)
+    no2, bad = no2_field(lat.astype(np.float64), lon.astype(np.float64), rng, fill_fraction)
+    start = (OBSERVATION - GPS_EPOCH).total_seconds()
+
+    tmp = f"{path}.tmp"
+    with nc.Dataset(tmp, "w", format="NETCDF4") as ds:
+        ds.title = "TEMPO Level 2 nitrogen dioxide product (synthetic)"
+        ds.time_coverage_start = OBSERVATION.strftime("%Y-%m-%dT%H:%M:%SZ")
+        ds.createDimension("mirror_step", mirror_step)
+        ds.createDimension("xtrack", xtrack)
+        ds.createDimension("corner", 4)
+
+        product = ds.createGroup("product")
+        var = product.createVariable("vertical_column_troposphere", "f8", ("mirror_step", "xtrack"),
+                                     fill_value=FILL_VALUE, zlib=True, complevel=1)
+        var.units = "molecules/cm^2"
+        var.long_name = "troposphere nitrogen dioxide vertical column"
+        var[:] = np.ma.masked_array(no2, mask=bad)
+        flag = product.createVariable("main_data_quality_flag", "i1", ("mirror_step", "xtrack"), zlib=True, complevel=1)
+        flag[:] = bad.astype(np.int8)
+
+        geo = ds.createGroup("geolocation")
+        for name, values, units in (("latitude", lat, "degrees_north"), ("longitude", lon, "degrees_east")):
+            v = geo.createVariable(name, "f4", ("mirror_step", "xtrack"), zlib=True, complevel=1)
+            v.units = units
+            v[:] = values
+        lat_bounds, lon_bounds = swath_bounds(mirror_step, xtrack)
+        for name, values in (("latitude_bounds", lat_bounds), ("longitude_bounds", lon_bounds)):
+            v = geo.createVariable(name, "f4", ("mirror_step", "xtrack", "corner"), zlib=True, complevel=1)
+            v[:] = values
+        t = geo.createVariable("time", "f8", ("mirror_step",))
+        t.units = "seconds since 1980-01-06T00:00:00Z"
+        t[:] = start + np.arange(mirror_step) * 2.9
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_granule(directory, size=None, shape=None, seed=0):
+    """Path of the granule for ``size`` (or ``(mirror_step, xtrack)``), generated on first use."""
+    mirror_step, xtrack = shape or SIZES[size]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, granule_name(mirror_step, xtrack, seed))
+    if not os.path.exists(path):
+        write_granule(path, mirror_step, xtrack, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium")
+    parser.add_argument("--shape", help="MIRROR_STEPxXTRACK, overrides --size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=".")
+    args = parser.parse_args()
+
+    shape = tuple(int(n) for n in args.shape.lower().split("x")) if args.shape else None
+    path = ensure_granule(args.out, args.size, shape, args.seed)
+    print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
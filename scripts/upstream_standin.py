@@ -0,0 +1,285 @@
+"""
+Offline upstream stand-in.
+
+Serves recorded OpenWeather, NASA CMR and Gemini responses from
+scripts/fixtures/upstream/ on one local port, with per-upstream latency
+distributions and error rates, so the app can be benchmarked and
+load-tested without network access or API quota. Timestamps in replayed
+bodies are shifted by whole hours so forecasts always start "now".
+
+Point the app at it (``--print-env`` prints these):
+
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8900
+    NASA_CMR_URL=http://127.0.0.1:8900
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8900
+    OPENWEATHER_KEY=standin  GEMINI_API_KEY=standin
+
+Latency specs: ``fixed:MS``, ``uniform:LO:HI``, ``normal:MEAN:SD`` or
+``lognormal:MEDIAN:SIGMA`` (milliseconds). ``--record`` forwards to the
+real APIs instead and saves each response as the new fixture.
+
+``GET /__stats`` returns request and injected-error counts per upstream;
+``POST /__reset`` zeroes them.
+
+Usage:
+    python scripts/upstream_standin.py [--port 8900] [--latency cmr=lognormal:600:0.6]
+                                       [--errors openweather=0.02] [--error-status 503]
+                                       [--speed 1.0] [--seed 1] [--record] [--print-env]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "upstream")
+
+# (method, path pattern) -> (fixture name, upstream); first match wins
+ROUTES = (
+    ("GET", re.compile(r"^/data/2\.5/air_pollution/forecast$"), "ow_forecast", "openweather"),
+    ("GET", re.compile(r"^/data/2\.5/air_pollution$"), "ow_current", "openweather"),
+    ("GET", re.compile(r"^/data/2\.5/forecast$"), "ow_weather_forecast", "openweather"),
+    ("GET", re.compile(r"^/data/2\.5/weather$"), "ow_weather", "openweather"),
+    ("GET", re.compile(r"^/search/granules\.json$"), "cmr_granules", "cmr"),
+    ("POST", re.compile(r"^/v1beta/models/[^/:]+:generateContent$"), "gemini_generate", "gemini"),
+)
+
+REAL_HOSTS = {
+    "openweather": "https://api.openweathermap.org",
+    "cmr": "https://cmr.earthdata.nasa.gov",
+    "gemini": "https://generativelanguage.googleapis.com",
+}
+
+DEFAULT_LATENCY = {
+    "openweather": "lognormal:120:0.5",
+    "cmr": "lognormal:600:0.6",
+    "gemini": "lognormal:1200:0.4",
+}
+
+EPOCH_KEYS = ("dt", "sunrise", "sunset")
+ISO_KEYS = ("time_start", "time_end", "updated")
+
+
+def parse_latency(spec):
+    """Sampler returning seconds for a latency spec string."""
+    kind, *args = spec.split(":")
+    try:
+        args = [float(a) for a in args]
+        if kind == "fixed" and len(args) == 1:
+            return lambda rnd: args[0] / 1000
+        if kind == "uniform" and len(args) == 2:
+            return lambda rnd: rnd.uniform(*args) / 1000
+        if kind == "normal" and len(args) == 2:
+            return lambda rnd: max(0.0, rnd.gauss(*args)) / 1000
+        if kind == "lognormal" and len(args) == 2:
+            median, sigma = args
+            return lambda rnd: median * rnd.lognormvariate(0, sigma) / 1000
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"bad latency spec: {spec}")
+
+
+def parse_assignments(values, convert):
+    out = {}
+    for value in values or ():
+        name, sep, rest = value.partition("=")
+        if not sep or name not in REAL_HOSTS:
+            raise SystemExit(f"expected <{'|'.join(REAL_HOSTS)}>=<value>, got {value!r}")
+        out[name] = convert(rest)
+    return out
+
+
+def shift_times(obj, delta):
+    """Move epoch seconds, ``dt_txt`` and ISO timestamps forward by ``delta`` seconds."""
+    if isinstance(obj, list):
+        return [shift_times(v, delta) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    out = {}
+    for key, value in obj.items():
+        if key in EPOCH_KEYS and isinstance(value, int):
+            out[key] = value + delta
+        elif key == "dt_txt" and isinstance(value, str):
+            ts = datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+            out[key] = datetime.fromtimestamp(ts + delta, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        elif key in ISO_KEYS and isinstance(value, str) and value.endswith("Z"):
+            ts = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            out[key] = datetime.fromtimestamp(ts + delta, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        else:
+            out[key] = shift_times(value, delta)
+    return out
+
+
+class Fixtures:
+    def __init__(self, directory):
+        self.directory = directory
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, name):
+        with self._lock:
+            if name not in self._cache:
+                with open(self.path(name), "r", encoding="utf-8") as fh:
+                    self._cache[name] = json.load(fh)
+            return self._cache[name]
+
+    def replay(self, name):
+        """(status, body bytes) with timestamps moved to the current hour."""
+        fixture = self.load(name)
+        delta = (int(time.time()) - fixture["recorded_at"]) // 3600 * 3600
+        body = shift_times(fixture["body"], delta)
+        return fixture["status"], json.dumps(body).encode("utf-8")
+
+    def save(self, name, status, body):
+        with self._lock:
+            fixture = {"recorded_at": int(time.time()) // 3600 * 3600, "status": status, "body": body}
+            tmp = f"{self.path(name)}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(fixture, fh, indent=1, ensure_ascii=False)
+                fh.write("\n")
+            os.replace(tmp, self.path(name))
+            self._cache[name] = fixture
+
+
+class Standin:
+    def __init__(self, fixtures, latency, errors, error_status=503, speed=1.0, seed=None, record=False):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.errors = errors
+        self.error_status = error_status
+        self.speed = speed
+        self.record = record
+        self.rnd = random.Random(seed)
+        self.stats = {name: {"requests": 0, "errors": 0} for name in REAL_HOSTS}
+        self._lock = threading.Lock()
+
+    def route(self, method, path):
+        for route_method, pattern, fixture, upstream in ROUTES:
+            if route_method == method and pattern.match(path):
+                return fixture, upstream
+        return None, None
+
+    def plan(self, upstream):
+        """(delay seconds, fail?) for one request; drawn under the lock for a reproducible sequence."""
+        with self._lock:
+            self.stats[upstream]["requests"] += 1
+            delay = self.latency[upstream](self.rnd) * self.speed
+            fail = self.rnd.random() < self.errors.get(upstream, 0.0)
+            if fail:
+                self.stats[upstream]["errors"] += 1
+        return delay, fail
+
+    def forward(self, upstream, fixture, method, path_qs, headers, body):
+        """Record mode: call the real API and keep its JSON response as the fixture."""
+        req = urllib.request.Request(REAL_HOSTS[upstream] + path_qs, data=body if method == "POST" else None,
+                                     method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                status, data = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, data = e.code, e.read()
+        if status == 200:
+            self.fixtures.save(fixture, status, json.loads(data))
+        return status, data
+
+
+def make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, method):
+            url = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if url.path == "/__stats":
+                return self._send(200, json.dumps(standin.stats).encode("utf-8"))
+            if url.path == "/__reset" and method == "POST":
+                for counts in standin.stats.values():
+                    counts.update(requests=0, errors=0)
+                return self._send(200, b'{"status": "reset"}')
+
+            fixture, upstream = standin.route(method, url.path)
+            if fixture is None:
+                return self._send(404, json.dumps({"error": f"no stand-in for {method} {url.path}"}).encode("utf-8"))
+            if standin.record:
+                headers = {k: v for k, v in self.headers.items() if k.lower() not in ("host", "content-length", "accept-encoding")}
+                return self._send(*standin.forward(upstream, fixture, method, self.path, headers, body))
+
+            delay, fail = standin.plan(upstream)
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                return self._send(standin.error_status, b'{"error": "injected failure"}')
+            self._send(*standin.fixtures.replay(fixture))
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=SPEC",
+                        help="override a latency distribution (repeatable)")
+    parser.add_argument("--errors", action="append", metavar="UPSTREAM=RATE",
+                        help="fraction of requests answered with --error-status (repeatable)")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--speed", type=float, default=1.0, help="latency multiplier; 0 disables delays")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--record", action="store_true", help="proxy to the real APIs and save responses")
+    parser.add_argument("--print-env", action="store_true")
+    args = parser.parse_args()
+
+    base = f"http://{args.host}:{args.port}"
+    if args.print_env:
+        print(f"OPENWEATHER_BASE_URL={base}\nNASA_CMR_URL={base}\nGEMINI_API_ENDPOINT={base}\n"
+              "OPENWEATHER_KEY=standin\nGEMINI_API_KEY=standin")
+        return 0
+
+    latency = {name: parse_latency(spec) for name, spec in DEFAULT_LATENCY.items()}
+    latency.update(parse_assignments(args.latency, parse_latency))
+    errors = parse_assignments(args.errors, float)
+    standin = Standin(Fixtures(args.fixtures), latency, errors, args.error_status, args.speed, args.seed, args.record)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(standin))
+    server.daemon_threads = True
+    mode = "recording" if args.record else "replaying"
+    print(f"Upstream stand-in {mode} on {base} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -255,28 +255,98 @@ function updateWeatherDisplay(weatherCondition) {
 	}
 }
 
+// ----- Live updates -----
+// The server refreshes each watched location once per interval and pushes
+// only changed fields (JSON merge patch) over Server-Sent Events. Without
+// EventSource, or when the server turns the stream down, fall back to polling.
+let liveSource = null;
+let liveKey = null;
+let liveVersion = 0;
+
+function applyMergePatch(target, patch){
+	if (patch === null || typeof patch !== 'object' || Array.isArray(patch)) return patch;
+	const out = (target && typeof target === 'object' && !Array.isArray(target)) ? {...target} : {};
+	for (const [key, value] of Object.entries(patch)) {
+		if (value === null) delete out[key];
+		else out[key] = applyMergePatch(out[key], value);
+	}
+	return out;
+}
+
+function stopLiveUpdates(){
+	if (liveSource) {
+		liveSource.close();
+		liveSource = null;
+	}
+	if (autoUpdateInterval) {
+		clearInterval(autoUpdateInterval);
+		autoUpdateInterval = null;
+	}
+	liveKey = null;
+}
+
+function startPollingUpdates(lat, lon){
+	stopLiveUpdates();
+	liveKey = dashboardKey(lat, lon);
+	autoUpdateInterval = setInterval(() => {
+		console.log('Auto-updating data...');
+		load();
+	}, 5 * 60 * 1000); // 5 minutes
+	setStatus('Auto-update started (polling every 5 min)');
+}
+
+function startLiveUpdates(lat, lon){
+	const key = dashboardKey(lat, lon);
+	if (liveKey === key) return;
+	if (!window.EventSource) {
+		startPollingUpdates(lat, lon);
+		return;
+	}
+	stopLiveUpdates();
+	liveKey = key;
+	liveVersion = 0;
+	const source = new EventSource(`/api/live?lat=${lat}&lon=${lon}`);
+	liveSource = source;
+	source.addEventListener('snapshot', (e) => {
+		const msg = JSON.parse(e.data);
+		liveVersion = msg.version;
+		renderAggregate(msg.data, lat, lon);
+	});
+	source.addEventListener('patch', (e) => {
+		const msg = JSON.parse(e.data);
+		if (msg.version <= liveVersion) return; // already in the snapshot
+		if (msg.version !== liveVersion + 1) {
+			// Missed an update: reconnect for a fresh snapshot
+			liveKey = null;
+			startLiveUpdates(lat, lon);
+			return;
+		}
+		liveVersion = msg.version;
+		renderAggregate(applyMergePatch(lastAggregate, msg.patch), lat, lon);
+		console.log('Live update:', Object.keys(msg.patch).join(', '));
+	});
+	source.onerror = () => {
+		// CONNECTING means the browser retries by itself; CLOSED means the server refused
+		if (source === liveSource && source.readyState === EventSource.CLOSED) {
+			startPollingUpdates(lat, lon);
+		}
+	};
+	setStatus('Auto-update started (live)');
+}
+
 function toggleAutoUpdate() {
 	const btn = document.getElementById('autoUpdateBtn');
 	if (isAutoUpdateEnabled) {
-		// Stop auto update
-		if (autoUpdateInterval) {
-			clearInterval(autoUpdateInterval);
-			autoUpdateInterval = null;
-		}
+		stopLiveUpdates();
 		isAutoUpdateEnabled = false;
 		btn.textContent = 'Start Auto-Update';
 		btn.className = 'btn btn-success';
 		setStatus('Auto-update stopped');
 	} else {
-		// Start auto update (every 5 minutes)
-		autoUpdateInterval = setInterval(() => {
-			console.log('Auto-updating data...');
-			load();
-		}, 5 * 60 * 1000); // 5 minutes
 		isAutoUpdateEnabled = true;
+		startLiveUpdates(parseFloat(document.getElementById('lat').value), parseFloat(document.getElementById('lon').value));
 		btn.textContent = 'Stop Auto-Update';
 		btn.className = 'btn btn-danger';
-		setStatus('Auto-update started (every 5 min)');
 	}
 }
 
@@ -542,10 +612,8 @@ function initMap(){
 			`;
 		}
 		
+		// Also renders the 24-hour video timeline from the dashboard response
 		load();
-		
-		// 🎬 Generate 24-hour video timeline on map click!
-		get24HourPrediction(e.latlng.lat, e.latlng.lng);
 	});
 	
 	// Add NASA Map Controls
@@ -695,29 +763,58 @@ function addPollutionZone(lat, lon, aqi, radius = 2000) {
 	marker.setIcon(aqiIcon);
 }
 
-async function fetchAggregate(lat, lon){
-	const url = `/api/aggregate?lat=${lat}&lon=${lon}`;
-	console.log('🔍 DEBUG: Fetching URL:', url);
-	try {
-		const res = await fetch(url);
-		console.log('🔍 DEBUG: Response status:', res.status);
-		console.log('🔍 DEBUG: Response headers:', [...res.headers.entries()]);
-		
-		if(!res.ok) {
-			console.error('🔍 DEBUG: API Error:', res.status, res.statusText);
-			const errorText = await res.text();
-			console.error('🔍 DEBUG: Error response body:', errorText);
-			throw new Error(`API returned ${res.status}: ${res.statusText} - ${errorText}`);
-		}
-		const data = await res.json();
-		console.log('🔍 DEBUG: Aggregate response:', data);
-		lastAggregate = data;
-		return data;
-	} catch (error) {
-		console.error('🔍 DEBUG: Fetch error details:', error);
-		console.error('🔍 DEBUG: Error stack:', error.stack);
-		throw error;
+// One request for every section of the page; the server fetches each
+// upstream source once and streams sections (NDJSON) as they are ready.
+let lastDashboard = null;
+
+function dashboardKey(lat, lon){
+	return `${lat}|${lon}`;
+}
+
+async function fetchDashboard(lat, lon, onSection){
+	const res = await fetch(`/api/dashboard?lat=${lat}&lon=${lon}&stream=1`);
+	if(!res.ok) {
+		throw new Error(`Dashboard returned ${res.status}: ${await res.text()}`);
+	}
+	const dashboard = {key: dashboardKey(lat, lon), sections: {}};
+	lastDashboard = dashboard;
+	const handle = (line) => {
+		if (!line.trim()) return;
+		const msg = JSON.parse(line);
+		if (!msg.section) return;
+		dashboard.sections[msg.section] = {status: msg.status, data: msg.data};
+		onSection(msg.section, msg.status, msg.data);
+	};
+	if (!res.body || !res.body.getReader) {
+		(await res.text()).split('\n').forEach(handle);
+		return dashboard;
+	}
+	const reader = res.body.getReader();
+	const decoder = new TextDecoder();
+	let buffered = '';
+	while (true) {
+		const {value, done} = await reader.read();
+		if (done) break;
+		buffered += decoder.decode(value, {stream: true});
+		const lines = buffered.split('\n');
+		buffered = lines.pop();
+		lines.forEach(handle);
 	}
+	handle(buffered);
+	return dashboard;
+}
+
+// Section from the last dashboard load if it was for these coordinates
+function dashboardSection(name, lat, lon){
+	if (!name || !lastDashboard || lastDashboard.key !== dashboardKey(lat, lon)) return null;
+	return lastDashboard.sections[name] || null;
+}
+
+async function dashboardOrFetch(name, lat, lon, url, options){
+	const cached = dashboardSection(name, lat, lon);
+	if (cached) return {ok: cached.status === 200, data: cached.data};
+	const response = await fetch(url, options);
+	return {ok: response.ok, data: await response.json()};
 }
 
 function buildChartData(realtime, daily){
@@ -1676,6 +1773,32 @@ function getAQILevel(aqi) {
 	}
 }
 
+// Draw the aggregate payload (initial load and live updates)
+function renderAggregate(data, lat, lon){
+	lastAggregate = data;
+	
+	// Add pollution zone visualization
+	const currentAQI = data.realtimeAqi?.aqi;
+	if (currentAQI) {
+		addPollutionZone(lat, lon, currentAQI);
+	}
+	
+	renderChartFrom(data.realtimeAqi, data.dailyAqi || []);
+	showInfo(data.sources, data.used, data.pollutants, data.dailyAqi, data.realtimeAqi);
+	updateRealtimeAndPollutants(data);
+	
+	// 🌡️ Update Weather Widget with attractive weather conditions
+	updateWeatherDisplay(data.weatherCondition);
+	
+	// Update timestamp
+	const now = new Date().toLocaleTimeString();
+	const timestampEl = document.getElementById('lastUpdate');
+	if (timestampEl) {
+		timestampEl.textContent = `Last updated: ${now}`;
+	}
+	return now;
+}
+
 async function load(){
 	try{
 		addDebugMessage('🔍 Starting load function...');
@@ -1695,29 +1818,20 @@ async function load(){
 		// Update location name in top bar
 		updateTopBarLocationName(lat, lon);
 		
-		addDebugMessage('🔍 Fetching aggregate data...');
-		const data = await fetchAggregate(lat, lon);
+		addDebugMessage('🔍 Fetching dashboard data...');
+		const data = await new Promise((resolve, reject) => {
+			fetchDashboard(lat, lon, (name, status, payload) => {
+				if (name === 'aggregate') {
+					status === 200 ? resolve(payload) : reject(new Error(payload.error || `Aggregate failed (${status})`));
+				} else if (name === 'hourly24' && payload.success) {
+					videoTimelineData = payload;
+					display24HourTimeline(payload);
+				}
+			}).then(() => reject(new Error('Dashboard response had no aggregate section')), reject);
+		});
 		addDebugMessage(`🔍 Aggregate data received: ${data ? 'SUCCESS' : 'FAILED'}`);
-		
-		// Add pollution zone visualization
-		const currentAQI = data.realtimeAqi?.aqi;
-		if (currentAQI) {
-			addPollutionZone(lat, lon, currentAQI);
-		}
-		
-		renderChartFrom(data.realtimeAqi, data.dailyAqi || []);
-		showInfo(data.sources, data.used, data.pollutants, data.dailyAqi, data.realtimeAqi);
-		updateRealtimeAndPollutants(data);
-		
-		// 🌡️ Update Weather Widget with attractive weather conditions
-		updateWeatherDisplay(data.weatherCondition);
-		
-		// Update timestamp
-		const now = new Date().toLocaleTimeString();
-		const timestampEl = document.getElementById('lastUpdate');
-		if (timestampEl) {
-			timestampEl.textContent = `Last updated: ${now}`;
-		}
+		const now = renderAggregate(data, lat, lon);
+		if (isAutoUpdateEnabled) startLiveUpdates(lat, lon);
 		
 		try{
 			const sug = await fetchSuggestion(data);
@@ -2000,10 +2114,12 @@ async function quickPredict() {
 		const lon = document.getElementById('lon').value;
 		const model = document.getElementById('modelSelect').value;
 		
-		const response = await fetch(`/api/ml/quick-predict?lat=${lat}&lon=${lon}&model=${model}`);
-		const data = await response.json();
+		const url = `/api/ml/quick-predict?lat=${lat}&lon=${lon}&model=${model}`;
+		// The dashboard already ran the default model for this location
+		const section = model === 'random_forest' ? 'prediction' : null;
+		const {ok, data} = await dashboardOrFetch(section, parseFloat(lat), parseFloat(lon), url, {method: 'POST'});
 		
-		if (response.ok) {
+		if (ok) {
 			setMLStatus('✅ Prediction completed!', false);
 			displayMLResults(data);
 		} else {
@@ -2322,10 +2438,9 @@ async function getNASAComprehensiveAnalysis() {
 		const lat = parseFloat(document.getElementById('lat').value);
 		const lon = parseFloat(document.getElementById('lon').value);
 		
-		const response = await fetch(`/api/nasa/comprehensive?lat=${lat}&lon=${lon}`);
-		const data = await response.json();
+		const {ok, data} = await dashboardOrFetch('nasa', lat, lon, `/api/nasa/comprehensive?lat=${lat}&lon=${lon}`);
 		
-		if (response.ok && data.success) {
+		if (ok && data.success) {
 			setNASAStatus('✅ NASA analysis complete!');
 			
 			const assessment = data.combined_assessment;
@@ -2783,10 +2898,9 @@ async function getNASA7DayForecast() {
 		const lat = parseFloat(document.getElementById('lat').value);
 		const lon = parseFloat(document.getElementById('lon').value);
 		
-		const response = await fetch(`/api/nasa/7day-forecast?lat=${lat}&lon=${lon}`);
-		const data = await response.json();
+		const {ok, data} = await dashboardOrFetch('forecast7', lat, lon, `/api/nasa/7day-forecast?lat=${lat}&lon=${lon}`);
 		
-		if (response.ok && data.success) {
+		if (ok && data.success) {
 			setNASAStatus('✅ 7-day forecast complete!');
 			
 			// Update the original chart with NASA forecast data